@@ -0,0 +1,207 @@
+#########################################################################
+#file:bench_fx3u.py
+#date:2026/10/18
+#file_content:PLC通信（Fx3u）の性能測定
+#########################################################################
+
+##Fx3u（TCP: fx3u.py / UDP: fx3u_udp.py）の通信性能を測定する
+##・電文の種類ごと（ビット読出し・Nワード読出し・ビット書込み・ワード書込み・スキャン1回分）に
+##  往復時間のパーセンタイル（p50/p90/p99/最大）と1秒あたりの処理回数を測定する
+##・通信方式（TCP/UDP）、コード（ASCII/バイナリ）、セッションモード（接続の使い回し）の組み合わせごとに測定する
+##・PlcSchedulerをmain_activity_udp4と同じポーリング設定で動かし、スキャン周期の処理時間・ジッタを測定する
+##
+##PLCの模擬環境（server_async.py）をこのプロセスの中で起動して測定する（実機は不要）
+##HOSTを指定すると外部の模擬環境に対して測定する（書込みを行うので稼働中の実機には使わないこと）
+##
+##結果は画面に表示し、RESULT_FILEにJSONで保存する（プロトコル部分を変更した時に前回の結果と比べる）
+##
+##使い方:
+##    python bench_fx3u.py
+
+import asyncio
+import json
+import threading
+import time
+import numpy as np
+import fx3u
+import fx3u_udp
+import plc_scheduler
+import server_async
+
+
+HOST = None          # 測定先のIPアドレス（Noneならこのプロセス内で模擬環境を起動）
+PORT = 50010         # 模擬環境のポート番号
+BUFSIZE = 4096
+ITERATIONS = 300     # 1つの測定の繰り返し回数
+WARMUP = 20          # 測定前の空回しの回数
+WORD_POINTS = [1, 10, 64] # ワード読出しの点数
+
+##通信状態（このプロセス内で起動する模擬環境の設定）
+LATENCY = 0.0
+JITTER = 0.0
+LOSS = 0.0
+
+##スケジューラの測定
+CYCLE_TIME = 0.05    # サイクル周期（秒）
+SCHEDULER_TIME = 3.0 # 測定時間（秒）
+
+##測定する組み合わせ (通信方式, コード, セッションモード)
+TARGETS = [
+    ('tcp', 'ascii', True),
+    ('tcp', 'binary', True),
+    ('tcp', 'ascii', False),
+    ('udp', 'ascii', True),
+    ('udp', 'binary', True),
+    ('udp', 'ascii', False),
+]
+
+RESULT_FILE = 'bench_fx3u_result.json' # 結果の保存先（Noneなら保存しない）
+
+
+##測定する電文の種類
+##(名前, Fx3uを引数にとる関数, 1回あたりの電文数)
+def operations():
+    ops = [('bit_read M20x4', lambda plc: plc.read_bits('M20', 4), 1)]
+    for points in WORD_POINTS:
+        ops.append(('word_read D91x' + str(points), lambda plc, points=points: plc.read_words('D91', points), 1))
+    ops.append(('bit_write M20x4', lambda plc: plc.write_devices({'M20': [1, 0, 0, 0]}), 1))
+    ops.append(('word_write D20x4', lambda plc: plc.write_devices({'D20': [1, 2, 3, 4]}), 1))
+    # main_activity_udp4のスキャン1回分（M20・M154・D91の読出し → M・Dの2電文）
+    ops.append(('scan M20+M154+D91', lambda plc: plc.read_devices([('M20', 4), ('M154', 4), ('D91', 10)]), 2))
+    return ops
+
+
+##Fx3uクラスのインスタンスを作る
+def create_fx3u(host, transport, code, session):
+    if transport == 'tcp':
+        return fx3u.Fx3u(host, PORT, BUFSIZE, timeout=1.0, session=session, code=code)
+    return fx3u_udp.Fx3u(host, PORT, BUFSIZE, timeout=1.0, session=session, code=code)
+
+
+##1つの電文の種類の測定
+##戻り値: 往復時間（秒）の配列
+def measure(plc, func, iterations=ITERATIONS, warmup=WARMUP):
+    for i in range(warmup):
+        func(plc)
+    times = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(plc)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+##往復時間の集計（ミリ秒）
+def summarize(times, frames):
+    total = times.sum()
+    return {
+        'p50_ms': float(np.percentile(times, 50) * 1000),
+        'p90_ms': float(np.percentile(times, 90) * 1000),
+        'p99_ms': float(np.percentile(times, 99) * 1000),
+        'max_ms': float(times.max() * 1000),
+        'ops_per_sec': float(len(times) / total),
+        'frames_per_sec': float(len(times) * frames / total),
+    }
+
+
+##スケジューラの測定
+##main_activity_udp4と同じポーリング（M20・M154を1サイクルごと、D91を0.2秒ごと）と結果の書込みを登録して動かす
+def measure_scheduler(plc):
+    scheduler = plc_scheduler.PlcScheduler(plc, cycle_time=CYCLE_TIME)
+    scheduler.add_poll([('M20', 4), ('M154', 4)], CYCLE_TIME, priority=2)
+    scheduler.add_poll([('D91', 10)], 0.2, priority=1)
+    scheduler.add_task(lambda: plc.write_devices({'D20': [1, 2, 3], 'D23': [1, 1]}), CYCLE_TIME, priority=3)
+    timer = threading.Timer(SCHEDULER_TIME, scheduler.stop)
+    timer.start()
+    scheduler.run()
+    stats = scheduler.stats()
+    return {
+        'cycle_time_ms': stats['cycle_time'] * 1000,
+        'cycles': stats['cycles'],
+        'overruns': stats['overruns'],
+        'busy_mean_ms': stats['busy_mean'] * 1000,
+        'busy_max_ms': stats['busy_max'] * 1000,
+        'jitter_mean_ms': stats['jitter_mean'] * 1000,
+        'jitter_max_ms': stats['jitter_max'] * 1000,
+    }
+
+
+##模擬環境をこのプロセス内の別スレッドで起動
+##戻り値: 停止する関数
+def start_simulator(host):
+    conditions = server_async.NetworkConditions(latency=LATENCY, jitter=JITTER, loss=LOSS)
+    server = server_async.AsyncPlcServer(host, PORT, conditions=conditions)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def serve():
+        await server.start()
+        ready.set()
+        await server.finished.wait()
+        await server.close()
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),))
+    thread.daemon = True
+    thread.start()
+    ready.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(server.finished.set)
+        thread.join()
+        loop.close()
+    return stop
+
+
+##全ての組み合わせの測定
+def run_benchmark(host=None):
+    stop = None
+    if host is None:
+        host = '127.0.0.1'
+        stop = start_simulator(host)
+
+    results = []
+    try:
+        for transport, code, session in TARGETS:
+            target = transport + '/' + code + '/' + ('session' if session else 'per-frame')
+            plc = create_fx3u(host, transport, code, session)
+            try:
+                for name, func, frames in operations():
+                    result = summarize(measure(plc, func), frames)
+                    result.update({'target': target, 'operation': name})
+                    results.append(result)
+                    print_result(result)
+                scan = measure_scheduler(plc)
+                scan.update({'target': target, 'operation': 'scheduler'})
+                results.append(scan)
+                print_scheduler(scan)
+            finally:
+                plc.close()
+    finally:
+        if stop is not None:
+            stop()
+    return results
+
+
+def print_result(result):
+    print(format(result['target'], '<22') + format(result['operation'], '<20')
+          + " p50 " + format(result['p50_ms'], '7.3f') + " ms"
+          + " p90 " + format(result['p90_ms'], '7.3f') + " ms"
+          + " p99 " + format(result['p99_ms'], '7.3f') + " ms"
+          + " max " + format(result['max_ms'], '7.3f') + " ms"
+          + " " + format(result['ops_per_sec'], '8.0f') + " 回/秒")
+
+
+def print_scheduler(result):
+    print(format(result['target'], '<22') + format('scheduler', '<20')
+          + " 周期 " + format(result['cycle_time_ms'], '.1f') + " ms"
+          + " 処理時間 平均 " + format(result['busy_mean_ms'], '.3f') + " ms / 最大 " + format(result['busy_max_ms'], '.3f') + " ms"
+          + " ジッタ最大 " + format(result['jitter_max_ms'], '.3f') + " ms"
+          + " 超過 " + str(result['overruns']) + "/" + str(result['cycles']))
+
+
+if __name__ == '__main__':
+    results = run_benchmark(HOST)
+    if RESULT_FILE is not None:
+        with open(RESULT_FILE, 'w') as f:
+            json.dump({'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}, f, indent=2, ensure_ascii=False)
+        print("結果を保存しました: " + RESULT_FILE)
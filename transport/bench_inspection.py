@@ -0,0 +1,238 @@
+#########################################################################
+#file:bench_inspection.py
+#date:2026/10/18
+#file_content:画像検査（Camera）の性能測定
+#########################################################################
+
+##image/2024 の各カメラの画像を Camera の各検査に通して処理時間を測定する
+##・検査の種類（judge_oshidashi・judge_fukuro・judge_kensa・read_qr・run_kensa）ごとに
+##  処理時間のパーセンタイル（p50/p90/p99/最大）と1秒あたりの処理枚数を測定する
+##・検査ごとに実際にその検査に入る画像だけを使う（STAGE_IMAGES）
+##    judge_oshidashi : oshidashi_image*    judge_fukuro : fukuro_image*
+##    judge_kensa     : kensa1～4_image.jpg（それぞれ対応するマスク画像で検査）
+##    read_qr         : qr_image.jpg
+##    run_kensa       : 検査部の4カメラに kensa1～4_image.jpg、QRカメラに qr_image.jpg を入れて並列実行
+##・tracemallocで検査ごとのメモリ使用量のピーク（numpy配列を含むPython側の確保）を測定する
+##  （tracemallocを使うと処理が遅くなるので、処理時間とは別に1回だけ通して測定する）
+##
+##画像は frame_source.py で最初に全部読み込んでおく（ファイル読込みの時間は含めない）
+##検査中の画面表示（printやエラーの詳細）は測定の邪魔になるので捨てる（QUIET=Falseで表示する）
+##検査で例外が起きた場合（検査の中で捕まえてエラーの詳細を表示した場合も含む）は、画像ごとに内容を表示し、
+##最後に終了コード1で終了する（例外が起きた検査の処理時間は意味がないので、測定をやり直す）
+##
+##結果は画面に表示し、RESULT_FILEにJSONで保存する（画像処理を変更した時に前回の結果と比べる）
+##
+##使い方:
+##    python bench_inspection.py
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+import tracemalloc
+import numpy as np
+import camera_c5 as camera
+import frame_source
+
+
+IMAGE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'image') # 画像フォルダ（リポジトリのimage）
+CAMERA_IMAGE_ROOT = "C:/startfile/g22025/image" # Cameraに書かれている画像フォルダ（IMAGE_ROOTに置き換える）
+
+##検査ごとの入力画像（IMAGE_ROOTからの相対パス、globのパターン）
+STAGE_IMAGES = {
+    'oshidashi': '2024/oshidashi_image*.jpg',
+    'fukuro': '2024/fukuro_image*.jpg',
+    'kensa1': '2024/kensa1_image.jpg',
+    'kensa2': '2024/kensa2_image.jpg',
+    'kensa3': '2024/kensa3_image.jpg',
+    'kensa4': '2024/kensa4_image.jpg',
+    'qr': '2024/qr_image.jpg',
+}
+KENSA_CAMERAS = ['kensa1', 'kensa2', 'kensa3', 'kensa4']
+
+REPEAT = 5    # 全画像を通す回数
+WARMUP = 1    # 測定前に全画像を通す回数（マスク画像の読込み・作業用画像の確保を済ませる）
+QUIET = True  # 検査中の画面表示を捨てる
+TRACE_MEMORY = True # メモリ使用量を測定する
+
+RESULT_FILE = 'bench_inspection_result.json' # 結果の保存先（Noneなら保存しない）
+
+
+##測定する検査
+##images: {カメラの名前: [(ファイル名, 画像), ...]}
+##戻り値: [(検査の名前, [(入力の名前, 引数なしで検査を実行する関数), ...]), ...]
+def stages(cam, images):
+    kensa = []
+    for name in KENSA_CAMERAS:
+        output = getattr(cam, 'output_' + name + '_image_filepath')
+        mask = getattr(cam, 'mask_' + name + '_filepath')
+        kensa.extend((path, _call(cam.judge_kensa, image, output, mask)) for path, image in images[name])
+
+    # run_kensaは各カメラの最初の画像を1組として入れる
+    run_inputs = {name: images[name][0] for name in KENSA_CAMERAS + ['qr']}
+    run_name = '+'.join(path for path, image in run_inputs.values())
+    return [
+        ('judge_oshidashi', [(path, _call(cam.judge_oshidashi, image)) for path, image in images['oshidashi']]),
+        ('judge_fukuro', [(path, _call(cam.judge_fukuro, image)) for path, image in images['fukuro']]),
+        ('judge_kensa', kensa),
+        ('read_qr', [(path, _call(cam.read_qr, image)) for path, image in images['qr']]),
+        ('run_kensa', [(run_name, lambda: run_kensa(cam, run_inputs))]),
+    ]
+
+
+def _call(func, *args):
+    return lambda: func(*args)
+
+
+##検査部の4カメラとQRカメラに画像を入れて検査部の検査を実行
+def run_kensa(cam, inputs):
+    for name, (path, image) in inputs.items():
+        cam.frames[name].put(image)
+    return cam.run_kensa()
+
+
+##測定用のCameraを作る
+##マスク画像などのパスをIMAGE_ROOTの下に置き換える
+def create_camera():
+    cam = camera.Camera()
+    for name, value in list(vars(cam).items()):
+        if isinstance(value, str) and value.startswith(CAMERA_IMAGE_ROOT):
+            setattr(cam, name, IMAGE_ROOT + value[len(CAMERA_IMAGE_ROOT):])
+    cam.image_cache.clear()
+    return cam
+
+
+##測定に使う画像の読込み
+##戻り値: {カメラの名前: [(ファイル名, 画像), ...]}（画像が見つからなければ終了する）
+def load_images():
+    images = {}
+    for name, pattern in STAGE_IMAGES.items():
+        backend = frame_source.ImageFileBackend(os.path.join(IMAGE_ROOT, pattern), loop=False, preload=True)
+        images[name] = []
+        if backend.open():
+            while backend.grab():
+                image = backend.retrieve()
+                if image is not None:
+                    images[name].append((os.path.relpath(backend.current_path(), IMAGE_ROOT), image))
+        if not images[name]:
+            sys.exit("画像が見つかりません: " + pattern)
+    return images
+
+
+##検査1回の実行
+##戻り値: 処理時間（秒）, 例外の内容（例外が起きなければNone）
+##検査の中で例外を捕まえてエラーの詳細を表示した場合も例外とする（QUIETの場合は表示から判定）
+def run_once(call):
+    with contextlib.ExitStack() as stack:
+        output = None
+        if QUIET:
+            output = stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            stack.enter_context(contextlib.redirect_stderr(output))
+        start = time.perf_counter()
+        try:
+            call()
+            error = None
+        except Exception as e:
+            error = traceback.format_exception_only(type(e), e)[-1].strip()
+        elapsed = time.perf_counter() - start
+    if error is None and output is not None and 'Traceback' in output.getvalue():
+        error = output.getvalue().strip().splitlines()[-1] # 検査の中で捕まえた例外
+    return elapsed, error
+
+
+##1つの検査の測定
+##戻り値: 処理時間（秒）の配列, {入力の名前: 例外の内容}
+def measure(calls, repeat=REPEAT, warmup=WARMUP):
+    for i in range(warmup):
+        for path, call in calls:
+            run_once(call)
+    times = np.empty(repeat * len(calls))
+    errors = {}
+    n = 0
+    for i in range(repeat):
+        for path, call in calls:
+            times[n], error = run_once(call)
+            if error is not None:
+                errors[path] = error
+            n = n + 1
+    return times, errors
+
+
+##1つの検査のメモリ使用量のピーク（全画像の中の最大、バイト）
+def measure_memory(calls):
+    peak = 0
+    tracemalloc.start()
+    try:
+        for path, call in calls:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            run_once(call)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+##処理時間の集計（ミリ秒）
+def summarize(times):
+    total = times.sum()
+    return {
+        'count': int(len(times)),
+        'mean_ms': float(times.mean() * 1000),
+        'p50_ms': float(np.percentile(times, 50) * 1000),
+        'p90_ms': float(np.percentile(times, 90) * 1000),
+        'p99_ms': float(np.percentile(times, 99) * 1000),
+        'max_ms': float(times.max() * 1000),
+        'frames_per_sec': float(len(times) / total),
+    }
+
+
+##全ての検査の測定
+def run_benchmark():
+    images = load_images()
+    for name, items in images.items():
+        print(name + " : " + ", ".join(path for path, image in items))
+    cam = create_camera()
+    results = []
+    try:
+        for name, calls in stages(cam, images):
+            times, errors = measure(calls)
+            result = summarize(times)
+            result.update({'stage': name, 'inputs': [path for path, call in calls], 'errors': errors})
+            if TRACE_MEMORY:
+                result['peak_memory_kb'] = measure_memory(calls) / 1024
+            results.append(result)
+            print_result(result)
+    finally:
+        cam.kensa_pool.shutdown(wait=True)
+    return images, results
+
+
+def print_result(result):
+    text = (format(result['stage'], '<18')
+            + " p50 " + format(result['p50_ms'], '8.3f') + " ms"
+            + " p90 " + format(result['p90_ms'], '8.3f') + " ms"
+            + " p99 " + format(result['p99_ms'], '8.3f') + " ms"
+            + " max " + format(result['max_ms'], '8.3f') + " ms"
+            + " " + format(result['frames_per_sec'], '7.1f') + " 枚/秒")
+    if 'peak_memory_kb' in result:
+        text = text + " メモリ " + format(result['peak_memory_kb'], '8.0f') + " KB"
+    print(text)
+    for path, error in result['errors'].items():
+        print("    例外 : " + path + " : " + error)
+
+
+if __name__ == '__main__':
+    images, results = run_benchmark()
+    if RESULT_FILE is not None:
+        with open(RESULT_FILE, 'w') as f:
+            json.dump({'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'images': {name: [path for path, image in items] for name, items in images.items()},
+                       'repeat': REPEAT, 'results': results}, f, indent=2, ensure_ascii=False)
+        print("結果を保存しました: " + RESULT_FILE)
+    failed = [result['stage'] for result in results if result['errors']]
+    if failed:
+        sys.exit("例外が起きた検査があります（処理時間は正しくありません）: " + ", ".join(failed))
@@ -4,26 +4,125 @@
 #name:橋本
 #file_content:fx3uシリーズ伝文コマンド
 #UPDATE: 2025/12/1 QRの画像処理方法変更（続き）
+#UPDATE: 2026/10/18 マスク画像をリサイズ済みでキャッシュ（検査ごとのimread・resizeをなくす）
+#UPDATE: 2026/10/18 検査部の4カメラの検査とQR読取りをスレッドプールで並列実行
+#UPDATE: 2026/10/18 穴あき判定のラベリングをconnectedComponentsWithStatsに変更（ラベルごとの画像全体の走査をなくす）
+#UPDATE: 2026/10/18 judge_kensaの画像処理を確保済みの作業用画像で行う（検査ごとの画像の確保をなくす）
+#UPDATE: 2026/10/18 カメラ画像の受け渡しをリングバッファ(FrameRing)に変更（通し番号・取得時刻付き、コピーなし）
+#UPDATE: 2026/10/18 manage_cameraの静止画の読込みを画像ファイル・動画ファイルの再生(frame_source)に変更
+#UPDATE: 2026/10/18 身体検出の推論をDetectorServiceに変更（新しい画像だけをまとめて推論、推論周期を指定）
+#UPDATE: 2026/10/18 身体検出の前に動きの有無を調べ、動きが無い間は推論を間引く(motion_gate)
+#UPDATE: 2026/10/18 身体検出をマスク画像の範囲(ROI)だけで推論（推論する画素数を減らす）
+#UPDATE: 2026/10/18 身体検出の推論をONNX Runtime・OpenCV DNNでも行えるようにした（ultralytics・PyTorchを読み込まない）
+#UPDATE: 2026/10/18 起動を速くした（使う時だけimport、推論モデルを別スレッドで準備、固定の待ち時間を最初の画像・準備完了の待ちに変更）
+#UPDATE: 2026/10/18 身体検出の信号を直近の推論結果で確定させる(presence_filter)（1回の検出漏れで信号がOFFにならない）
+#UPDATE: 2026/10/18 身体検出の結果を追跡して人ごとにIDを付け、滞在時間を記録する(person_tracker)
 #########################################################################
 
 import cv2      # 画像処理ライブラリ（OpenCV）
 import time     # 時間を扱う
 import numpy as np # 数値計算ライブラリ（行列計算などに使用）
-from ultralytics import YOLO
+import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor # 検査部の並列実行
+import image_cache # マスク画像のキャッシュ
+import frame_ring  # カメラ画像の受け渡し用リングバッファ
+import capture_service # 複数カメラの画像取得
+import frame_source    # 画像ファイル・動画ファイルの再生
+import detector_service # 身体検出の推論管理
+import motion_gate      # 動きの有無による推論の間引き
+import yolo_onnx        # YOLOv8のONNX推論
+import presence_filter  # 身体検出結果のチャタリング除去
+import person_tracker   # 身体検出結果の追跡（人ごとのID・滞在時間）
 
 
 # import mediapipe as mp # 手や身体を検出するライブラリ
 # from matplotlib import pyplot as plt # グラフ描画ライブラリ（今回は未使用）
 
 import random
-import requests # サーバー通信用
 import datetime # 日付と時刻を扱う
-import serial   # シリアル通信（ラベル貼り機など外部機器と通信するため）
+# requests（サーバー通信用）・serial（ラベル貼り機とのシリアル通信）は起動を速くするため使う時だけ読み込む
+
+
+##judge_kensaの作業用画像
+##検査のたびに画像を確保しないように、最初に1回だけ確保して使い回す
+##検査部は4カメラを並列に処理するので、スレッドごとに1組ずつ持つ
+class _KensaBuffers:
+    def __init__(self, size):
+        width, height = size
+        self.resized = np.empty((height, width, 3), np.uint8) # リサイズしたカメラ画像
+        self.gray = np.empty((height, width), np.uint8)       # グレー画像
+        self.bright = np.empty((height, width), np.uint8)     # 反射部分が白の画像
+        self.dark = np.empty((height, width), np.uint8)       # 反射部分が黒の画像
+        self.work = np.empty((height, width), np.uint8)       # 反射除去・平滑化の作業用
+        self.blur = np.empty((height, width), np.uint8)       # 平滑化の作業用
+        self.edges = np.empty((height, width), np.uint8)      # エッジ・輪郭画像
+        self.labels = np.empty((height, width), np.int32)     # ラベリング結果
+
+
+##カメラの名前（リングバッファのキー）
+CAMERA_NAMES = ['oshidashi', 'fukuro', 'qr', 'kensa1', 'kensa2', 'kensa3', 'kensa4']
+
+##manage_cameraで再生する画像（実際のカメラの代わり）
+##画像ファイル・フォルダ・ワイルドカード・動画ファイルを指定できる（frame_source.py）
+FRAME_SOURCES = {
+    'oshidashi': "C:/startfile/g22025/image/2024/oshidashi_image.jpg",
+    'fukuro': "C:/startfile/g22025/image/2024/fukuro_image.jpg",
+    'qr': "C:/startfile/g22025/image/2024/qr_image.jpg",
+    'kensa1': "C:/startfile/g22025/image/2024/kensa1_image.jpg",
+    'kensa2': "C:/startfile/g22025/image/2024/kensa2_image.jpg",
+    'kensa3': "C:/startfile/g22025/image/2024/kensa3_image.jpg",
+    'kensa4': "C:/startfile/g22025/image/2024/kensa4_image.jpg",
+}
+REPLAY_FPS = 15 # 再生速度（枚/秒）。Noneなら各カメラができるだけ速く再生する（性能測定用）
+
+##身体検出（detect_hand）の設定
+DETECT_CAMERAS = ['oshidashi'] # 身体検出を行うカメラ（複数指定するとまとめて推論する）
+DETECT_RATE = 5 # 1秒あたりの推論回数。Noneなら新しい画像が来るたびに推論する
+MOTION_GATE = 'mog2'   # 推論前に動きの有無を調べる方法（'mog2':背景差分, 'diff':フレーム差分, None:調べない）
+MOTION_THRESHOLD = 0.005 # マスク範囲内で変化した画素がこの割合以上なら動きあり
+MOTION_HEARTBEAT = 1.0 # 動きが無くてもこの間隔（秒）で1回は推論する
+DETECT_ROI = True  # マスク画像の白い範囲を囲む矩形(ROI)だけを切り出して推論する
+DETECT_IMGSZ = None # 推論時の画像サイズ（長辺）。NoneならROIの大きさから決める（画像全体を640で推論した時と同じ縮小率）
+DETECT_WEIGHTS = 'yolov8n.pt' # YOLOv8のモデル
+DETECT_BACKEND = 'onnxruntime' # 推論の方法（'onnxruntime' / 'opencv'（OpenCV DNN）/ 'ultralytics'（PyTorch））
+DETECT_THREADS = 2 # 推論スレッド数（onnxruntimeのみ）。検査の画像処理にCPUを残すために少なめにする
+DETECT_VOTES = 1  # 直近DETECT_WINDOW回の推論のうち、この回数以上検出したら検出あり
+DETECT_WINDOW = 3 # 検出なしにするのは、直近DETECT_WINDOW回の推論が全て検出なしの時
+DETECT_ASSERT_TIME = 0.0  # 検出ありの条件がこの時間（秒）続いたら検出ありにする
+DETECT_RELEASE_TIME = 1.0 # 検出なしの条件がこの時間（秒）続いたら検出なしにする
+DETECT_STALE_TIME = 2.0   # カメラの最新の画像がこの時間（秒）より古ければ、安全のため検出ありにする
+TRACK_PERSON = True  # 検出した人を追跡してIDを付け、滞在時間を記録する
+TRACK_IOU = 0.3      # 前回の位置（予測）とこのIoU以上重なる検出を同じ人とする
+TRACK_MAX_AGE = 2.0  # この時間（秒）検出されなければその人はいなくなったとする（MOTION_HEARTBEATより長くする）
+TRACK_MIN_HITS = 2   # この回数検出されたら人として確定する（1回だけの誤検出を数えない）
+TRACK_DETECT_EVERY = 1 # 人を追跡している間は、この枚数に1枚だけ推論し、間の画像は追跡の予測位置を使う（1なら毎回推論）
+
+
+##カメラ画像の属性（self.frame_oshidashi など）
+##読む時はリングバッファの最新の画像（書込み禁止）、代入するとリングバッファに追加する
+def _frame_property(name):
+    def getter(self):
+        return self.frames[name].latest()[0]
+    def setter(self, image):
+        self.frames[name].put(image)
+    return property(getter, setter)
 
 
 class Camera:
+    frame_oshidashi = _frame_property('oshidashi')
+    frame_fukuro = _frame_property('fukuro')
+    frame_qr = _frame_property('qr')
+    frame_kensa1 = _frame_property('kensa1')
+    frame_kensa2 = _frame_property('kensa2')
+    frame_kensa3 = _frame_property('kensa3')
+    frame_kensa4 = _frame_property('kensa4')
+    
     ##初期設定---------------------------------------------------------------------------------------------------------------
     def __init__(self):
+        # カメラ画像の受け渡し用リングバッファ（manage_cameraが追加し、他のスレッドは最新の画像を読む）
+        self.frames = {name: frame_ring.FrameRing() for name in CAMERA_NAMES}
+        
         # 画像のファイルパスを設定
         # 処理結果の画像や、検査範囲を指定するためのマスク画像を保存する場所
         self.output_oshidashi_image_filepath = "C:/startfile/g22025/image/2024/output_oshidashi_image.jpg"
@@ -47,8 +146,33 @@ class Camera:
         self.mask_kensa4_filepath = "C:/startfile/g22025/image/2024/mask_kensa4.jpg"
         self.hansya_filepath = "C:/startfile/g22025/image/2024/hansya_mask.jpg" # 袋の反射を除去するために使うグレー画像
         
+        # マスク画像をリサイズ済みの状態で読み込んでおく（ファイルが更新された時だけ読み直す）
+        self.image_size = (640, 480) # 画像処理で使う画像サイズ
+        self.image_cache = image_cache.ImageCache()
+        self.image_cache.preload([
+            self.mask_oshidashi_filepath,
+            self.mask_fukuro_filepath,
+            self.mask_kensa1_filepath,
+            self.mask_kensa2_filepath,
+            self.mask_kensa3_filepath,
+            self.mask_kensa4_filepath,
+            self.hansya_filepath,
+        ], self.image_size)
+        
+        # 検査部の4カメラの検査とQR読取りを並列実行するスレッドプール
+        # OpenCVの処理中はGILが解放されるので、スレッドでも同時に処理が進む
+        self.kensa_pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix='kensa')
+        self.kensa_buffers = threading.local() # judge_kensaの作業用画像（スレッドごと）
+        
         # YOLOv8モデルの初期化 --------------------------------------------------------------------
-        self.yolo_model = YOLO('yolov8n.pt') # 'yolov8n.pt'モデルをロード
+        # 読込みに時間がかかるので、start_warmup()で別スレッドで読み込む（DETECT_BACKEND）
+        # 読込みと試しの推論が終わったら detector_ready をセットする
+        self.detector = None                     # 身体検出の推論管理(DetectorService)
+        self.detector_ready = threading.Event()  # 推論の準備完了（失敗した場合もセットする。その時はdetectorがNone）
+        self.warmup_thread = None
+        # 推論結果から検出あり・なしを確定させる（is_detect_handはこの結果）
+        self.presence = presence_filter.PresenceFilter(votes=DETECT_VOTES, window=DETECT_WINDOW,
+                                                       assert_time=DETECT_ASSERT_TIME, release_time=DETECT_RELEASE_TIME)
         # ---------------------------------------------------------------------------------
 
         # mediapipe設定--------------------------------------------------------------------
@@ -135,14 +259,12 @@ class Camera:
     def manage_camera(self):
         print("manage_cameraモジュール（カメラ管理モジュール）が動作しました")
         
-        # 各カメラの画像をファイルから読み込み、フレームとして代入（※実際のカメラではなく、静止画で模擬動作させている）
-        self.frame_oshidashi = cv2.imread("C:/startfile/g22025/image/2024/oshidashi_image.jpg", 1)
-        self.frame_fukuro = cv2.imread("C:/startfile/g22025/image/2024/fukuro_image.jpg", 1)
-        self.frame_qr = cv2.imread("C:/startfile/g22025/image/2024/qr_image.jpg", 1)
-        self.frame_kensa1 = cv2.imread("C:/startfile/g22025/image/2024/kensa1_image.jpg", 1)
-        self.frame_kensa2 = cv2.imread("C:/startfile/g22025/image/2024/kensa2_image.jpg", 1)
-        self.frame_kensa3 = cv2.imread("C:/startfile/g22025/image/2024/kensa3_image.jpg", 1)
-        self.frame_kensa4 = cv2.imread("C:/startfile/g22025/image/2024/kensa4_image.jpg", 1)
+        # 各カメラの画像をファイルから再生し、リングバッファに入れる（※実際のカメラではなく、画像ファイル・動画ファイルで模擬動作させている）
+        # 静止画は最初に読み込んでおき、REPLAY_FPSの間隔で同じ画像を繰り返し入れる
+        self.capture = capture_service.CaptureService(
+            {name: frame_source.create_backend(FRAME_SOURCES[name], preload=True) for name in CAMERA_NAMES},
+            fps=REPLAY_FPS, rings=self.frames)
+        self.capture.start()
         
         while(1):
             #time.sleep(0.1)
@@ -196,6 +318,7 @@ class Camera:
                 print("画像撮影プログラム(while中の例外)でエラーが発生しました")
                 time.sleep(5)
 
+        self.capture.stop() # 画像の再生を終了
         print("manage_cameraモジュール（カメラ管理モジュール）を終了します")
         self.is_manage_camera_shutdown = True # シャットダウン信号をTrueに
 
@@ -212,71 +335,178 @@ class Camera:
         #time.sleep(5)
             
             
+    ##カメラの最初の画像が来るまで待つ-----------------------------------------------------------------------------------------
+    ##戻り値: 全てのカメラの画像が来たらTrue（待っている間に終了信号が来たらFalse）
+    def wait_first_frames(self, names):
+        for name in names:
+            while not self.frames[name].wait_first(0.5):
+                if self.is_camera_shutdown:
+                    return False
+        return True
+    
+    ##身体検出の推論モデルの準備を開始（別スレッド）-------------------------------------------------------------------------------
+    ##何回呼んでも1回だけ準備する。準備が終わると detector_ready がセットされる
+    def start_warmup(self):
+        if self.warmup_thread is None:
+            self.warmup_thread = threading.Thread(target=self.warmup_detector, name='warmup')
+            self.warmup_thread.daemon = True
+            self.warmup_thread.start()
+        return self.detector_ready
+    
+    ##身体検出の推論モデルの読込みと試しの推論----------------------------------------------------------------------------------
+    def warmup_detector(self):
+        start = time.time()
+        try:
+            detector, shape = self.load_detector()
+            # 最初の推論は準備（メモリの確保など）で遅いので、ここで1回推論しておく
+            height, width = (shape, shape) if isinstance(shape, int) else shape
+            detector.detector.detect([np.zeros((height, width, 3), np.uint8)])
+            self.detector = detector
+            print("身体検出の準備ができました（" + format(time.time() - start, '.1f') + "秒）")
+        except Exception:
+            traceback.print_exc()
+            print("身体検出の準備でエラーが発生しました")
+        finally:
+            self.detector_ready.set()
+    
+    ##身体検出の推論モデルの読込み
+    ##戻り値: (DetectorService, 推論時の入力サイズ)
+    def load_detector(self):
+        # YOLOv8での人（person）のクラスIDは 0
+        PERSON_CLASS_ID = 0 
+        # YOLOv8の推論設定
+        CONFIDENCE_THRESHOLD = 0.5 # 検出信頼度の閾値（必要に応じて調整）
+
+        # 推論の管理（DETECT_CAMERASの新しい画像だけを集めて、DETECT_RATEの周期でまとめて推論する）
+        # classes=[0]で'person'クラスのみを検出
+        # 通し番号が進んでいない画像・前回と同じ画像（静止画の再生）は推論しない
+        # マスク範囲内に動きが無い画像も推論しない（MOTION_HEARTBEAT秒ごとに1回は推論する）
+        # マスク画像の範囲(ROI)だけを推論する（座標は画像全体の座標に戻す）
+        # 検出した人を追跡してIDを付ける（滞在時間の記録）
+        gates = {}
+        rois = {}
+        trackers = {}
+        if TRACK_PERSON:
+            for name in DETECT_CAMERAS:
+                trackers[name] = person_tracker.PersonTracker(iou_threshold=TRACK_IOU, max_age=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS)
+        shape = None # 推論時の入力サイズ (高さ, 幅)
+        for name in DETECT_CAMERAS:
+            mask = None # カメラのマスク画像（無ければ画像全体を調べる）
+            mask_filepath = getattr(self, 'mask_' + name + '_filepath', None)
+            if mask_filepath:
+                try:
+                    mask = self.image_cache.get(mask_filepath) # 元の解像度のまま（カメラ画像と同じ縦横比）
+                except FileNotFoundError as e:
+                    print(e)
+            if MOTION_GATE is not None:
+                gates[name] = motion_gate.MotionGate(mask, method=MOTION_GATE, threshold=MOTION_THRESHOLD, heartbeat=MOTION_HEARTBEAT)
+            if DETECT_ROI and mask is not None:
+                roi = detector_service.mask_roi(mask)
+                if roi is not None:
+                    rois[name] = roi
+                    # ROIの縦横比に合わせた入力サイズ（まとめて推論するので、全カメラの中で一番大きいサイズにする）
+                    size = (mask.shape[1], mask.shape[0])
+                    crop = ((roi[2] - roi[0]) * size[0], (roi[3] - roi[1]) * size[1])
+                    camera_shape = yolo_onnx.input_shape(crop, DETECT_IMGSZ or detector_service.roi_imgsz(roi, size))
+                    shape = camera_shape if shape is None else (max(shape[0], camera_shape[0]), max(shape[1], camera_shape[1]))
+        if shape is None:
+            shape = DETECT_IMGSZ or 640
+
+        # YOLOv8モデルの読み込み（onnxruntime・opencvは初回だけONNX形式に変換する）
+        try:
+            detector = detector_service.create_detector(DETECT_BACKEND, DETECT_WEIGHTS, classes=[PERSON_CLASS_ID],
+                                                        conf=CONFIDENCE_THRESHOLD, imgsz=shape, threads=DETECT_THREADS)
+        except ImportError as e:
+            # onnxruntimeがインストールされていない場合などはultralyticsで推論する
+            print("推論の準備ができませんでした（" + str(e) + "）。ultralyticsで推論します")
+            detector = detector_service.create_detector('ultralytics', DETECT_WEIGHTS, classes=[PERSON_CLASS_ID],
+                                                        conf=CONFIDENCE_THRESHOLD, imgsz=shape)
+        service = detector_service.DetectorService(
+            detector, {name: self.frames[name] for name in DETECT_CAMERAS}, rate=DETECT_RATE, gates=gates, rois=rois,
+            trackers=trackers, detect_every=TRACK_DETECT_EVERY)
+        return service, shape
+            
+            
     ##身体の検出-------------------------------------------------------------------------------------------------------------
     def detect_hand(self):
-        ## カメラが最初の画像を取得するまで待機
-        time.sleep(5)
+        ## 推論モデルの準備と、カメラが最初の画像を取得するまで待機
+        self.start_warmup()
+        while not self.detector_ready.wait(0.5):
+            if self.is_camera_shutdown:
+                break
+        self.wait_first_frames(DETECT_CAMERAS)
         print("detect_handモジュール（身体検出モジュール）が動作しました")
         self.is_detect_hand = False
         #cv2.namedWindow('hands', cv2.WINDOW_NORMAL)
         
-        # YOLOv8モデルの読み込みは__init__で実行済み
-        # YOLOv8での人（person）のクラスIDは 0
-        PERSON_CLASS_ID = 0 
-        # YOLOv8の推論設定
-        CONFIDENCE_THRESHOLD = 0.5 # 検出信頼度の閾値（必要に応じて調整）
+        if self.detector is None and not self.is_camera_shutdown:
+            # 推論モデルの準備ができなかった場合は、安全のため検出ありのままにする
+            print("身体検出を行えないので、検出ありとします")
+            self.is_detect_hand = True
 
         # YOLOv8の処理ループ
         while(1):
-            self.is_detect_hand = False
             try:
                 if self.is_camera_shutdown:
                     break
-
-                # 現在のフレームを取得
-                image = self.frame_oshidashi.copy() # フレームをコピーして使用
-
-                # YOLOv8推論の実行
-                # classes=[0]で'person'クラスのみを検出
-                results = self.yolo_model.predict(
-                    source=image, 
-                    classes=[PERSON_CLASS_ID], 
-                    conf=CONFIDENCE_THRESHOLD, 
-                    verbose=False # コンソールへの出力抑制
-                )
-
-                # 検出結果の確認
-                # results[0].boxes.dataには、[x1, y1, x2, y2, confidence, class_id] の形式で検出結果が含まれる
-                detected_boxes = results[0].boxes.data
-
-                # 人が検出された場合
-                if len(detected_boxes) > 0:
-                    self.is_detect_hand = True # 人が検出されたことを示す信号をON
-                    # 検出された領域を画像に描画（デバッグ用）
-                    # 描画済みのフレームを取得
-                    write_image = results[0].plot() 
+                if self.detector is None:
+                    time.sleep(0.5)
+                    continue
+
+                # 次の推論時刻まで待ってから推論（新しい画像が無ければ推論しない）
+                # 検出結果は [x1, y1, x2, y2, confidence, class_id] のN×6の配列
+                detections = self.detector.step()
+                now = time.time()
+
+                # カメラの画像が来ていない場合は、安全のため検出ありにする
+                timestamps = [self.frames[name].latest()[2] for name in DETECT_CAMERAS]
+                if any(t is None or now - t > DETECT_STALE_TIME for t in timestamps):
+                    self.is_detect_hand = self.presence.fail(now)
+                    continue
+
+                # いずれかのカメラで人が検出された場合は検出あり
+                # 推論しなかった画像は、追跡中の人の予測位置があれば検出あり（無ければ時間の経過だけで判定）
+                if any(detection.predicted and detection.detected for detection in detections):
+                    detected = True
+                elif any(not detection.predicted for detection in detections):
+                    detected = self.detector.is_detected()
                 else:
-                    self.is_detect_hand = False # 人が検出されていない
-                    write_image = image # 検出がない場合はオリジナルのフレームを表示
+                    detected = None
+                self.is_detect_hand = self.presence.update(detected, now)
+                if not detections:
+                    continue
+
+                # いなくなった人の滞在時間
+                for name, tracker in self.detector.trackers.items():
+                    for track in tracker.pop_finished():
+                        print("人の滞在時間 : " + name + " ID " + str(track.id) + " " + format(track.dwell(), '.1f') + " 秒")
 
                 # ディスプレイ表示（MediaPipe Handsの処理から流用）
-                #cv2.imshow('hands', write_image)
+                #for detection in detections:
+                #    cv2.imshow('hands_' + detection.camera, self.frames[detection.camera].get(detection.seq)[0])
 
                 key = cv2.waitKey(1)
 
             except:
-                self.is_detect_hand = True # エラー発生時も安全のため検出ありとしておく
+                self.is_detect_hand = self.presence.fail() # エラー発生時も安全のため検出ありとしておく
                 import traceback
                 traceback.print_exc() # エラーの詳細を表示
                 #print("予期せぬエラー（手判定）")
 
+        if self.detector is not None:
+            self.detector.print_stats()
+            for name, tracker in self.detector.trackers.items():
+                tracker.print_stats(name)
+        stats = self.presence.stats()
+        print("身体検出 : 検出あり " + str(stats['asserts']) + " 回 / 検出なし " + str(stats['releases'])
+              + " 回 / エラー " + str(stats['fails']) + " 回")
         print("detect_handモジュール（身体検出モジュール）を終了します")
         self.is_detect_hand_shutdown = True # シャットダウン信号をTrueに    
     
     ##画像処理の動作管理-------------------------------------------------------------------------------------------------------
     def manage_image_processing(self):
-        ## カメラが最初の画像を取得するまで待機
-        time.sleep(5)
+        ## 全てのカメラが最初の画像を取得するまで待機
+        self.wait_first_frames(CAMERA_NAMES)
         print("manage_image_processingモジュール（画像処理動作モジュール）が動作しました")
         #self.read_qr(self.frame_oshidashi)#ラベル貼りを動作する際にコメントアウト（現在はQR読み取りをスキップ）
         while(1):
@@ -317,13 +547,9 @@ class Camera:
             if self.is_start_kensa:
                 start = time.time() # 時間測定開始
                 
-                # 4つの検査カメラの画像に対して、袋穴あき検査モジュールを順次実行
-                self.judge_kensa(self.frame_kensa1, self.output_kensa1_image_filepath, self.mask_kensa1_filepath)
-                self.judge_kensa(self.frame_kensa2, self.output_kensa2_image_filepath, self.mask_kensa2_filepath)
-                self.judge_kensa(self.frame_kensa3, self.output_kensa3_image_filepath, self.mask_kensa3_filepath)
-                self.judge_kensa(self.frame_kensa4, self.output_kensa4_image_filepath, self.mask_kensa4_filepath)
-                
-                print(self.read_qr(self.frame_qr)) # QR読取りモジュールの実行
+                # 4つの検査カメラの袋穴あき検査とQR読取りを並列に実行し、全て終わるまで待つ
+                # 1つでも破れあり(2)なら検査部の結果を破れあり(2)とする
+                self.kensa_result = self.run_kensa()
                 
                 stop = time.time() # 時間測定終了
                 print("検査部の検査にかかった時間は")
@@ -333,18 +559,45 @@ class Camera:
                 self.is_send_kensa_result = True # 検査部終了信号をTrueに
                 self.is_start_kensa = False      # 検査部開始信号をFalseに
 
+        self.kensa_pool.shutdown(wait=True)
         print("manage_image_processingモジュール（画像処理動作モジュール）を終了します")
         self.is_manage_image_processing = True # シャットダウン信号をTrueに
 
 
+    ##検査部の検査（4カメラの袋穴あき検査とQR読取りを並列実行）----------------------------------------------------------------------
+    ##戻り値: 1=破れなし, 2=破れあり（どれか1つでも破れあり、または検査中にエラーが起きた場合）
+    def run_kensa(self):
+        futures = [
+            self.kensa_pool.submit(self.judge_kensa, self.frame_kensa1, self.output_kensa1_image_filepath, self.mask_kensa1_filepath),
+            self.kensa_pool.submit(self.judge_kensa, self.frame_kensa2, self.output_kensa2_image_filepath, self.mask_kensa2_filepath),
+            self.kensa_pool.submit(self.judge_kensa, self.frame_kensa3, self.output_kensa3_image_filepath, self.mask_kensa3_filepath),
+            self.kensa_pool.submit(self.judge_kensa, self.frame_kensa4, self.output_kensa4_image_filepath, self.mask_kensa4_filepath),
+        ]
+        qr_future = self.kensa_pool.submit(self.read_qr, self.frame_qr) # QR読取りモジュールの実行
+        
+        kensa_result = 1 # 初期値は破れなし(1)
+        for future in futures:
+            try:
+                if future.result() == 2:
+                    kensa_result = 2 # 破れあり(2)
+            except Exception:
+                traceback.print_exc() # エラーの詳細を表示
+                kensa_result = 2 # 検査できなかった場合は安全側（破れあり）とする
+        
+        try:
+            print(qr_future.result())
+        except Exception:
+            traceback.print_exc()
+        return kensa_result
+
+
     ##袋セット部の袋の有無判定---------------------------------------------------------------------------------------------------
     def judge_fukuro(self, image):
         print("袋セット部の袋の有無判定")
         
-        mask = cv2.imread(self.mask_fukuro_filepath, 0) # 袋セット部のマスク画像の読み込み
-        size = (640, 480) # 画像サイズ
+        size = self.image_size # 画像サイズ
+        mask = self.image_cache.get(self.mask_fukuro_filepath, size) # 袋セット部のマスク画像（リサイズ済み）
         image = cv2.resize(image, size) # カメラ画像をリサイズ
-        mask = cv2.resize(mask,size) # マスク画像をリサイズ
         image_size = image.shape[0] * image.shape[1] # 画像サイズの面積を算出
         image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) # グレースケールに変換
         image = cv2.bitwise_and(image, mask) # マスク処理
@@ -375,11 +628,10 @@ class Camera:
     def judge_oshidashi(self, image):
         print("投入部のワーク有無判定")
         
-        mask = cv2.imread(self.mask_oshidashi_filepath, 0) # 押出部のマスク画像の読み込み
         #size = (1920, 1080)#画像サイズ
-        size = (640, 480) # 画像サイズ
+        size = self.image_size # 画像サイズ
+        mask = self.image_cache.get(self.mask_oshidashi_filepath, size) # 押出部のマスク画像（リサイズ済み）
         image = cv2.resize(image, size) # カメラ画像をリサイズ
-        mask = cv2.resize(mask,size)  # マスク画像をリサイズ
         image_size = image.shape[0] * image.shape[1] # 画像全体の面積を算出
         image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) # グレースケールに変換
         image = cv2.bitwise_and(image, mask) # マスク処理（検査エリア外を無視）
@@ -485,80 +737,79 @@ class Camera:
         print("検査部の袋の破れ有無判定")
         
         # 画像読み込み
-        image_color = image # カメラのカラー画像
-        mask = cv2.imread(mask_filepath, 0) # 袋の角マスク画像
-        hansya = cv2.imread(self.hansya_filepath, 0) # 反射除去用のグレー画像
+        size = self.image_size # 画像サイズ
+        mask = self.image_cache.get(mask_filepath, size) # 袋の角マスク画像（リサイズ済み）
+        hansya = self.image_cache.get(self.hansya_filepath, size) # 反射除去用のグレー画像（リサイズ済み）
         
-        # 画像サイズの変更
-        size = (640,480) # 画像サイズ
-        image = cv2.resize(image, size)
-        image_color = cv2.resize(image_color, size)
-        mask = cv2.resize(mask, size)
-        hansya = cv2.resize(hansya, size)
+        # 作業用画像（このスレッドで初めての検査なら確保する）
+        # 以下の処理は全てdst=で作業用画像に結果を書き込み、新しい画像を確保しない
+        buf = getattr(self.kensa_buffers, 'buffers', None)
+        if buf is None or buf.gray.shape != (size[1], size[0]):
+            buf = _KensaBuffers(size)
+            self.kensa_buffers.buffers = buf
         
-        image = cv2.cvtColor(image,cv2.COLOR_BGR2GRAY) # グレー画像に変換
+        # 画像サイズの変更
+        # カラー画像(image_color)はデバッグ表示にしか使わないので作らない（使う時は buf.resized を使う）
+        cv2.resize(image, size, dst=buf.resized)
+        cv2.cvtColor(buf.resized, cv2.COLOR_BGR2GRAY, dst=buf.gray) # グレー画像に変換
         
         # 反射除去のための前処理 ----------------------------------------------
-        thresh_value, nitika_image = cv2.threshold(image, 180, 255, cv2.THRESH_BINARY) # 明るい部分（反射）を白として取得
-        hihanten = nitika_image     # 反射部分が白の画像
-        hanten = 255 - nitika_image # 反射部分が黒の画像
+        cv2.threshold(buf.gray, 180, 255, cv2.THRESH_BINARY, dst=buf.bright)   # 明るい部分（反射）を白として取得
+        cv2.threshold(buf.gray, 180, 255, cv2.THRESH_BINARY_INV, dst=buf.dark) # 反射部分が黒の画像（255 - 上の画像と同じ）
         
         # 元画像から反射部分を切り取る
-        nitika_image = cv2.bitwise_and(image, hanten) 
+        cv2.bitwise_and(buf.gray, buf.dark, dst=buf.work)
         
         # グレー画像から反射部分の形に合わせて切り取る
-        hansya = cv2.bitwise_and(hansya, hihanten) 
+        cv2.bitwise_and(hansya, buf.bright, dst=buf.bright)
         
         # 切り取った反射部分をグレー画像に差し替え（反射を除去）
-        nitika_image = cv2.add(nitika_image, hansya) 
-        #cv2.imwrite("C:/startfile/g22025/image/2024/hansya.jpg", nitika_image)#反射をなくした画像を表示（デバッグ用）
+        cv2.add(buf.work, buf.bright, dst=buf.work)
+        #cv2.imwrite("C:/startfile/g22025/image/2024/hansya.jpg", buf.work)#反射をなくした画像を表示（デバッグ用）
         # ------------------------------------------------------------------
         
-        image = nitika_image
-        
         ## 平滑化（ノイズ除去）
-        image = cv2.medianBlur(image, 5) # メディアンフィルタを3回適用してノイズを大幅に除去
-        image = cv2.medianBlur(image, 5)
-        image = cv2.medianBlur(image, 5)
+        # メディアンフィルタを3回適用してノイズを大幅に除去（入力と出力に同じ画像は使えないので2枚を交互に使う）
+        cv2.medianBlur(buf.work, 5, dst=buf.blur)
+        cv2.medianBlur(buf.blur, 5, dst=buf.work)
+        cv2.medianBlur(buf.work, 5, dst=buf.blur)
 
         ## エッジ処理
         th1 = 94
         th2 = 23
-        nitika_image = cv2.Canny(image, th1, th2) # Canny法でエッジ（輪郭）を検出
-        #cv2.imwrite("C:/startfile/g22025/image/2024/canny.jpg", nitika_image)#反射をなくした画像を表示（デバッグ用）
+        cv2.Canny(buf.blur, th1, th2, edges=buf.edges) # Canny法でエッジ（輪郭）を検出
+        #cv2.imwrite("C:/startfile/g22025/image/2024/canny.jpg", buf.edges)#反射をなくした画像を表示（デバッグ用）
 
-        nitika_image = cv2.bitwise_and(nitika_image, mask) # マスク処理（検査範囲外のエッジを無視）
+        cv2.bitwise_and(buf.edges, mask, dst=buf.edges) # マスク処理（検査範囲外のエッジを無視）
         
         ## 輪郭検出----------------------------------------------------------------------
-        nitika_image_color = cv2.cvtColor(nitika_image,cv2.COLOR_GRAY2BGR) # カラー画像に変換
-        #ret,thresh = cv2.threshold(nitika_image, 63, 255, cv2.THRESH_BINARY)#白黒のエリアを決定
-        
         # 輪郭を検出（RETR_EXTERNAL: 一番外側の輪郭だけを検出）
-        contours,hierarchy = cv2.findContours(nitika_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 検出した輪郭を描画（デバッグ用）
-        contimg = cv2.drawContours(nitika_image_color, contours, -1, (0, 255, 0), 7)
+        contours,hierarchy = cv2.findContours(buf.edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         ## 穴あきを検出（ラベリング処理）-------------------------------------------------------------
-        contimg_gray = cv2.cvtColor(contimg, cv2.COLOR_BGR2GRAY) # 輪郭画像をグレー画像に変換
-        thresh_value, image = cv2.threshold(contimg_gray, 100, 255, cv2.THRESH_BINARY) # 輪郭部分を白色に
+        # 検出した輪郭をエッジ画像に白(255)で直接描画する
+        # 以前はカラー画像に緑で描画 → グレー変換 → 2値化していたが、エッジも輪郭も白になるので結果は同じ
+        cv2.drawContours(buf.edges, contours, -1, 255, 7)
+        image = buf.edges
         
         # ラベリング処理（つながった白い領域（＝穴あきの輪郭）にそれぞれ番号を振る）
-        nlabel, image_label = cv2.connectedComponents(image) 
-        
-        self.kensa_result = 1 # 初期値は破れなし(1)
-        # ラベリングされた各領域をチェック
-        for i in range(1, nlabel):
-            image_dst = cv2.compare(image_label, i, cv2.CMP_EQ) # 該当のラベル領域だけを抽出
-            x, y, w, h = cv2.boundingRect(image_dst) # その領域を囲む矩形（四角）を算出
-            
-            # ある程度大きい矩形（高さhが20ピクセル以上）を穴あきと判定
-            if h >= 20:
-                #cv2.rectangle(image_color, (x,y), (x+w, y+h), (0,0,240), 3)#穴あき部分を囲む（デバッグ用）
-                self.kensa_result = 2 # 破れあり(2)
-                print("穴あきあり")
+        # 画像を1回走査するだけで、全ての領域を囲む矩形（x, y, 幅, 高さ）と面積がまとめて求まる
+        # （以前はラベルごとにcv2.compareで画像全体を走査してboundingRectを求めていた）
+        nlabel, image_label, stats, centroids = cv2.connectedComponentsWithStats(image, labels=buf.labels)
+        
+        kensa_result = 1 # 初期値は破れなし(1)
+        # ラベリングされた各領域をチェック（0番は背景なので除く）
+        # ある程度大きい矩形（高さhが20ピクセル以上）を穴あきと判定。1つ見つかった時点で判定終了
+        large = np.flatnonzero(stats[1:, cv2.CC_STAT_HEIGHT] >= 20)
+        if large.size > 0:
+            x, y, w, h = stats[large[0] + 1, :4]
+            #cv2.rectangle(image_color, (x,y), (x+w, y+h), (0,0,240), 3)#穴あき部分を囲む（デバッグ用）
+            kensa_result = 2 # 破れあり(2)
+            print("穴あきあり")
         #cv2.imwrite("C:/startfile/g22025/image/2024/image_color.jpg", image_color)#ラベリング画像を保存（デバッグ用）
         
+        # 4カメラを並列に検査するので、結果はself.kensa_resultに直接入れずに戻り値で返す（run_kensaでまとめる）
+        return kensa_result
         
     ##QRコード読み取り----------------------------------------------------------------------------------------------------
     def read_qr(self, image):
@@ -617,6 +868,7 @@ class Camera:
         if self.is_start_ser:
             self.is_start_ser = False
             print("ラベル貼りと接続します")
+            import serial # シリアル通信（使う時だけ読み込む）
             self.ser = serial.Serial("COM5", 9600)#ポート番号が違う場合はこの部分を変更する
             print("初期動作を終了します")
         elif self.is_ser_finish:
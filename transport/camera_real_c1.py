@@ -11,6 +11,9 @@
 #update:2025/03/05
 #name:伊東
 #update_content:最終確認
+#
+#update:2026/10/18
+#update_content:カメラの画像取得をCaptureService（カメラごとのスレッド、一斉取得、取得時刻付き）に変更
 #########################################################################
 
 import cv2      # 画像処理ライブラリ（OpenCV）
@@ -23,6 +26,9 @@ import random
 import requests # サーバー通信用
 import datetime # 日付と時刻を扱う
 import serial   # シリアル通信（ラベル貼り機など外部機器と通信するため）
+import capture_service # 複数カメラの画像取得
+
+CAPTURE_FPS = 15 # 全カメラ一斉に画像を取得する周期（枚/秒）
 
 
 class Camera:
@@ -87,22 +93,24 @@ class Camera:
         #今回は面倒くさかったのでやっていない
         #やり方としては、それぞれのカメラで特定の場所を読取り、映った色やQRコードなどで判別する方法がよさそう
         #他言語を使用してポート番号を取得するのも出来そうである
-        self.cap_oshidashi = cv2.VideoCapture(3)#押出部カメラ
-        self.cap_fukuro = cv2.VideoCapture(1)#袋セット部カメラ
-        self.cap_qr = cv2.VideoCapture(2)#qr部カメラ
-        self.cap_kensa1 = cv2.VideoCapture(3)#検査部カメラ左上
-        self.cap_kensa2 = cv2.VideoCapture(4)#検査部カメラ右上
-        self.cap_kensa3 = cv2.VideoCapture(5)#検査部カメラ左下
-        self.cap_kensa4 = cv2.VideoCapture(6)#検査部カメラ右下
-
-        self.cap_oshidashi.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)#押出部カメラのサイズ
-        self.cap_fukuro.set(cv2.CAP_PROP_FRAME_WIDTH, 640)#袋セット部カメラのサイズ
-
-
-        #押出部のカメラ調整
-        self.cap_oshidashi.set(cv2.CAP_PROP_AUTOFOCUS, 0)#フォーカス自動調整
-        self.cap_oshidashi.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0)#露出自動調整
-        self.cap_oshidashi.set(cv2.CAP_PROP_EXPOSURE, -7)
+        #カメラ1台につき1つのスレッドで画像を取得する（1台が遅くても他のカメラは止まらない）
+        #カメラの設定は開いた後に書いた順に設定される
+        self.capture = capture_service.CaptureService({
+            'oshidashi': capture_service.OpenCvBackend(3, settings={#押出部カメラ
+                cv2.CAP_PROP_FRAME_WIDTH: 1920,#押出部カメラのサイズ
+                cv2.CAP_PROP_AUTOFOCUS: 0,#フォーカス自動調整
+                cv2.CAP_PROP_AUTO_EXPOSURE: 0,#露出自動調整
+                cv2.CAP_PROP_EXPOSURE: -7,
+            }),
+            'fukuro': capture_service.OpenCvBackend(1, settings={#袋セット部カメラ
+                cv2.CAP_PROP_FRAME_WIDTH: 640,#袋セット部カメラのサイズ
+            }),
+            'qr': capture_service.OpenCvBackend(2),#qr部カメラ
+            'kensa1': capture_service.OpenCvBackend(3),#検査部カメラ左上
+            'kensa2': capture_service.OpenCvBackend(4),#検査部カメラ右上
+            'kensa3': capture_service.OpenCvBackend(5),#検査部カメラ左下
+            'kensa4': capture_service.OpenCvBackend(6),#検査部カメラ右下
+        }, fps=CAPTURE_FPS)
         """
         袋セットのカメラ調整
         self.cap_fukuro.set(cv2.CAP_PROP_AUTOFOCUS, 0)#フォーカス自動調整
@@ -140,32 +148,31 @@ class Camera:
         #self.frame_kensa3 = cv2.imread("C:/startfile/g52024/image/kensa3_image.jpg", 1)
         #self.frame_kensa4 = cv2.imread("C:/startfile/g52024/image/kensa4_image.jpg", 1)
         
+        self.capture.start() # 各カメラのスレッドで画像の取得を開始
+        seq = 0 # 押出部カメラの画像の通し番号
+        
         while(1):
             #time.sleep(0.1)
-            #self.cap_oshidashi.set(cv2.CAP_PROP_EXPOSURE, -8)
             try:
                 if self.is_camera_shutdown:
                     break
                 
-                ##各カメラから画像を取得 (Webカメラからのリアルタイム処理)
-                ret1, self.frame_oshidashi = self.cap_oshidashi.read()
-                ret2, self.frame_fukuro = self.cap_fukuro.read()
-                ret3, self.frame_qr = self.cap_qr.read()
-                ret4, self.frame_kensa1 = self.cap_kensa1.read()
-                ret5, self.frame_kensa2 = self.cap_kensa2.read()
-                ret6, self.frame_kensa3 = self.cap_kensa3.read()
-                ret7, self.frame_kensa4 = self.cap_kensa4.read()
-                if ret1 == False: # 最初のカメラが読み込めなければループを抜ける
+                ##各カメラの最新の画像を取得 (Webカメラからのリアルタイム処理)
+                # 押出部カメラの新しい画像を待ち、他のカメラは各スレッドが取得済みの最新の画像を使う
+                image, seq, timestamp = self.capture.rings['oshidashi'].wait_new(seq, timeout=1.0)
+                if image is None: # 最初のカメラの画像が1秒以上来なければループを抜ける
                     break
+                self.frame_oshidashi = image
+                self.frame_fukuro = self.capture.rings['fukuro'].latest()[0]
+                self.frame_qr = self.capture.rings['qr'].latest()[0]
+                self.frame_kensa1 = self.capture.rings['kensa1'].latest()[0]
+                self.frame_kensa2 = self.capture.rings['kensa2'].latest()[0]
+                self.frame_kensa3 = self.capture.rings['kensa3'].latest()[0]
+                self.frame_kensa4 = self.capture.rings['kensa4'].latest()[0]
                 
                 if(self.finish_cap_oshidashi): # 終了信号が来たらカメラを解放
-                    self.cap_oshidashi.release()
-                    self.cap_fukuro.release()
-                    self.cap_qr.release()
-                    self.cap_kensa1.release()
-                    self.cap_kensa2.release()
-                    self.cap_kensa3.release()
-                    self.cap_kensa4.release()
+                    self.capture.stop()
+                    self.capture.print_stats()
                     cv2.destroyAllWindows()
                     time.sleep(5)
 
@@ -193,6 +200,7 @@ class Camera:
                 print("画像撮影プログラム(while中の例外)でエラーが発生しました")
                 time.sleep(5)
 
+        self.capture.stop()
         print("manage_cameraモジュール（カメラ管理モジュール）を終了します")
         self.is_manage_camera_shutdown = True#シャットダウン信号をTrueに
 
@@ -0,0 +1,275 @@
+#########################################################################
+#file:capture_service.py
+#date:2026/10/18
+#file_content:複数カメラの画像取得（カメラごとのスレッド、取得時刻・取りこぼし数の記録）
+#########################################################################
+
+##7台のカメラを1つのループで順番に read() すると、1台が遅いと全部のカメラが止まってしまう
+##このクラスではカメラ1台につき1つのスレッドで画像を取得する
+##・grab()（撮影した画像の確定）と retrieve()（画像のデコード）を分けて呼ぶ
+##  fpsを指定すると全カメラのスレッドが同じタイミング（トリガ）で一斉に grab() するので、
+##  各カメラの画像がほぼ同じ時刻のものになる。時間のかかる retrieve() はその後で各スレッドが行う
+##・grab() した時刻を画像の取得時刻として記録する
+##  （OpenCVのWebカメラではカメラ側の時刻を取得できないので、PC側で grab() が終わった時刻を使う）
+##・取得した画像はカメラごとの FrameRing に入れる（通し番号・取得時刻付き）
+##・カメラごとに取得枚数・失敗回数・取りこぼしたトリガ数を数える
+##・画像の取得方法（バックエンド）は差し替えられる
+##    OpenCvBackend     : cv2.VideoCapture（実機のカメラ）
+##    SyntheticBackend  : 画像を生成する（カメラの無いPCやLinuxでの動作確認用）
+##    （frame_source.py の画像ファイル・動画ファイルのバックエンドも同じ使い方）
+##
+##バックエンドのメソッド:
+##    open() → 開けたらTrue / grab() → 成功したらTrue / retrieve() → 画像（失敗はNone） / release()
+##
+##使い方:
+##    service = CaptureService({
+##        'oshidashi': OpenCvBackend(3, settings={cv2.CAP_PROP_FRAME_WIDTH: 1920}),
+##        'fukuro': OpenCvBackend(1),
+##    }, fps=15)
+##    service.start()
+##    image, seq, timestamp = service.rings['oshidashi'].wait_new(0, 1.0)
+##    service.stop()
+
+import threading
+import time
+import cv2
+import numpy as np
+import frame_ring
+
+
+##実機のカメラ（cv2.VideoCapture）
+class OpenCvBackend:
+    ##(self, デバイス番号(int) またはURL・ファイル名(str), settings(dict)={cv2.CAP_PROP_xxx: 値, ...}, api(int)=cv2.CAP_xxx)
+    def __init__(self, device, settings=None, api=cv2.CAP_ANY):
+        self.device = device
+        self.settings = settings or {}
+        self.api = api
+        self.cap = None
+
+    def open(self):
+        self.release()
+        self.cap = cv2.VideoCapture(self.device, self.api)
+        if not self.cap.isOpened():
+            return False
+        for prop, value in self.settings.items():
+            self.cap.set(prop, value)
+        return True
+
+    def grab(self):
+        return self.cap is not None and self.cap.grab()
+
+    def retrieve(self):
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return None
+        return frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+##画像を生成するカメラ（動作確認用）
+##fpsの間隔で新しい画像ができる（grab()は次の画像ができるまで待つ）
+##画像には通し番号が描かれる
+class SyntheticBackend:
+    ##(self, size(tuple)=(幅, 高さ), fps(float)=カメラのフレームレート, delay(float)=retrieve()にかかる時間(秒),
+    ## fail_every(int)=この枚数ごとにgrab()を失敗させる（0なら失敗しない）)
+    def __init__(self, size=(640, 480), fps=30.0, delay=0.0, fail_every=0):
+        self.size = size
+        self.fps = fps
+        self.delay = delay
+        self.fail_every = fail_every
+        self.count = 0
+        self.next_time = None
+
+    def open(self):
+        self.count = 0
+        self.next_time = time.perf_counter()
+        return True
+
+    def grab(self):
+        # 次の画像ができるまで待つ（実機のカメラと同じ動き）
+        wait = self.next_time - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_time = max(self.next_time + 1.0 / self.fps, time.perf_counter())
+        self.count = self.count + 1
+        if self.fail_every and self.count % self.fail_every == 0:
+            return False
+        return True
+
+    def retrieve(self):
+        if self.delay > 0:
+            time.sleep(self.delay)
+        width, height = self.size
+        frame = np.full((height, width, 3), (self.count * 7) % 256, np.uint8)
+        cv2.putText(frame, str(self.count), (10, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        return frame
+
+    def release(self):
+        pass
+
+
+##カメラ1台分の状態と統計
+class _Camera:
+    def __init__(self, name, backend, ring):
+        self.name = name
+        self.backend = backend
+        self.ring = ring
+        self.thread = None
+        self.is_open = False
+
+        ##統計
+        self.frame_count = 0    # 取得した画像の数
+        self.fail_count = 0     # grab()・retrieve()に失敗した回数
+        self.missed_count = 0   # 前の画像の処理中で間に合わなかったトリガの数
+        self.reopen_count = 0   # カメラを開き直した回数
+        self.last_timestamp = None # 最後に取得した画像の取得時刻
+        self.is_end = False        # 画像ファイル・動画ファイルを最後まで再生した
+
+
+class CaptureService:
+    ##初期設定
+    ##(self, {カメラの名前: バックエンド, ...}, fps(float)=全カメラ一斉に取得する周期、Noneなら各カメラの速さで取得,
+    ## rings(dict)={カメラの名前: FrameRing}（省略時は新しく作る。Camera.framesを渡すとそこに入れる）,
+    ## reopen_after(int)=続けてこの回数失敗したらカメラを開き直す)
+    def __init__(self, backends, fps=None, rings=None, reopen_after=30):
+        self.fps = fps
+        self.reopen_after = reopen_after
+        if rings is None:
+            rings = {}
+        for name in backends:
+            if name not in rings:
+                rings[name] = frame_ring.FrameRing()
+        self.rings = rings
+        self.cameras = [_Camera(name, backend, rings[name]) for name, backend in backends.items()]
+
+        self.is_running = False
+        self.trigger = threading.Condition() # 一斉に取得するためのトリガ
+        self.trigger_count = 0               # トリガの通し番号
+        self.trigger_thread = None
+
+    ##取得開始
+    def start(self):
+        self.is_running = True
+        for camera in self.cameras:
+            camera.is_open = camera.backend.open()
+            if not camera.is_open:
+                print("カメラを開けませんでした: " + camera.name)
+            camera.thread = threading.Thread(target=self._run_camera, args=(camera,), name='capture_' + camera.name)
+            camera.thread.daemon = True
+            camera.thread.start()
+        if self.fps is not None:
+            self.trigger_thread = threading.Thread(target=self._run_trigger, name='capture_trigger')
+            self.trigger_thread.daemon = True
+            self.trigger_thread.start()
+        return self
+
+    ##取得終了（カメラを解放する）
+    def stop(self):
+        self.is_running = False
+        with self.trigger:
+            self.trigger.notify_all()
+        for camera in self.cameras:
+            if camera.thread is not None:
+                camera.thread.join(2.0)
+        if self.trigger_thread is not None:
+            self.trigger_thread.join(2.0)
+        for camera in self.cameras:
+            camera.backend.release()
+
+    ##トリガ（fps周期で全カメラのスレッドを起こす）
+    def _run_trigger(self):
+        period = 1.0 / self.fps
+        next_time = time.perf_counter()
+        while self.is_running:
+            next_time = next_time + period
+            wait = next_time - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                next_time = time.perf_counter() # 遅れた場合は今から数え直す
+            with self.trigger:
+                self.trigger_count = self.trigger_count + 1
+                self.trigger.notify_all()
+
+    ##次のトリガを待つ
+    ##戻り値: 待ち始めてから来たトリガの通し番号
+    def _wait_trigger(self, last_trigger):
+        with self.trigger:
+            self.trigger.wait_for(lambda: self.trigger_count > last_trigger or not self.is_running)
+            return self.trigger_count
+
+    ##カメラ1台分の取得ループ
+    def _run_camera(self, camera):
+        last_trigger = 0
+        failures = 0
+        while self.is_running:
+            if self.fps is not None:
+                trigger = self._wait_trigger(last_trigger)
+                if not self.is_running:
+                    break
+                if last_trigger and trigger > last_trigger + 1:
+                    camera.missed_count = camera.missed_count + (trigger - last_trigger - 1)
+                last_trigger = trigger
+
+            ##画像の確定（ここで撮影時刻が決まる）→ デコード
+            try:
+                ok = camera.is_open and camera.backend.grab()
+                timestamp = time.time()
+                frame = camera.backend.retrieve() if ok else None
+            except Exception as e:
+                print("カメラの画像取得でエラーが発生しました: " + camera.name + " " + str(e))
+                frame = None
+
+            if frame is None:
+                if getattr(camera.backend, 'is_end', False):
+                    camera.is_end = True # 最後まで再生したので終了（frame_source.pyで loop=False の場合）
+                    break
+                camera.fail_count = camera.fail_count + 1
+                failures = failures + 1
+                if failures >= self.reopen_after:
+                    # 続けて失敗したらカメラを開き直す（USBの抜き差しなど）
+                    failures = 0
+                    camera.reopen_count = camera.reopen_count + 1
+                    camera.is_open = camera.backend.open()
+                if not camera.is_open:
+                    time.sleep(0.1)
+                continue
+
+            failures = 0
+            camera.ring.put(frame, timestamp)
+            camera.frame_count = camera.frame_count + 1
+            camera.last_timestamp = timestamp
+
+    ##全カメラが最後まで再生したか（frame_source.pyで loop=False の場合）
+    def is_end(self):
+        return all(camera.is_end for camera in self.cameras)
+
+    ##統計の取得
+    ##戻り値: {カメラの名前: {'frames': 取得枚数, 'failures': 失敗回数, 'missed': 取りこぼしたトリガ数, 'reopens': 開き直した回数, 'last_timestamp': 時刻}}
+    def stats(self):
+        return {camera.name: {
+            'frames': camera.frame_count,
+            'failures': camera.fail_count,
+            'missed': camera.missed_count,
+            'reopens': camera.reopen_count,
+            'last_timestamp': camera.last_timestamp,
+        } for camera in self.cameras}
+
+    ##統計の表示
+    def print_stats(self):
+        for name, stats in self.stats().items():
+            print(name + " : 取得 " + str(stats['frames']) + " 枚 / 失敗 " + str(stats['failures'])
+                  + " 回 / 取りこぼし " + str(stats['missed']) + " 回 / 開き直し " + str(stats['reopens']) + " 回")
+
+    ##同じトリガで取得した画像の取得時刻のずれ（秒）
+    ##全カメラの最新の画像の取得時刻の最大と最小の差
+    def latest_skew(self):
+        timestamps = [camera.ring.latest()[2] for camera in self.cameras]
+        timestamps = [t for t in timestamps if t is not None]
+        if len(timestamps) < 2:
+            return 0.0
+        return max(timestamps) - min(timestamps)
@@ -0,0 +1,352 @@
+#########################################################################
+#file:detector_service.py
+#date:2026/10/18
+#file_content:人（身体）検出の推論管理（複数カメラ・複数フレームのまとめ推論、推論周期の指定）
+#########################################################################
+
+##detect_handで1枚ずつ休みなく推論していた処理をまとめたもの
+##・カメラごとの FrameRing から新しい画像だけを集めて、まとめて（バッチで）推論する
+##  （通し番号が進んでいない画像・前回と同じ画像は推論しない）
+##・rate で1秒あたりの推論回数を指定する（カメラのfpsより低くすると、間の画像は飛ばす）
+##・frames_per_camera を2以上にすると、カメラごとに前回の推論以降の画像を最大その枚数までまとめて推論する
+##・gates={カメラの名前: MotionGate} を指定すると、動きが無い画像は推論しない（motion_gate.py）
+##・rois={カメラの名前: ROI} を指定すると、画像のROIの範囲だけを切り出して推論する
+##  （検出結果の座標は画像全体の座標に戻す。ROIはmask_roi()でマスク画像から求める）
+##・trackers={カメラの名前: PersonTracker} を指定すると、検出結果をフレーム間で対応付けて人ごとにIDを付ける（person_tracker.py）
+##  推論しなかった画像（動きが無い画像、detect_every枚に1枚だけ推論する間の画像）は、追跡の予測位置を検出結果とする
+##  detect_every を2以上にすると、人を追跡している間だけ detect_every 枚に1枚推論し、間の画像は追跡で補う
+##  （誰も追跡していない間は毎回推論するので、新しく入ってきた人の検出は遅れない）
+##・推論はDetectorのdetect()で行う（YOLOの他にONNX Runtime・OpenCV DNNにも差し替えられる。create_detector()で作る）
+##    detect([画像, ...]) → [検出結果(N×6のnumpy配列: x1, y1, x2, y2, 信頼度, クラス), ...]
+##
+##使い方:
+##    detector = YoloDetector(YOLO('yolov8n.pt'), classes=[0], conf=0.5)
+##    service = DetectorService(detector, {'oshidashi': camera.frames['oshidashi']}, rate=5)
+##    while True:
+##        detections = service.step()   # 次の推論時刻まで待ってから推論（新しい画像が無ければ [] ）
+##        if service.is_detected():
+##            ...
+
+import math
+import threading
+import time
+import cv2
+import numpy as np
+import frame_ring
+
+
+##YOLO（ultralytics）での推論
+class YoloDetector:
+    ##(self, model(YOLO), classes(list)=検出するクラスID, conf(float)=検出信頼度の閾値,
+    ## imgsz(int/tuple)=推論時の画像サイズ（int: 長辺, (高さ, 幅): 固定。Noneならモデルの設定）)
+    def __init__(self, model, classes=None, conf=0.5, imgsz=None):
+        self.model = model
+        self.classes = classes
+        self.conf = conf
+        self.imgsz = imgsz
+
+    ##まとめて推論
+    ##戻り値: 画像ごとの検出結果（N×6のnumpy配列）のリスト
+    def detect(self, images):
+        options = {'classes': self.classes, 'conf': self.conf, 'verbose': False}
+        if self.imgsz is not None:
+            options['imgsz'] = self.imgsz if isinstance(self.imgsz, int) else list(self.imgsz)
+        results = self.model.predict(source=list(images), **options)
+        return [_to_numpy(result.boxes.data) for result in results]
+
+
+##推論クラスを作る
+##(backend(str)='ultralytics'（PyTorch）/ 'onnxruntime' / 'opencv'（OpenCV DNN）, weights(str)=.ptファイル,
+## classes(list)=検出するクラスID, conf(float)=検出信頼度の閾値, imgsz(int/tuple)=推論時の画像サイズ（int: 正方形, (高さ, 幅)）,
+## threads(int)=推論スレッド数（onnxruntimeのみ。opencvはプロセス全体の設定が変わるので指定しない）)
+##onnxruntime・opencvは初回だけ.ptをONNX形式に変換する（yolo_onnx.py）
+def create_detector(backend, weights='yolov8n.pt', classes=None, conf=0.5, imgsz=640, threads=None):
+    if backend == 'ultralytics':
+        from ultralytics import YOLO # 使う時だけ読み込む（読込みに数秒かかる）
+        return YoloDetector(YOLO(weights), classes=classes, conf=conf, imgsz=imgsz)
+    import yolo_onnx
+    shape = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+    if backend == 'onnxruntime':
+        import onnxruntime # インストールされていなければ、変換する前にImportErrorにする
+        return yolo_onnx.OnnxDetector(yolo_onnx.export_onnx(weights, shape), classes=classes, conf=conf, threads=threads)
+    if backend == 'opencv':
+        return yolo_onnx.DnnDetector(yolo_onnx.export_onnx(weights, shape), shape, classes=classes, conf=conf)
+    raise ValueError("推論の方法は'ultralytics'・'onnxruntime'・'opencv'のどれかです: " + str(backend))
+
+
+##推論結果（torch.Tensorなど）をnumpy配列(N×6)に変換
+def _to_numpy(data):
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    return np.asarray(data, dtype=np.float32).reshape(-1, 6)
+
+
+##マスク画像から推論範囲(ROI)を求める
+##(mask(numpy配列)=マスク画像（グレー、白が範囲）, margin(float)=ROIの周りに広げる幅（画像の幅・高さに対する割合）)
+##戻り値: (x0, y0, x1, y1) 画像の幅・高さに対する割合（0.0～1.0）。マスクが空ならNone
+##割合で持つので、マスク画像とカメラ画像の解像度が違っても使える
+def mask_roi(mask, margin=0.02):
+    height, width = mask.shape[:2]
+    x, y, w, h = cv2.boundingRect(np.where(mask > 127, 255, 0).astype(np.uint8))
+    if w == 0 or h == 0:
+        return None
+    return (max(x / width - margin, 0.0), max(y / height - margin, 0.0),
+            min((x + w) / width + margin, 1.0), min((y + h) / height + margin, 1.0))
+
+
+##ROIで推論する時の画像サイズ(imgsz)
+##画像全体をbase_imgszで推論した時と同じ縮小率になるサイズ（strideの倍数）
+##→ 人の大きさ（画素数）は変わらずに、推論する画素数だけが減る
+##(roi=mask_roi()の戻り値, size(tuple)=カメラ画像の(幅, 高さ), base_imgsz(int)=画像全体で推論していた時のimgsz, stride(int)=モデルのストライド)
+def roi_imgsz(roi, size, base_imgsz=640, stride=32):
+    width, height = size
+    x0, y0, x1, y1 = roi
+    roi_long = max((x1 - x0) * width, (y1 - y0) * height) # ROIの長辺（画素）
+    imgsz = base_imgsz * roi_long / max(width, height)
+    return max(stride, int(math.ceil(imgsz / stride)) * stride)
+
+
+##画像からROIの範囲を切り出す（コピーしない）
+##戻り値: (切り出した画像, 左上のx座標, 左上のy座標)
+def crop_roi(image, roi):
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = roi
+    left, top = int(x0 * width), int(y0 * height)
+    right, bottom = int(math.ceil(x1 * width)), int(math.ceil(y1 * height))
+    return image[top:bottom, left:right], left, top
+
+
+##1枚の画像の検出結果
+class Detection:
+    def __init__(self, camera, seq, timestamp, boxes):
+        self.camera = camera       # カメラの名前
+        self.seq = seq             # 画像の通し番号
+        self.timestamp = timestamp # 画像の取得時刻
+        self.boxes = boxes         # 検出結果（N×6のnumpy配列: x1, y1, x2, y2, 信頼度, クラス）画像全体の座標
+        self.detected = len(boxes) > 0
+        self.time = time.time()    # 推論が終わった時刻
+        self.tracks = []           # 今回検出された確定済みの人(Track)（trackersを指定した場合）
+        self.predicted = False     # 推論せずに追跡の予測位置から作った結果ならTrue
+
+
+class DetectorService:
+    ##初期設定
+    ##(self, detector=detect()を持つ推論クラス, rings(dict)={カメラの名前: FrameRing},
+    ## rate(float)=1秒あたりの推論回数（Noneなら新しい画像が来るたびに推論）, frames_per_camera(int)=カメラ1台あたりの最大枚数,
+    ## gates(dict)={カメラの名前: MotionGate}（推論する前に動きの有無を調べるカメラ）,
+    ## rois(dict)={カメラの名前: ROI}（ROIの範囲だけで推論するカメラ）,
+    ## trackers(dict)={カメラの名前: PersonTracker}（検出結果を追跡するカメラ）,
+    ## detect_every(int)=人を追跡している間は、この枚数に1枚だけ推論する（trackersを指定したカメラのみ）)
+    def __init__(self, detector, rings, rate=5.0, frames_per_camera=1, gates=None, rois=None, trackers=None, detect_every=1):
+        self.detector = detector
+        self.rings = rings
+        self.gates = gates or {}
+        self.rois = rois or {}
+        self.trackers = trackers or {}
+        self.detect_every = detect_every
+        self.rate = rate
+        self.frames_per_camera = frames_per_camera
+        self.last_seqs = {name: 0 for name in rings}       # カメラごとの最後に推論した画像の通し番号
+        self.last_images = {name: None for name in rings}  # カメラごとの最後に推論した画像
+        self.detections = {name: None for name in rings}   # カメラごとの最新の検出結果（推論した結果）
+        self.predictions = {name: None for name in rings}  # カメラごとの最新の追跡の予測結果（推論しなかった画像）
+        self.skip_counts = {name: 0 for name in rings}     # カメラごとの推論せずに追跡で補った続けての枚数
+        self.next_time = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        ##統計
+        self.batch_count = 0      # 推論した回数
+        self.frame_count = 0      # 推論した画像の枚数
+        self.idle_count = 0       # 新しい画像が無くて推論しなかった回数
+        self.unchanged_count = 0  # 前回と同じ画像なので推論しなかった枚数
+        self.dropped_count = 0    # 推論が間に合わずに飛ばした画像の枚数
+        self.gated_count = 0      # 動きが無いので推論しなかった枚数
+        self.predicted_count = 0  # 推論せずに追跡の予測位置を使った枚数
+        self.infer_time = 0.0     # 推論時間の合計（秒）
+        self.infer_time_max = 0.0 # 推論時間の最大（秒）
+
+    ##推論1回分（次の推論時刻まで待ってから、新しい画像をまとめて推論する）
+    ##戻り値: 今回の検出結果(Detection)のリスト（新しい画像が無ければ空）
+    ##推論しなかった画像の追跡の予測結果（Detection.predicted=True）も含む
+    def step(self):
+        self._wait_next()
+        names, seqs, timestamps, images, skipped = self._collect()
+        predictions = self._predict(skipped)
+        if not images:
+            return predictions
+
+        # ROIが指定されたカメラは、ROIの範囲だけを推論する
+        offsets = []
+        for i, name in enumerate(names):
+            roi = self.rois.get(name)
+            if roi is None:
+                offsets.append(None)
+                continue
+            images[i], left, top = crop_roi(images[i], roi)
+            offsets.append((left, top))
+
+        start = time.perf_counter()
+        results = self.detector.detect(images)
+        elapsed = time.perf_counter() - start
+
+        # 検出結果の座標を画像全体の座標に戻す
+        for boxes, offset in zip(results, offsets):
+            if offset is not None and len(boxes) > 0:
+                boxes[:, [0, 2]] += offset[0]
+                boxes[:, [1, 3]] += offset[1]
+
+        detections = [Detection(name, seq, timestamp, boxes)
+                      for name, seq, timestamp, boxes in zip(names, seqs, timestamps, results)]
+
+        # 検出結果をフレーム間で対応付ける（カメラごとに通し番号の順）
+        for detection in detections:
+            tracker = self.trackers.get(detection.camera)
+            if tracker is not None:
+                detection.tracks = tracker.update(detection.boxes, detection.timestamp)
+        with self.lock:
+            for detection in detections:
+                self.detections[detection.camera] = detection
+            self.batch_count = self.batch_count + 1
+            self.frame_count = self.frame_count + len(images)
+            self.infer_time = self.infer_time + elapsed
+            self.infer_time_max = max(self.infer_time_max, elapsed)
+        return detections + predictions
+
+    ##推論しなかった画像の検出結果を追跡の予測位置から作る
+    ##(skipped=[(カメラの名前, 通し番号, 取得時刻), ...]（trackersを指定したカメラのみ）)
+    def _predict(self, skipped):
+        predictions = []
+        for name, seq, timestamp in skipped:
+            boxes, tracks = self.trackers[name].predict(timestamp)
+            detection = Detection(name, seq, timestamp, boxes)
+            detection.tracks = tracks
+            detection.predicted = True
+            predictions.append(detection)
+        if predictions:
+            with self.lock:
+                for detection in predictions:
+                    self.predictions[detection.camera] = detection
+                self.predicted_count = self.predicted_count + len(predictions)
+        return predictions
+
+    ##次の推論時刻まで待つ
+    def _wait_next(self):
+        now = time.perf_counter()
+        if self.next_time is None:
+            self.next_time = now
+        if self.rate:
+            wait = self.next_time - now
+            if wait > 0:
+                time.sleep(wait)
+            self.next_time = max(self.next_time + 1.0 / self.rate, time.perf_counter())
+        else:
+            # 推論周期の指定が無い場合は、新しい画像が来るまで少しずつ待つ
+            for name, ring in self.rings.items():
+                if ring.latest()[1] > self.last_seqs[name]:
+                    return
+            time.sleep(0.01)
+
+    ##推論する画像を集める
+    ##戻り値: (カメラの名前のリスト, 通し番号のリスト, 取得時刻のリスト, 画像のリスト,
+    ##        推論せずに追跡で補う画像のリスト [(カメラの名前, 通し番号, 取得時刻), ...])
+    def _collect(self):
+        names, seqs, timestamps, images = [], [], [], []
+        skipped = []
+        is_new = False
+        for name, ring in self.rings.items():
+            image, seq, timestamp = ring.latest()
+            last_seq = self.last_seqs[name]
+            if seq <= last_seq:
+                continue # 通し番号が進んでいない
+            is_new = True
+            first = max(last_seq + 1, seq - self.frames_per_camera + 1)
+            self.dropped_count = self.dropped_count + (first - last_seq - 1)
+            self.last_seqs[name] = seq
+            for s in range(first, seq + 1):
+                if s == seq:
+                    frame = image
+                else:
+                    frame, timestamp_s = ring.get(s)
+                    if frame is None:
+                        self.dropped_count = self.dropped_count + 1
+                        continue
+                if frame_ring.same_image(frame, self.last_images[name]):
+                    # 前回と同じ画像（静止画の再生など）は推論しない（画像は書込み禁止なので中身も同じ）
+                    self.unchanged_count = self.unchanged_count + 1
+                    continue
+                self.last_images[name] = frame
+                frame_time = timestamp if s == seq else timestamp_s
+                tracker = self.trackers.get(name)
+                gate = self.gates.get(name)
+                if gate is not None and not gate.check(frame):
+                    self.gated_count = self.gated_count + 1 # 動きが無い（前回の検出結果のまま）
+                    if tracker is not None:
+                        skipped.append((name, s, frame_time))
+                    continue
+                if tracker is not None and self.skip_counts[name] + 1 < self.detect_every and tracker.is_tracking():
+                    # 人を追跡している間は detect_every 枚に1枚だけ推論し、間の画像は追跡で補う
+                    self.skip_counts[name] = self.skip_counts[name] + 1
+                    skipped.append((name, s, frame_time))
+                    continue
+                self.skip_counts[name] = 0
+                names.append(name)
+                seqs.append(s)
+                timestamps.append(frame_time)
+                images.append(frame)
+        if not is_new:
+            self.idle_count = self.idle_count + 1
+        return names, seqs, timestamps, images, skipped
+
+    ##いずれかのカメラの最新の検出結果で検出ありか
+    def is_detected(self):
+        with self.lock:
+            return any(d is not None and d.detected for d in self.detections.values())
+
+    ##カメラごとの最新の検出結果
+    ##戻り値: {カメラの名前: Detection（まだ無ければNone）}
+    def latest(self):
+        with self.lock:
+            return dict(self.detections)
+
+    ##別スレッドで推論を続ける（stop()で終了）
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='detector')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.step()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(2.0)
+
+    ##統計の取得
+    def stats(self):
+        with self.lock:
+            return {
+                'batches': self.batch_count,
+                'frames': self.frame_count,
+                'idle': self.idle_count,
+                'unchanged': self.unchanged_count,
+                'dropped': self.dropped_count,
+                'gated': self.gated_count,
+                'predicted': self.predicted_count,
+                'infer_mean': self.infer_time / self.batch_count if self.batch_count else 0.0,
+                'infer_max': self.infer_time_max,
+            }
+
+    ##統計の表示
+    def print_stats(self):
+        stats = self.stats()
+        print("推論 : " + str(stats['batches']) + " 回 / " + str(stats['frames']) + " 枚"
+              + "（新しい画像なし " + str(stats['idle']) + " 回 / 同じ画像 " + str(stats['unchanged'])
+              + " 枚 / 飛ばした画像 " + str(stats['dropped']) + " 枚 / 動きなし " + str(stats['gated']) + " 枚 / 追跡で補った画像 " + str(stats['predicted']) + " 枚）")
+        print("推論時間 : 平均 " + format(stats['infer_mean'] * 1000, '.1f') + " ms / 最大 "
+              + format(stats['infer_max'] * 1000, '.1f') + " ms")
@@ -0,0 +1,99 @@
+#########################################################################
+#file:frame_ring.py
+#date:2026/10/18
+#file_content:カメラ画像の受け渡し用リングバッファ（スレッド間で安全に最新の画像を共有）
+#########################################################################
+
+##manage_camera（画像を取得するスレッド）から detect_hand・manage_image_processing（画像を使うスレッド）へ
+##カメラ画像を受け渡すためのリングバッファ（カメラ1台につき1つ）
+##・画像ごとに通し番号(seq)と取得時刻(timestamp)を付ける
+##・画像はコピーせずに書込み禁止のview（同じメモリを参照する配列）にして保持し、そのまま渡す（使う側でのcopy()は不要）
+##  画像を書き換えたい場合は使う側で .copy() する（putに渡した配列自体は書込み禁止にしない）
+##・wait_new() で新しい画像が来るまで待てる（同じ画像を何度も処理しない）
+##・直近 capacity 枚の画像を保持する（通し番号を指定して取り出せる）
+##
+##使い方:
+##    ring = FrameRing()
+##    ring.put(frame)                                   # 画像を取得するスレッド
+##    image, seq, timestamp = ring.latest()             # 最新の画像（まだ無ければ (None, 0, None)）
+##    image, seq, timestamp = ring.wait_new(seq, 0.5)   # seqより新しい画像が来るまで待つ（タイムアウトは image=None）
+
+import threading
+import time
+
+
+class FrameRing:
+    ##初期設定
+    ##(self, capacity(int)=保持する画像の枚数)
+    def __init__(self, capacity=4):
+        self.capacity = capacity
+        self.images = [None] * capacity     # 画像
+        self.seqs = [0] * capacity          # 画像の通し番号（1から）
+        self.timestamps = [None] * capacity # 画像の取得時刻
+        self.seq = 0                        # 最新の画像の通し番号（まだ無ければ0）
+        self.condition = threading.Condition()
+
+    ##画像の追加
+    ##put(画像(numpy配列), timestamp(float)=取得時刻（省略時は現在時刻）)
+    ##画像はコピーせずに書込み禁止のviewを保持するので、渡した後に同じ配列を書き換えないこと
+    ##戻り値: 通し番号
+    def put(self, image, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        view = image.view()
+        view.setflags(write=False)
+        with self.condition:
+            self.seq = self.seq + 1
+            index = self.seq % self.capacity
+            self.images[index] = view
+            self.seqs[index] = self.seq
+            self.timestamps[index] = timestamp
+            self.condition.notify_all()
+            return self.seq
+
+    ##最新の画像
+    ##戻り値: (画像, 通し番号, 取得時刻)（まだ無ければ (None, 0, None)）
+    def latest(self):
+        with self.condition:
+            return self._latest()
+
+    def _latest(self):
+        if self.seq == 0:
+            return None, 0, None
+        index = self.seq % self.capacity
+        return self.images[index], self.seq, self.timestamps[index]
+
+    ##新しい画像が来るまで待つ
+    ##wait_new(最後に受け取った通し番号(int), timeout(float)=最大待ち時間(秒)、Noneなら無制限)
+    ##戻り値: (最新の画像, 通し番号, 取得時刻)（タイムアウトした場合は (None, last_seq, None)）
+    ##処理が間に合わずに飛ばした画像の枚数は 通し番号 - last_seq - 1
+    def wait_new(self, last_seq=0, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > last_seq, timeout):
+                return None, last_seq, None
+            return self._latest()
+
+    ##最初の画像が来るまで待つ
+    ##戻り値: 画像が来たらTrue（タイムアウトはFalse）
+    def wait_first(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.seq > 0, timeout)
+
+    ##通し番号を指定して画像を取り出す
+    ##戻り値: (画像, 取得時刻)（既に上書きされた・まだ来ていない場合は (None, None)）
+    def get(self, seq):
+        with self.condition:
+            index = seq % self.capacity
+            if seq <= 0 or self.seqs[index] != seq:
+                return None, None
+            return self.images[index], self.timestamps[index]
+
+
+##同じ画像か（putのたびにviewを作るので、同じ配列を続けてputした場合も同じ画像とする）
+##静止画の再生などで同じ画像を何度も処理しないために使う
+def same_image(a, b):
+    if a is b:
+        return True
+    if a is None or b is None or a.base is None or a.base is not b.base:
+        return False
+    return a.shape == b.shape and a.strides == b.strides and a.ctypes.data == b.ctypes.data
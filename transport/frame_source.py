@@ -0,0 +1,170 @@
+#########################################################################
+#file:frame_source.py
+#date:2026/10/18
+#file_content:画像ファイル・動画ファイルを再生するカメラ（実機のカメラが無い環境での動作確認・性能測定用）
+#########################################################################
+
+##実機のカメラの代わりに、画像ファイル・フォルダ・動画ファイルの画像を順番に返すバックエンド
+##capture_service.py の OpenCvBackend と同じメソッド（open/grab/retrieve/release）を持つので、
+##CaptureService にそのまま渡せる（Camera.manage_camera からも同じように使える）
+##・fpsを指定するとその間隔で再生する。Noneなら待たずにできるだけ速く再生する
+##  （CaptureServiceのfpsで一斉に取得する場合はNoneにする）
+##・loop=Trueなら最後まで再生したら最初に戻る。Falseなら最後で終わる（is_end が True になる）
+##・ImageFileBackend の preload=True は最初に全部の画像を読み込んでおく（再生中のファイル読込みをなくす）
+##
+##使い方:
+##    backend = create_backend("image/2025")                   # フォルダ内の画像（ファイル名順）
+##    backend = create_backend("image/2024/kensa*_image.jpg")  # ワイルドカード
+##    backend = create_backend("video.mp4", fps=30)            # 動画ファイル
+##    backend.open()
+##    while backend.grab():
+##        image = backend.retrieve()
+
+import glob
+import os
+import time
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.wmv')
+
+
+##画像・動画の種類に合わせたバックエンドを作る
+##(source(str)=画像ファイル・フォルダ・ワイルドカード・動画ファイル、またはファイル名のリスト, fps(float)=再生速度,
+## loop(bool)=繰り返し再生, preload(bool)=画像を最初に全部読み込む（画像の場合のみ）)
+def create_backend(source, fps=None, loop=True, preload=False):
+    if isinstance(source, str) and source.lower().endswith(VIDEO_EXTENSIONS):
+        return VideoFileBackend(source, fps=fps, loop=loop)
+    return ImageFileBackend(source, fps=fps, loop=loop, preload=preload)
+
+
+##再生間隔の調整（fpsの間隔になるまで待つ）
+class _Pacer:
+    def __init__(self, fps):
+        self.fps = fps
+        self.next_time = None
+
+    def reset(self):
+        self.next_time = time.perf_counter()
+
+    def wait(self):
+        if not self.fps:
+            return
+        wait = self.next_time - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_time = max(self.next_time + 1.0 / self.fps, time.perf_counter())
+
+
+##画像ファイルの再生
+class ImageFileBackend:
+    ##(self, source(str/list)=画像ファイル・フォルダ・ワイルドカード、またはファイル名のリスト, fps(float)=再生速度,
+    ## loop(bool)=繰り返し再生, preload(bool)=画像を最初に全部読み込む, flags(int)=cv2.imreadのフラグ)
+    def __init__(self, source, fps=None, loop=True, preload=False, flags=cv2.IMREAD_COLOR):
+        self.source = source
+        self.loop = loop
+        self.preload = preload
+        self.flags = flags
+        self.pacer = _Pacer(fps)
+        self.paths = []
+        self.images = None
+        self.index = -1
+        self.is_end = False
+
+    ##再生するファイル名のリスト（ファイル名順）
+    def list_paths(self):
+        source = self.source
+        if not isinstance(source, str):
+            return list(source)
+        if os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in os.listdir(source)]
+            return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+        if os.path.isfile(source):
+            return [source]
+        return sorted(glob.glob(source))
+
+    def open(self):
+        self.paths = self.list_paths()
+        if not self.paths:
+            return False
+        self.images = None
+        if self.preload:
+            self.images = [cv2.imread(path, self.flags) for path in self.paths]
+        self.index = -1
+        self.is_end = False
+        self.pacer.reset()
+        return True
+
+    def grab(self):
+        if not self.paths or self.is_end:
+            return False
+        self.pacer.wait()
+        self.index = self.index + 1
+        if self.index >= len(self.paths):
+            if not self.loop:
+                self.is_end = True
+                return False
+            self.index = 0
+        return True
+
+    def retrieve(self):
+        if self.images is not None:
+            return self.images[self.index]
+        return cv2.imread(self.paths[self.index], self.flags)
+
+    ##現在の画像のファイル名
+    def current_path(self):
+        return self.paths[self.index]
+
+    def release(self):
+        self.images = None
+
+
+##動画ファイルの再生
+class VideoFileBackend:
+    ##(self, path(str)=動画ファイル, fps(float)=再生速度（Noneならできるだけ速く）, loop(bool)=繰り返し再生)
+    def __init__(self, path, fps=None, loop=True):
+        self.path = path
+        self.loop = loop
+        self.pacer = _Pacer(fps)
+        self.cap = None
+        self.is_end = False
+
+    def open(self):
+        self.release()
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        self.is_end = False
+        self.pacer.reset()
+        return True
+
+    ##動画ファイルに記録されているフレームレート（再生速度を合わせる時に使う）
+    def native_fps(self):
+        if self.cap is None:
+            return None
+        return self.cap.get(cv2.CAP_PROP_FPS) or None
+
+    def grab(self):
+        if self.cap is None or self.is_end:
+            return False
+        self.pacer.wait()
+        if self.cap.grab():
+            return True
+        if not self.loop:
+            self.is_end = True
+            return False
+        # 最後まで再生したら最初に戻る
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self.cap.grab()
+
+    def retrieve(self):
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return None
+        return frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
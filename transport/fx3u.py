@@ -3,6 +3,9 @@
 #date:2024/09/20
 #name:伊東
 #file_content:fx3uシリーズ伝文コマンド
+#UPDATE: 2026/10/18 (セッションモード追加：TCP接続を使い回し、失敗時は再接続)
+#UPDATE: 2026/10/18 (複数デバイスの一括読出し・一括書込みを追加)
+#UPDATE: 2026/10/18 (バイナリコードの電文に対応)
 #########################################################################
 
 ##自作の伝文作成プログラムなので動作保証はできない
@@ -10,152 +13,207 @@
 ##使用からきちんと作って汎用性の高いライブラリを作ることが出来たら素晴らしい
 
 import socket
+import threading
 import time
+import fx3u_frame
 
 class Fx3u:
     
     ##Fx3uクラス初期設定
-    ##(self, 相手IPアドレス(String), 相手ポート番号(int), 送信サイズ(int))
-    def __init__(self, ip, port, bufsize):
+    ##(self, 相手IPアドレス(String), 相手ポート番号(int), 送信サイズ(int), timeout=float秒,
+    ## session(bool)=TrueでTCP接続を使い回す, retry(int)=セッションモードで通信に失敗した時の再接続・再送回数,
+    ## code(str)='ascii'または'binary'=電文のコード)
+    def __init__(self, ip, port, bufsize, timeout=5.0, session=False, retry=1, code='ascii'):
         self.ip = ip
         self.port = port
         self.bufsize = bufsize
+        self.timeout = timeout
+        
+        ##セッションモード
+        ##Trueの場合、1回接続したTCP接続を切らずに全ての電文で使い回す
+        ##Falseの場合は従来通り、電文ごとに接続→送受信→切断する
+        self.session = session
+        self.retry = retry
+        self.client = None
+        self.lock = threading.Lock()
+        
+        ##電文のコード（ASCIIコード or バイナリコード）
+        ##従来の関数(read_bitdeviceなど)はASCIIコード専用
+        self.code = code
+        self.codec = fx3u_frame.CODEC[code]
+    
+    ##セッション開始
+    ##with Fx3u(...) as fx3u: の形でも使用できる
+    def open(self):
+        with self.lock:
+            self.session = True
+            if self.client is None:
+                self.client = self._create_socket()
+        return self
+    
+    ##セッション終了
+    def close(self):
+        with self.lock:
+            self._close_socket()
+    
+    def __enter__(self):
+        return self.open()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    ##ソケット作成（PLCに接続）
+    def _create_socket(self):
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client.settimeout(self.timeout)
+        client.connect((self.ip, self.port))
+        return client
+    
+    ##ソケットを閉じる
+    def _close_socket(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except OSError:
+                pass
+            self.client = None
+    
+    ##電文の送受信
+    ##PLCからの返信を文字列（バイナリコードはバイト列）で返す（失敗時は空）
+    ##セッションモードでは接続が切れていたら接続し直して再送する
+    ##TCPは電文の区切りが無いので、応答電文の長さ（送信した電文から決まる）を受信するまで読む
+    ##タイムアウトした場合は、応答の途中から読んでしまわないように接続し直す
+    def _send_recv(self, msg):
+        with self.lock:
+            if self.session:
+                count = self.retry + 1
+            else:
+                count = 1
+            
+            for i in range(count):
+                try:
+                    if self.client is None:
+                        self.client = self._create_socket()
+                    
+                    self._drain()
+                    ##PLCに送信
+                    self.client.sendall(msg)
+                    ##PLCからの返信情報
+                    response = self._recv_response(msg)
+                    
+                    if not self.session:
+                        self._close_socket()
+                    return self.codec.decode(response)
+                
+                except socket.timeout:
+                    print("PLC応答がタイムアウトしました")
+                except OSError:
+                    print("PLCに接続できませんでした")
+                
+                self._close_socket()
+            
+            return self.codec.decode(b'')
+    
+    ##応答電文の受信
+    ##応答電文の長さになるまで受信する（長さを超えた分は捨てる）
+    def _recv_response(self, msg):
+        response = b''
+        length = None
+        while length is None or len(response) < length:
+            data = self.client.recv(self.bufsize)
+            ##相手から切断された
+            if not data:
+                raise ConnectionResetError
+            response = response + data
+            length = self.codec.frame_length(msg, response)
+        return response[:length]
+    
+    ##受信済みのデータを読み捨てる（前の応答に付いていたダミーなど）
+    def _drain(self):
+        self.client.setblocking(False)
+        try:
+            while True:
+                data = self.client.recv(self.bufsize)
+                if not data:
+                    raise ConnectionResetError # 相手から切断された
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.client.settimeout(self.timeout)
         
     
     ##終了信号
     def finish_signal(self):
-        try:
-            print("終了信号を送信します")
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client.connect((self.ip, self.port))
-
-            msg = '00000000'
-            msg = msg.encode('latin-1')
-            client.send(msg)
-            ##PLCからの返信情報
-            response = client.recv(1024)
-
-            response = response.decode()
-
-            client.close()
+        print("終了信号を送信します")
+        msg = '00000000'
+        msg = msg.encode('latin-1')
+        ##PLCに送信し、返信情報を受け取る
+        response = self._send_recv(msg)
+        if response:
             print("終了信号が正しく送信されました")
-        
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
 
     ##読出し(ワード単位)
     ##PLCからの返信を戻り値
     ##read(デバイス番号(str), デバイス点数(int))
     def read_worddevice(self, device, device_point):
-        try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            #client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            client.connect((self.ip, self.port))
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '00FF000A4D20'
-                
-            elif device[0:1] == 'D':
-                msg = '01FF000A4420'
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '00FF000A4D20'
             
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            ##デバイス点数指定
-            msg = msg + format(int(device_point), '02x') + '00'
-            ##バイト型に変換
-            msg = msg.encode('latin-1')
-            #print(type(msg))
-
-            ##PLCに送信
-            client.send(msg)
-            ##PLCからの返信情報
-            response = client.recv(1024)
-            response = response.decode()
-            client.close()
-            return response
-        
+        elif device[0:1] == 'D':
+            msg = '01FF000A4420'
         
-            
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        ##デバイス点数指定
+        msg = msg + format(int(device_point), '02x') + '00'
+        ##バイト型に変換
+        msg = msg.encode('latin-1')
+        #print(type(msg))
+
+        ##PLCに送信し、返信情報を受け取る
+        return self._send_recv(msg)
     
     ##読出し(ビット単位)
     ##PLCからの返信を戻り値
     ##read(デバイス番号(str))
     def read_bitdevice(self, device):
-        try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            #client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            client.connect((self.ip, self.port))
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '00FF000A4D20'
-            
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            ##デバイス点数指定
-            msg = msg + '0400'
-            ##バイト型に変換
-            msg = msg.encode('latin-1')
-
-            ##PLCに送信
-            client.send(msg)
-
-            ##PLCからの返信情報
-            response = client.recv(1024)
-
-            response = response.decode()
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '00FF000A4D20'
+        
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        ##デバイス点数指定
+        msg = msg + '0400'
+        ##バイト型に変換
+        msg = msg.encode('latin-1')
 
-            client.close()
-            
-            return response
-            
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
+        ##PLCに送信し、返信情報を受け取る
+        return self._send_recv(msg)
         
     ##書込み(ワード単位)
     ##PLCからの返信を戻り値
     ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
     def write_worddevice(self, device, device_point, write_content):
-        #try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client.connect((self.ip, self.port))
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '02FF000A4D20'
-                
-            elif device[0:1] == 'D':
-                msg = '03FF000A4420'
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '02FF000A4D20'
             
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            ##デバイス点数指定
-            msg = msg + format(int(device_point), '02x') + '00'
-            #書き込み内容
-            msg = msg + format(int(write_content), '04x')
-            #バイト型に変換
-            msg = msg.encode('latin-1')
-
-            #PLCに送信
-            client.send(msg)
-
-            #PLCからの返信情報
-            response = client.recv(1024)
-
-            response = response.decode()
+        elif device[0:1] == 'D':
+            msg = '03FF000A4420'
+        
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        ##デバイス点数指定
+        msg = msg + format(int(device_point), '02x') + '00'
+        #書き込み内容
+        msg = msg + format(int(write_content), '04x')
+        #バイト型に変換
+        msg = msg.encode('latin-1')
 
-            client.close()
-            ##PLCからの返信を戻り値に
-            return response
-            
-        #except ConnectionRefusedError:
-        #    print("PLCに接続できませんでした")
+        ##PLCに送信し、返信を戻り値に
+        return self._send_recv(msg)
 
     ##書込み(ワード単位)
     ##PLCからの返信を戻り値
@@ -163,79 +221,75 @@ class Fx3u:
     ##デバイス点数が2点の時に使用する
     ##本来であれば1点の時と2点の時でモジュールを返るのは良くないが、面倒くさかったので別モジュールにした
     def write_worddevice2(self, device, device_point, write_content1, write_content2):
-        try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client.connect((self.ip, self.port))
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '02FF000A4D20'
-                
-            elif device[0:1] == 'D':
-                msg = '03FF000A4420'
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '02FF000A4D20'
             
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            ##デバイス点数指定
-            msg = msg + format(int(device_point), '02x') + '00'
-            #書き込み内容
-            msg = msg + format(int(write_content1), '04x')
-            msg = msg + format(int(write_content2), '04x')
-            #バイト型に変換
-            msg = msg.encode('latin-1')
-
-            #PLCに送信
-            client.send(msg)
-
-            #PLCからの返信情報
-            response = client.recv(1024)
-
-            response = response.decode()
+        elif device[0:1] == 'D':
+            msg = '03FF000A4420'
+        
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        ##デバイス点数指定
+        msg = msg + format(int(device_point), '02x') + '00'
+        #書き込み内容
+        msg = msg + format(int(write_content1), '04x')
+        msg = msg + format(int(write_content2), '04x')
+        #バイト型に変換
+        msg = msg.encode('latin-1')
 
-            client.close()
-            ##PLCからの返信を戻り値に
-            return response
-            
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
+        ##PLCに送信し、返信を戻り値に
+        return self._send_recv(msg)
             
             
     ##書込み(ビット単位)
     ##PLCからの返信を戻り値
     ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
     def write_bitdevice(self, device, write_content):
-        try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            #client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            client.connect((self.ip, self.port))
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '02FF000A4D20'
-            
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            ##デバイス点数指定
-            msg = msg + '0400'
-            #書き込み内容
-            msg = msg + str(write_content) +'000'
-            #バイト型に変換
-            msg = msg.encode('latin-1')
-
-            #PLCに送信
-            client.send(msg)
-
-            #PLCからの返信情報
-            response = client.recv(4096)
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '02FF000A4D20'
+        
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        ##デバイス点数指定
+        msg = msg + '0400'
+        #書き込み内容
+        msg = msg + str(write_content) +'000'
+        #バイト型に変換
+        msg = msg.encode('latin-1')
 
-            response = response.decode()
+        ##PLCに送信し、返信を戻り値に
+        return self._send_recv(msg)
 
-            client.close()
-            ##PLCからの返信を戻り値に
-            return response
-            
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
-            
\ No newline at end of file
+    ##複数デバイスの読出し
+    ##同じ種類で番号が近いデバイスは1つの電文にまとめて読み出す
+    ##read_devices([デバイス番号(str) または (デバイス番号(str), デバイス点数(int)), ...])
+    ##戻り値: {'M20': True, ..., 'D91': 0, ...}（Mはbool、Dはint）
+    ##例: read_devices([('M20', 4), ('M154', 4), ('D91', 10)]) → M・Dの2電文
+    def read_devices(self, devices):
+        return fx3u_frame.read_devices(self._send_recv, devices, self.codec)
+    
+    ##複数デバイスの書込み
+    ##連続した番号は一括書込み、飛び飛びの番号はランダム書込みの電文にまとめる
+    ##write_devices({デバイス番号(str): 書込み内容(int または intのリスト), ...})
+    ##戻り値: 送信した電文の数
+    ##例: write_devices({'D50': 2026, 'D51': 10, 'D52': 18}) → 1電文
+    def write_devices(self, values):
+        return fx3u_frame.write_devices(self._send_recv, values, self.codec)
+    
+    ##読出し(ビット単位、値で返す)
+    ##read_bits(デバイス番号(str), デバイス点数(int))
+    ##戻り値: boolのnumpy配列（ASCIIコード・バイナリコードどちらでも使用可）
+    def read_bits(self, device, device_point):
+        kind, start = fx3u_frame.parse_device(device)
+        response = self._send_recv(self.codec.build_batch_read(kind, start, device_point))
+        return self.codec.parse_bits(response, device_point)
+    
+    ##読出し(ワード単位、値で返す)
+    ##read_words(デバイス番号(str), デバイス点数(int))
+    ##戻り値: uint16のnumpy配列（ASCIIコード・バイナリコードどちらでも使用可）
+    def read_words(self, device, device_point):
+        kind, start = fx3u_frame.parse_device(device)
+        response = self._send_recv(self.codec.build_batch_read(kind, start, device_point))
+        return self.codec.parse_words(response, device_point)
@@ -0,0 +1,216 @@
+#########################################################################
+#file:fx3u_async.py
+#date:2026/10/18
+#file_content:fx3uシリーズ伝文コマンド（asyncio版、UDP通信）
+#########################################################################
+
+##fx3u_udp.py の Fx3u を asyncio で書き直したもの
+##複数の読出し・書込みの電文を応答を待たずに続けて送信（パイプライン化）できる
+##電文ごとにタイムアウトを設定するので、1つの電文の応答待ちで他の電文が止まることはない
+##
+##使い方:
+##    async with AsyncFx3u("192.168.1.254", 5000, local_port=4001) as fx3u:
+##        values, n = await asyncio.gather(
+##            fx3u.read_devices([('M20', 4), ('M154', 4), ('D91', 10)]),
+##            fx3u.write_devices({'D20': 1, 'D23': [1, 1]}),
+##        )
+##
+##1Eフレームの電文には通し番号が無いので、応答はサブヘッダ（指令+0x80）で対応付ける
+##・同じ指令の電文は同時に1つだけ応答待ちにする（指令ごとのロック）
+##  違う指令の電文（Mの読出し・Dの読出し・書込みなど）は応答を待たずに続けて送信する
+##  （同じ指令の電文を続けて送ると、応答の順番が入れ替わった時にどちらの応答か区別できない）
+##・応答の長さが読出し点数と合っているかも確認する（合わなければConnectionError）
+##・タイムアウトした電文の応答が遅れて届いた場合に、次の電文の応答と取り違えないように
+##  タイムアウトしてから quarantine 秒間（短い時間）は同じ指令の電文を送らない（その間に届いた応答は捨てる）
+##  その後 timeout 秒間は、同じ指令で長さが合わない応答を遅れて届いた応答として捨てて、次の電文の応答を待ち続ける
+##  （1つの応答が失われただけで、同じ指令の電文が timeout 秒間止まらないように）
+##・解析できない応答（壊れたデータグラムなど）は捨てる
+
+import asyncio
+import time
+import fx3u_frame
+
+
+##UDPの受信処理
+##受信した応答電文をAsyncFx3uに渡すだけ
+class _Fx3uProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        self.client._on_response(data)
+
+    def error_received(self, exc):
+        self.client._on_error(exc)
+
+    def connection_lost(self, exc):
+        self.client._on_error(exc or ConnectionError("PLCとの通信ソケットが閉じられました"))
+
+
+##応答待ちの電文
+class _Pending:
+    def __init__(self, subheader, points, future):
+        self.subheader = subheader # 指令
+        self.points = points       # 読出し点数（応答の長さの確認に使う）
+        self.future = future       # 応答を受け取るFuture
+
+
+class AsyncFx3u:
+    ##AsyncFx3uクラス初期設定
+    ##(self, 相手IPアドレス(String), 相手ポート番号(int), local_port(int)=PCの受信ポート, timeout=float秒,
+    ## code(str)='ascii'または'binary', max_inflight(int)=応答待ちにできる電文の最大数,
+    ## quarantine(float)=タイムアウトした後に同じ指令の電文を送らない時間(秒))
+    def __init__(self, ip, port, local_port=None, timeout=5.0, code='ascii', max_inflight=4, quarantine=0.05):
+        self.ip = ip
+        self.port = port
+        self.local_port = local_port
+        self.timeout = timeout
+        self.quarantine = quarantine
+        self.codec = fx3u_frame.CODEC[code]
+        self.max_inflight = max_inflight
+
+        self.transport = None
+        self.pending = {}      # 応答待ちの電文 {応答のサブヘッダ: _Pending}
+        self.locks = {}        # 指令ごとのロック {応答のサブヘッダ: asyncio.Lock}
+        self.quiet_until = {}  # タイムアウト後に同じ指令の電文を送らない時刻 {応答のサブヘッダ: 時刻}
+        self.stale_until = {}  # タイムアウト後に長さが合わない応答を捨てる時刻 {応答のサブヘッダ: 時刻}
+        self.discard_count = 0 # 捨てた応答の数（遅れて届いた応答・解析できない応答）
+        self.inflight = None   # 応答待ちの電文数を制限するセマフォ（open()で作成）
+
+    ##通信開始
+    async def open(self):
+        if self.transport is None:
+            loop = asyncio.get_running_loop()
+            local_addr = None
+            if self.local_port is not None:
+                local_addr = ('0.0.0.0', self.local_port)
+            self.transport, protocol = await loop.create_datagram_endpoint(
+                lambda: _Fx3uProtocol(self),
+                local_addr=local_addr,
+                remote_addr=(self.ip, self.port))
+            self.inflight = asyncio.Semaphore(self.max_inflight)
+        return self
+
+    ##通信終了
+    async def close(self):
+        if self.transport is not None:
+            transport = self.transport
+            self.transport = None
+            transport.close()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    ##応答電文の受信
+    ##サブヘッダが同じ応答待ちの電文に対応付ける
+    def _on_response(self, data):
+        try:
+            response = self.codec.decode(data)
+            if not response:
+                return
+            subheader = self.codec.response_subheader(response)
+        except ValueError: # UnicodeDecodeErrorを含む
+            self.discard_count = self.discard_count + 1 # 解析できない応答は捨てる
+            return
+        entry = self.pending.get(subheader)
+        if entry is None or entry.future.done():
+            # 応答待ちの電文が無い（タイムアウトした電文の応答が遅れて届いたなど）ので捨てる
+            self.discard_count = self.discard_count + 1
+            return
+        try:
+            self.codec.check_response(response, entry.subheader)
+            self.codec.check_length(response, entry.subheader, entry.points)
+        except ConnectionError as e:
+            if self.stale_until.get(subheader, 0.0) > time.time():
+                # タイムアウトした電文の応答が遅れて届いたので捨てて、この電文の応答を待ち続ける
+                self.discard_count = self.discard_count + 1
+                return
+            del self.pending[subheader]
+            entry.future.set_exception(e)
+            return
+        del self.pending[subheader]
+        entry.future.set_result(response)
+
+    ##通信エラー
+    ##応答待ちの電文を全てエラーにする
+    def _on_error(self, exc):
+        pending = list(self.pending.values())
+        self.pending.clear()
+        for entry in pending:
+            if not entry.future.done():
+                entry.future.set_exception(ConnectionError("PLCに接続できませんでした: " + str(exc)))
+
+    ##電文の送受信
+    ##電文(bytes)を送信し、応答電文を返す（タイムアウト時・応答が合わない時はConnectionError）
+    ##(電文, 指令, points=読出し点数)
+    async def _request(self, msg, subheader, points=0):
+        if self.transport is None:
+            await self.open()
+        key = subheader + 0x80
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # 前にタイムアウトした同じ指令の電文の応答が遅れて届く間は送らない
+            wait = self.quiet_until.get(key, 0.0) - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            async with self.inflight:
+                future = asyncio.get_running_loop().create_future()
+                self.pending[key] = _Pending(subheader, points, future)
+                self.transport.sendto(msg)
+                try:
+                    return await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.pending.pop(key, None)
+                    self.quiet_until[key] = time.time() + self.quarantine
+                    self.stale_until[key] = time.time() + self.timeout
+                    raise ConnectionError("PLC応答がタイムアウトしました")
+
+    ##複数デバイスの読出し
+    ##電文を全て続けて送信し、応答をまとめて待つ
+    ##戻り値: {'M20': True, ..., 'D91': 0, ...}（Mはbool、Dはint）
+    async def read_devices(self, devices):
+        frames = fx3u_frame.plan_read(devices)
+        responses = await asyncio.gather(*[
+            self._request(self.codec.build_batch_read(kind, start, points), fx3u_frame.BATCH_READ[kind], points)
+            for kind, start, points in frames])
+        values = {}
+        for (kind, start, points), response in zip(frames, responses):
+            values.update(fx3u_frame.parse_batch_read(self.codec, response, kind, start, points))
+        return fx3u_frame.select_devices(values, devices)
+
+    ##複数デバイスの書込み
+    ##戻り値: 送信した電文の数
+    async def write_devices(self, values):
+        requests = []
+        for frame in fx3u_frame.plan_write(values):
+            if frame[0] == 'batch':
+                kind, start, data = frame[1:]
+                subheader = fx3u_frame.BATCH_WRITE[kind]
+                msg = self.codec.build_batch_write(kind, start, data)
+            else:
+                kind, items = frame[1:]
+                subheader = fx3u_frame.RANDOM_WRITE[kind]
+                msg = self.codec.build_random_write(kind, items)
+            requests.append((msg, subheader))
+
+        responses = await asyncio.gather(*[self._request(msg, subheader) for msg, subheader in requests])
+        for (msg, subheader), response in zip(requests, responses):
+            self.codec.check_response(response, subheader)
+        return len(requests)
+
+    ##読出し(ビット単位)
+    ##戻り値: boolのnumpy配列
+    async def read_bits(self, device, device_point):
+        kind, start = fx3u_frame.parse_device(device)
+        response = await self._request(self.codec.build_batch_read(kind, start, device_point), fx3u_frame.BATCH_READ[kind], device_point)
+        return self.codec.parse_bits(response, device_point)
+
+    ##読出し(ワード単位)
+    ##戻り値: uint16のnumpy配列
+    async def read_words(self, device, device_point):
+        kind, start = fx3u_frame.parse_device(device)
+        response = await self._request(self.codec.build_batch_read(kind, start, device_point), fx3u_frame.BATCH_READ[kind], device_point)
+        return self.codec.parse_words(response, device_point)
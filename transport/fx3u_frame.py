@@ -0,0 +1,418 @@
+#########################################################################
+#file:fx3u_frame.py
+#date:2026/10/18
+#file_content:fx3uシリーズ伝文（1Eフレーム）の一括読出し・一括書込み
+#UPDATE: 2026/10/18 バイナリコードの電文に対応（ASCIIコードと切替え）
+#########################################################################
+
+##複数のデバイスを、できるだけ少ない電文にまとめて読み書きする
+##fx3u.py(TCP) と fx3u_udp.py(UDP) の両方の Fx3u クラスから使用する
+##
+##読出し: 同じ種類のデバイスで番号が近いものは1つの一括読出し電文にまとめる
+##        （例: M20～M23 と M154～M157 は M20～M157 の1電文で読む）
+##        1Eフレームにはランダム読出しが無いので、MとDで最低2電文になる
+##書込み: 連続した番号は一括書込み(02/03)、飛び飛びの番号はランダム書込み(04/05)にまとめる
+##
+##電文のコードはASCIIコードとバイナリコードの2種類（PLCのENET設定と合わせる）
+##バイナリコードは電文の長さがASCIIの約半分になり、応答を文字列に変換せずにstructで直接読める
+
+import struct
+import numpy as np
+
+## デバイスコード
+DEVICE_CODE = {'M': 0x4D20, 'D': 0x4420}
+
+## 1電文で扱える最大点数（FX3U-ENETの1Eフレーム）
+MAX_BIT_POINTS = 254          # ビット一括読出し・書込み
+MAX_WORD_POINTS = 64          # ワード一括読出し・書込み
+MAX_RANDOM_BIT_POINTS = 80    # ビットランダム書込み
+MAX_RANDOM_WORD_POINTS = 10   # ワードランダム書込み
+
+## サブヘッダ（指令）1Eフレームの指令名: 00=BR, 01=WR, 02=BW, 03=WW, 04=BT, 05=WT
+BATCH_READ = {'M': 0x00, 'D': 0x01}    # 一括読出し
+BATCH_WRITE = {'M': 0x02, 'D': 0x03}   # 一括書込み
+RANDOM_WRITE = {'M': 0x04, 'D': 0x05}  # ランダム書込み（マニュアルでは「テスト」(BT/WT)という名前の指令）
+
+PC_NO = 0xFF        # PC番号
+MONITOR_TIMER = 0x000A # 監視タイマ
+
+
+##デバイス名を種類と番号に分ける
+##parse_device('D91') -> ('D', 91)
+def parse_device(device):
+    kind = device[0:1].upper()
+    if kind not in DEVICE_CODE:
+        raise ValueError("未対応のデバイスです: " + str(device))
+    return kind, int(device[1:])
+
+
+##種類と番号からデバイス名を作る
+##device_name('D', 91) -> 'D91'
+def device_name(kind, number):
+    return kind + str(number)
+
+
+##読出しデバイスの指定を範囲に変換
+##'M20' → ('M', 20, 1)、('D91', 10) → ('D', 91, 10)
+def _to_range(device):
+    if isinstance(device, str):
+        device, device_point = device, 1
+    else:
+        device, device_point = device
+    kind, start = parse_device(device)
+    return kind, start, int(device_point)
+
+
+##読出し電文の計画
+##同じ種類で重なる・隣り合う範囲を先に1つにしてから、
+##番号が近い範囲を、1電文の最大点数を超えない範囲で1つにまとめる
+##次の範囲が入りきらない場合は、電文の最大点数まで読んでから残りを次の電文にする
+##[('D0', 100), ('D50', 100)] → D0～D149 を 64点・64点・22点 の3電文
+##戻り値: [(デバイス種類, 先頭番号, 点数), ...]
+def plan_read(devices):
+    frames = []
+    for kind in DEVICE_CODE:
+        if kind == 'M':
+            max_points = MAX_BIT_POINTS
+        else:
+            max_points = MAX_WORD_POINTS
+
+        ranges = _merge_ranges((start, points) for k, start, points in map(_to_range, devices) if k == kind)
+
+        cur_start = None
+        cur_end = None
+        for start, points in ranges:
+            end = start + points # 範囲の終わり（この番号は含まない）
+            if cur_start is not None and end - cur_start <= max_points:
+                cur_end = end # 前の範囲とまとめる
+                continue
+            if cur_start is not None:
+                if start < cur_start + max_points:
+                    # 前の電文の残りの点数で読めるところまで読む
+                    cur_end = start = cur_start + max_points
+                frames.append((kind, cur_start, cur_end - cur_start))
+            # 1つの範囲が最大点数を超える場合は分割する
+            while end - start > max_points:
+                frames.append((kind, start, max_points))
+                start = start + max_points
+            cur_start, cur_end = start, end
+        if cur_start is not None:
+            frames.append((kind, cur_start, cur_end - cur_start))
+    return frames
+
+
+##重なる・隣り合う範囲を1つにする
+##[(0, 100), (50, 100), (150, 10)] → [(0, 160)]
+def _merge_ranges(ranges):
+    merged = []
+    for start, points in sorted(ranges):
+        end = start + points
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end - start) for start, end in merged]
+
+
+##書込み内容の指定を (種類, 番号, 値) のリストに変換
+##{'D50': 2026, 'D23': [1, 1]} → [('D', 50, 2026), ('D', 23, 1), ('D', 24, 1)]
+##（値がリストの場合は、そのデバイスから連続した番号に書き込む）
+def to_points(values):
+    if isinstance(values, dict):
+        values = values.items()
+    points = {}
+    for device, value in values:
+        kind, number = parse_device(device)
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        for i in range(len(value)):
+            points[(kind, number + i)] = int(value[i]) # 同じデバイスは後から指定した値で上書き
+    return [(kind, number, value) for (kind, number), value in points.items()]
+
+
+##書込み電文の計画
+##連続した番号は一括書込み、飛び飛びの番号はランダム書込みにまとめる
+##全体がランダム書込み1電文に収まる場合は、連続した番号も含めて1電文にする
+##戻り値: [('batch', 種類, 先頭番号, [値, ...]) または ('random', 種類, [(番号, 値), ...]), ...]
+def plan_write(values):
+    frames = []
+    points = to_points(values)
+    for kind in DEVICE_CODE:
+        if kind == 'M':
+            max_points, max_random = MAX_BIT_POINTS, MAX_RANDOM_BIT_POINTS
+        else:
+            max_points, max_random = MAX_WORD_POINTS, MAX_RANDOM_WORD_POINTS
+
+        items = sorted((number, value) for k, number, value in points if k == kind)
+        if not items:
+            continue
+        if len(items) <= max_random:
+            frames.append(('random', kind, items))
+            continue
+
+        # 連続した番号ごとに分ける
+        runs = [[items[0]]]
+        for number, value in items[1:]:
+            if number == runs[-1][-1][0] + 1 and len(runs[-1]) < max_points:
+                runs[-1].append((number, value))
+            else:
+                runs.append([(number, value)])
+
+        singles = []
+        for run in runs:
+            if len(run) == 1:
+                singles.append(run[0])
+            else:
+                frames.append(('batch', kind, run[0][0], [value for number, value in run]))
+        for i in range(0, len(singles), max_random):
+            frames.append(('random', kind, singles[i:i + max_random]))
+    return frames
+
+
+##ASCIIコードの電文
+##電文・応答とも16進数の文字列（'01FF000A4420' + '0000005b' + '0a00' など）
+class AsciiCodec:
+    ##電文の組み立て（ヘッダ部分）
+    ##(サブヘッダ, デバイス種類, 先頭デバイス番号, デバイス点数)
+    def _header(self, subheader, kind, start, points):
+        msg = format(subheader, '02X') + format(PC_NO, '02X') + format(MONITOR_TIMER, '04X')
+        return msg + format(DEVICE_CODE[kind], '04X') + format(start, '08x') + format(points, '02x') + '00'
+
+    ##受信したバイト列を応答電文（文字列）に変換
+    def decode(self, response):
+        return response.decode()
+
+    ##送信する電文の指令（サブヘッダ）
+    def request_subheader(self, msg):
+        return int(msg[0:2], 16)
+
+    ##応答電文の長さ（TCPで受信したデータから応答電文を切り出すために使う）
+    ##frame_length(送信した電文(bytes), 受信したデータ(bytes)) → 応答電文の長さ（まだ分からない時はNone）
+    ##異常終了の応答は サブヘッダ + 終了コード（+ 終了コードが5Bの時は異常コード）
+    def frame_length(self, msg, data):
+        if len(data) < 4:
+            return None
+        if data[2:4] != b'00':
+            return 6 if data[2:4].upper() == b'5B' else 4
+        subheader = int(msg[0:2], 16)
+        if len(msg) < 24 or subheader not in BATCH_READ.values():
+            return 4 # 書込み・終了信号などの応答はサブヘッダと終了コードだけ
+        points = int(msg[20:22], 16) or 256
+        if subheader == BATCH_READ['M']:
+            return 4 + points # 点数が奇数の時にダミーが付く場合は、次の電文の前に読み捨てる
+        return 4 + points * 4
+
+    ##応答電文のサブヘッダ（指令+0x80）
+    def response_subheader(self, response):
+        return int(response[0:2], 16)
+
+    ##応答電文の確認
+    ##応答のサブヘッダ(指令+0x80)と終了コード('00')が正しいか確認する
+    def check_response(self, response, subheader):
+        if len(response) < 4:
+            raise ConnectionError("PLCから応答がありません")
+        if int(response[0:2], 16) != subheader + 0x80 or response[2:4] != '00':
+            raise ConnectionError("PLCから異常応答がありました: " + response[0:4])
+
+    ##応答電文の長さの確認
+    ##(応答電文, 指令, 読出し点数) 読出しは点数分のデータ、書込みはサブヘッダと終了コードだけ
+    ##（ビット読出しで点数が奇数の時はダミーが付く場合がある）
+    def check_length(self, response, subheader, points):
+        if subheader == BATCH_READ['M']:
+            lengths = (4 + points, 4 + points + (points & 1))
+        elif subheader == BATCH_READ['D']:
+            lengths = (4 + points * 4,)
+        else:
+            lengths = (4,)
+        if len(response) not in lengths:
+            raise ConnectionError("PLCからの応答の長さが合いません: " + str(len(response)) + "文字（" + str(lengths[0]) + "文字のはず）")
+
+    ##一括読出し電文
+    def build_batch_read(self, kind, start, points):
+        return self._header(BATCH_READ[kind], kind, start, points).encode('latin-1')
+
+    ##ビット一括読出しの応答をboolの配列に変換
+    def parse_bits(self, response, points):
+        self.check_response(response, BATCH_READ['M'])
+        return np.frombuffer(response[4:4 + points].encode('latin-1'), dtype=np.uint8) == ord('1')
+
+    ##ワード一括読出しの応答をintの配列に変換
+    def parse_words(self, response, points):
+        self.check_response(response, BATCH_READ['D'])
+        return np.array([int(response[4 + i * 4:8 + i * 4], 16) for i in range(points)], dtype=np.uint16)
+
+    ##一括書込み電文
+    def build_batch_write(self, kind, start, values):
+        msg = self._header(BATCH_WRITE[kind], kind, start, len(values))
+        if kind == 'M':
+            msg = msg + ''.join('1' if value else '0' for value in values)
+            if len(values) % 2 == 1:
+                msg = msg + '0' # 点数が奇数の時はダミーを付加
+        else:
+            msg = msg + ''.join(format(value & 0xFFFF, '04x') for value in values)
+        return msg.encode('latin-1')
+
+    ##ランダム書込み電文
+    ##各点ごとに デバイスコード + デバイス番号 + 値 を並べる
+    def build_random_write(self, kind, items):
+        msg = format(RANDOM_WRITE[kind], '02X') + format(PC_NO, '02X') + format(MONITOR_TIMER, '04X')
+        msg = msg + format(len(items), '02x') + '00'
+        for number, value in items:
+            msg = msg + format(DEVICE_CODE[kind], '04X') + format(number, '08x')
+            if kind == 'M':
+                msg = msg + ('01' if value else '00')
+            else:
+                msg = msg + format(value & 0xFFFF, '04x')
+        return msg.encode('latin-1')
+
+
+##バイナリコードの電文
+##数値はリトルエンディアン、先頭デバイスは 番号(4バイト) + デバイスコード(2バイト) の順
+##ビットデータは1バイトに2点（上位4ビットが先のデバイス）
+class BinaryCodec:
+    HEADER = struct.Struct('<BBHIHBB') # サブヘッダ, PC番号, 監視タイマ, 先頭デバイス番号, デバイスコード, 点数, 固定値0
+    RANDOM_HEADER = struct.Struct('<BBHBB') # サブヘッダ, PC番号, 監視タイマ, 点数, 固定値0
+    RANDOM_BIT = struct.Struct('<IHB')  # デバイス番号, デバイスコード, 値
+    RANDOM_WORD = struct.Struct('<IHH') # デバイス番号, デバイスコード, 値
+
+    ##電文の組み立て（ヘッダ部分）
+    def _header(self, subheader, kind, start, points):
+        return self.HEADER.pack(subheader, PC_NO, MONITOR_TIMER, start, DEVICE_CODE[kind], points, 0)
+
+    ##バイナリコードは受信したバイト列をそのまま応答電文とする
+    def decode(self, response):
+        return response
+
+    ##送信する電文の指令（サブヘッダ）
+    def request_subheader(self, msg):
+        return msg[0]
+
+    ##応答電文の長さ（TCPで受信したデータから応答電文を切り出すために使う）
+    ##frame_length(送信した電文(bytes), 受信したデータ(bytes)) → 応答電文の長さ（まだ分からない時はNone）
+    def frame_length(self, msg, data):
+        if len(data) < 2:
+            return None
+        if data[1] != 0x00:
+            return 3 if data[1] == 0x5B else 2
+        if len(msg) < self.HEADER.size or msg[0] not in BATCH_READ.values():
+            return 2
+        points = msg[10] or 256
+        if msg[0] == BATCH_READ['M']:
+            return 2 + (points + 1) // 2
+        return 2 + points * 2
+
+    ##応答電文のサブヘッダ（指令+0x80）
+    def response_subheader(self, response):
+        return response[0]
+
+    ##応答電文の確認
+    def check_response(self, response, subheader):
+        if len(response) < 2:
+            raise ConnectionError("PLCから応答がありません")
+        if response[0] != subheader + 0x80 or response[1] != 0x00:
+            raise ConnectionError("PLCから異常応答がありました: " + response[0:2].hex())
+
+    ##応答電文の長さの確認
+    ##(応答電文, 指令, 読出し点数) 読出しは点数分のデータ、書込みはサブヘッダと終了コードだけ
+    def check_length(self, response, subheader, points):
+        if subheader == BATCH_READ['M']:
+            length = 2 + (points + 1) // 2
+        elif subheader == BATCH_READ['D']:
+            length = 2 + points * 2
+        else:
+            length = 2
+        if len(response) != length:
+            raise ConnectionError("PLCからの応答の長さが合いません: " + str(len(response)) + "バイト（" + str(length) + "バイトのはず）")
+
+    ##一括読出し電文
+    def build_batch_read(self, kind, start, points):
+        return self._header(BATCH_READ[kind], kind, start, points)
+
+    ##ビット一括読出しの応答をboolの配列に変換
+    def parse_bits(self, response, points):
+        self.check_response(response, BATCH_READ['M'])
+        data = np.frombuffer(response, dtype=np.uint8, count=(points + 1) // 2, offset=2)
+        bits = np.empty(data.size * 2, dtype=np.uint8)
+        bits[0::2] = data >> 4
+        bits[1::2] = data & 0x0F
+        return bits[:points] != 0
+
+    ##ワード一括読出しの応答をintの配列に変換
+    def parse_words(self, response, points):
+        self.check_response(response, BATCH_READ['D'])
+        return np.frombuffer(response, dtype='<u2', count=points, offset=2).astype(np.uint16)
+
+    ##一括書込み電文
+    def build_batch_write(self, kind, start, values):
+        msg = self._header(BATCH_WRITE[kind], kind, start, len(values))
+        if kind == 'M':
+            bits = [1 if value else 0 for value in values]
+            if len(bits) % 2 == 1:
+                bits.append(0) # 点数が奇数の時はダミーを付加
+            msg = msg + bytes((bits[i] << 4) | bits[i + 1] for i in range(0, len(bits), 2))
+        else:
+            msg = msg + struct.pack('<%dH' % len(values), *[value & 0xFFFF for value in values])
+        return msg
+
+    ##ランダム書込み電文
+    def build_random_write(self, kind, items):
+        msg = self.RANDOM_HEADER.pack(RANDOM_WRITE[kind], PC_NO, MONITOR_TIMER, len(items), 0)
+        for number, value in items:
+            if kind == 'M':
+                msg = msg + self.RANDOM_BIT.pack(number, DEVICE_CODE[kind], 1 if value else 0)
+            else:
+                msg = msg + self.RANDOM_WORD.pack(number, DEVICE_CODE[kind], value & 0xFFFF)
+        return msg
+
+
+ASCII = AsciiCodec()
+BINARY = BinaryCodec()
+CODEC = {'ascii': ASCII, 'binary': BINARY} # Fx3u(code='ascii' または 'binary') で選択
+
+
+##一括読出しの応答を {デバイス名: 値} に変換（Mはbool、Dはint）
+def parse_batch_read(codec, response, kind, start, points):
+    if kind == 'M':
+        data = codec.parse_bits(response, points)
+    else:
+        data = codec.parse_words(response, points)
+    return {device_name(kind, start + i): data[i].item() for i in range(points)}
+
+
+##複数デバイスの読出し
+##send_recv: 電文(bytes)を送って応答を返す関数（Fx3u._send_recv）
+##devices: ['M20', ('M154', 4), ('D91', 10), ...]
+##戻り値: {'M20': False, ..., 'D91': 0, ...}
+def read_devices(send_recv, devices, codec=ASCII):
+    values = {}
+    for kind, start, points in plan_read(devices):
+        response = send_recv(codec.build_batch_read(kind, start, points))
+        values.update(parse_batch_read(codec, response, kind, start, points))
+    return select_devices(values, devices)
+
+
+##まとめて読んだ範囲のうち、指定されたデバイスだけを返す
+def select_devices(values, devices):
+    result = {}
+    for kind, start, points in map(_to_range, devices):
+        for i in range(points):
+            name = device_name(kind, start + i)
+            result[name] = values[name]
+    return result
+
+
+##複数デバイスの書込み
+##values: {'D50': 2026, 'M20': 0, 'D23': [1, 1], ...}
+##戻り値: 送信した電文の数
+def write_devices(send_recv, values, codec=ASCII):
+    frames = plan_write(values)
+    for frame in frames:
+        if frame[0] == 'batch':
+            kind, start, data = frame[1:]
+            response = send_recv(codec.build_batch_write(kind, start, data))
+            codec.check_response(response, BATCH_WRITE[kind])
+        else:
+            kind, items = frame[1:]
+            response = send_recv(codec.build_random_write(kind, items))
+            codec.check_response(response, RANDOM_WRITE[kind])
+    return len(frames)
@@ -4,6 +4,9 @@
 #name:橋本
 #file_content:fx3uシリーズ伝文コマンド
 #UPDATE: 2025/11/17 (UDP通信に変更)
+#UPDATE: 2026/10/18 (セッションモード追加：ソケットを使い回し、失敗時は再接続)
+#UPDATE: 2026/10/18 (複数デバイスの一括読出し・一括書込みを追加)
+#UPDATE: 2026/10/18 (バイナリコードの電文に対応)
 #########################################################################
 
 ##自作の伝文作成プログラムなので動作保証はできない
@@ -11,212 +14,263 @@
 ##使用からきちんと作って汎用性の高いライブラリを作ることが出来たら素晴らしい
 
 import socket # ネットワーク通信（ソケット）を扱うライブラリ
+import threading # 複数スレッドから同時に送受信しないようにするためのロック
 import time   # 時間を扱うライブラリ
+import fx3u_frame # 複数デバイスの一括読出し・一括書込み電文
 
 class Fx3u:
     #Fx3uクラス初期設定
-    #(self, 相手IPアドレス(String), 相手ポート番号(int), 送信サイズ(int), local_port(int)=PCの受信ポート, timeout=float秒)
-    def __init__(self, ip, port, bufsize, local_port=None, timeout=5.0):
+    #(self, 相手IPアドレス(String), 相手ポート番号(int), 送信サイズ(int), local_port(int)=PCの受信ポート, timeout=float秒,
+    # session(bool)=Trueでソケットを使い回す, retry(int)=セッションモードで通信に失敗した時の再接続・再送回数,
+    # code(str)='ascii'または'binary'=電文のコード（PLCのENET設定の交信データコードと合わせる）)
+    def __init__(self, ip, port, bufsize, local_port=None, timeout=5.0, session=False, retry=1, code='ascii'):
         self.ip = ip       # 接続先のPLCのIPアドレス（宛先）
         self.port = port   # 接続先のPLCのポート番号（宛先）
         self.bufsize = bufsize # 受信バッファの最大サイズ（受信可能データの上限）
         self.local_port = local_port # PC側の待ち受けポート（PLCのENET設定で合わせる5
         self.timeout = timeout # ソケットのタイムアウト（秒）
         
+        # セッションモード（Trueの場合、1つのソケットを開きっぱなしにして全ての電文で使い回す）
+        # Falseの場合は従来通り、電文ごとにソケットを作成→バインド→送受信→クローズする
+        self.session = session
+        self.retry = retry # 通信失敗時の再接続・再送回数（セッションモードのみ）
+        self.client = None # セッションモードで使い回すソケット
+        self.lock = threading.Lock() # 送信と受信の組が他スレッドの電文と混ざらないようにするロック
+        
+        # 電文のコード（ASCIIコード or バイナリコード）
+        # read_bitdevice() などの従来の関数はASCIIコード専用（応答の文字列をそのまま返す）
+        # バイナリコードの場合は read_devices() / read_bits() / read_words() / write_devices() を使用する
+        self.code = code
+        self.codec = fx3u_frame.CODEC[code]
+    
+    ##セッション開始
+    # ソケットを開き、以降の電文はこのソケットで送受信する
+    # with文でも使用できる（with Fx3u(...) as fx3u: のブロックを抜けるとソケットを閉じる）
+    def open(self):
+        with self.lock:
+            self.session = True
+            if self.client is None:
+                self.client = self._create_socket()
+        return self
+    
+    ##セッション終了
+    # 開いているソケットを閉じる（再度open()するか、電文を送信すると開き直す）
+    def close(self):
+        with self.lock:
+            self._close_socket()
+    
+    def __enter__(self):
+        return self.open()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    ##ソケット作成
+    # UDPソケットを作成し、必要に応じてローカルポートにバインドする
+    def _create_socket(self):
+        self.address = (socket.gethostbyname(self.ip), self.port) # 応答の送信元の確認に使う（IPアドレスに変換）
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # UDPソケットを作成
+        # 必要に応じてローカルポートにバインド（PLCのENET設定でPCポートを固定している場合）
+        if self.local_port is not None:
+            client.bind(('', self.local_port))
+        client.settimeout(self.timeout)
+        return client
+    
+    ##ソケットを閉じる
+    def _close_socket(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except OSError:
+                pass
+            self.client = None
+    
+    ##電文の送受信
+    # 電文(bytes)をPLCに送信し、応答電文を文字列（バイナリコードはバイト列）で返す（タイムアウト時は空文字）
+    # セッションモードでは開いているソケットを使い回し、失敗したら再送する（ソケットの異常時は作り直す）
+    # 遅れて届いた前の電文の応答を受け取らないように
+    #   ・送信前に受信済みの応答を読み捨てる
+    #   ・PLC以外から届いたもの、サブヘッダが送信した指令と合わないもの、長さが読出し点数と合わないものは捨てて待ち続ける
+    #     （1Eフレームには通し番号が無いので、同じ指令・同じ長さの遅れた応答は区別できない）
+    # （ローカルポートを固定している場合は、ソケットを作り直しても遅れた応答が届くので閉じるだけでは防げない）
+    # check=Falseの場合はサブヘッダを確認しない（終了信号など）
+    def _send_recv(self, msg, check=True):
+        with self.lock:
+            if self.session:
+                count = self.retry + 1 # 初回＋再送回数
+            else:
+                count = 1
+            if check:
+                subheader = self.codec.request_subheader(msg) + 0x80 # 応答のサブヘッダ
+            else:
+                subheader = None
+            
+            for i in range(count):
+                try:
+                    if self.client is None:
+                        self.client = self._create_socket()
+                    self._drain()
+                    
+                    ##PLCに送信
+                    # 変更点: send()からsendto()に変更し、宛先（IPとポート）を一緒に指定
+                    self.client.sendto(msg, self.address)
+                    
+                    ##PLCからの返信情報 (recvfromを使用し、データとアドレスを取得)
+                    response = self._recv_response(msg, subheader)
+                    
+                    if not self.session:
+                        self._close_socket() # 従来モードでは電文ごとにソケットを閉じる
+                    return self.codec.decode(response) # ASCIIコードは文字列にデコード（バイナリコードはバイト列のまま）
+                
+                except socket.timeout:
+                    print("PLC応答がタイムアウトしました")
+                    if not self.session:
+                        self._close_socket()
+                except OSError:
+                    print("PLCに接続できませんでした")
+                    self._close_socket() # 異常が起きたソケットは破棄（次のループ or 次の電文で作り直す）
+                
+            return self.codec.decode(b'')
+    
+    ##応答の受信
+    # PLCから届いた、サブヘッダと長さが合う応答を返す（subheader=Noneなら確認しない）
+    # タイムアウトまでに届かなければ socket.timeout
+    def _recv_response(self, msg, subheader):
+        deadline = time.time() + self.timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise socket.timeout
+            self.client.settimeout(remaining)
+            response, addr = self.client.recvfrom(self.bufsize) # 応答データと送信元アドレス(addr)を受け取る
+            if addr != self.address:
+                continue # PLC以外から届いた
+            if subheader is None:
+                return response
+            if self._response_subheader(response) == subheader:
+                # 長さの確認（ASCIIコードのビット読出しで点数が奇数の時はダミーが付く場合がある）
+                length = self.codec.frame_length(msg, response)
+                if length is not None and length <= len(response) <= length + 1:
+                    return response
+            # 前の電文（タイムアウトしたもの）の応答が遅れて届いたので捨てる
+    
+    ##受信したデータのサブヘッダ（解析できなければNone）
+    def _response_subheader(self, response):
+        try:
+            return self.codec.response_subheader(self.codec.decode(response))
+        except (ValueError, IndexError, UnicodeDecodeError):
+            return None
+    
+    ##受信済みのデータを読み捨てる（タイムアウトした電文の応答が遅れて届いていた場合など）
+    def _drain(self):
+        self.client.setblocking(False)
+        try:
+            while True:
+                try:
+                    self.client.recvfrom(self.bufsize)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionResetError:
+                    continue # Windowsでは前の電文がPLCに届かなかった時に出る
+        finally:
+            self.client.settimeout(self.timeout)
+        
     
     ##終了信号
     # 通信セッションを安全に終了させるための特別な電文を送信する
     def finish_signal(self):
-        try:
-            print("終了信号を送信します")
-            # 変更点: TCP(SOCK_STREAM)からUDP(SOCK_DGRAM)に変更
-            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # UDPソケットを作成
-            # 必要に応じてローカルポートにバインド（PLCのENET設定でPCポートを固定している場合）
-            if self.local_port is not None:
-                client.bind(('', self.local_port))
-            client.settimeout(self.timeout)
-
-            msg = '00000000' # FX3U向けの終了指令電文（8桁のゼロ）
-            msg = msg.encode('latin-1') # メッセージをバイト列に変換（FX3Uプロトコルに合わせたエンコーディング）
-            
-            # 変更点: send()からsendto()に変更し、宛先（IPとポート）を一緒に指定
-            client.sendto(msg, (self.ip, self.port))
-            
-            ##PLCからの返信情報 (recvfromを使用し、データとアドレスを取得)
-            try:
-                response, addr = client.recvfrom(self.bufsize) # 応答データと送信元アドレス(addr)を受け取る
-                response = response.decode() # バイト列を文字列にデコード
-            except socket.timeout:
-                print("PLC応答がタイムアウトしました")
-                response = ""
-            finally:
-                client.close() # ソケットを閉じる
-
-            if response:
-                print("終了信号が正しく送信されました")
+        print("終了信号を送信します")
+        msg = '00000000' # FX3U向けの終了指令電文（8桁のゼロ）
+        msg = msg.encode('latin-1') # メッセージをバイト列に変換（FX3Uプロトコルに合わせたエンコーディング）
         
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
+        ##PLCに送信し、返信情報を受け取る（終了信号の応答はサブヘッダを確認しない）
+        response = self._send_recv(msg, check=False)
+
+        if response:
+            print("終了信号が正しく送信されました")
 
     ##読出し(ワード単位)
     ##ワード単位（16ビット）のデバイスを複数点読み出す
     ##PLCからの返信を戻り値
     ##read(デバイス番号(str), デバイス点数(int))
     def read_worddevice(self, device, device_point):
-        try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            if self.local_port is not None:
-                client.bind(('', self.local_port))
-            client.settimeout(self.timeout)
-            
-            ##デバイス種類指定（読み出し電文の先頭部分を決定）
-            if device[0:1] == 'M':
-                msg = '00FF000A4D20' # Mデバイス（ビット）の読み出し指令コード
-                
-            elif device[0:1] == 'D':
-                msg = '01FF000A4420' # Dデバイス（ワード）の読み出し指令コード
-            
-            ##先頭デバイス指定
-            # デバイス番号（例: 'D20'の'20'）を8桁の16進数文字列に変換
-            msg = msg + format(int(device[1:4]), '08x') 
-            
-            ##デバイス点数指定
-            # 読み出し点数を2桁の16進数に変換し、末尾に'00'を付加
-            msg = msg + format(int(device_point), '02x') + '00' 
-            
-            ##バイト型に変換
-            msg = msg.encode('latin-1')
-            #print(type(msg))
-
-            ##PLCに送信
-            # 変更点: send()からsendto()に変更し、宛先を指定
-            client.sendto(msg, (self.ip, self.port))
+        ##デバイス種類指定（読み出し電文の先頭部分を決定）
+        if device[0:1] == 'M':
+            msg = '00FF000A4D20' # Mデバイス（ビット）の読み出し指令コード
             
-            ##PLCからの返信情報 (recvfromを使用)
-            try:
-                response, addr = client.recvfrom(self.bufsize) # 応答データと送信元アドレス(addr)を受け取る
-                response = response.decode()
-            except socket.timeout:
-                print("PLC応答がタイムアウトしました")
-                response = ""
-            finally:
-                client.close()
-            return response # PLCからの応答電文全体を返す
+        elif device[0:1] == 'D':
+            msg = '01FF000A4420' # Dデバイス（ワード）の読み出し指令コード
         
+        ##先頭デバイス指定
+        # デバイス番号（例: 'D20'の'20'）を8桁の16進数文字列に変換
+        msg = msg + format(int(device[1:4]), '08x') 
         
-            
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
+        ##デバイス点数指定
+        # 読み出し点数を2桁の16進数に変換し、末尾に'00'を付加
+        msg = msg + format(int(device_point), '02x') + '00' 
+        
+        ##バイト型に変換
+        msg = msg.encode('latin-1')
+
+        ##PLCに送信し、返信情報を受け取る
+        return self._send_recv(msg) # PLCからの応答電文全体を返す
     
     ##読出し(ビット単位)
     ##ビット単位（ON/OFF状態）のデバイスを読み出す
     ##PLCからの返信を戻り値
     ##read(デバイス番号(str))
     def read_bitdevice(self, device):
-        try:
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            if self.local_port is not None:
-                client.bind(('', self.local_port))
-            client.settimeout(self.timeout)
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '00FF000A4D20' # Mデバイス（ビット）の読み出し指令コード
-            
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            
-            ##デバイス点数指定
-            # ビット読み出しの場合、点数指定は'0400'（4点）に固定されている
-            msg = msg + '0400' 
-            
-            ##バイト型に変換
-            msg = msg.encode('latin-1')
-
-            ##PLCに送信
-            # 変更点: send()からsendto()に変更し、宛先を指定
-            client.sendto(msg, (self.ip, self.port))
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '00FF000A4D20' # Mデバイス（ビット）の読み出し指令コード
+        
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        
+        ##デバイス点数指定
+        # ビット読み出しの場合、点数指定は'0400'（4点）に固定されている
+        msg = msg + '0400' 
+        
+        ##バイト型に変換
+        msg = msg.encode('latin-1')
 
-            ##PLCからの返信情報 (recvfromを使用)
-            try:
-                response, addr = client.recvfrom(self.bufsize)
-                response = response.decode()
-            except socket.timeout:
-                print("PLC応答がタイムアウトしました")
-                response = ""
-            finally:
-                client.close()
-            
-            return response
-            
-        except ConnectionRefusedError:
-            print("PLCに接続できませんでした")
+        ##PLCに送信し、返信情報を受け取る
+        return self._send_recv(msg)
         
     ##書込み(ワード単位)
     ##ワード単位（16ビット）のデバイスにデータを書き込む
     ##PLCからの返信を戻り値
-    ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
+    ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
     def write_worddevice(self, device, device_point, write_content):
-        #try: # 本来はここでConnectionRefusedErrorなどをキャッチする
-            ##PLCとソケット通信
-            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            if self.local_port is not None:
-                client.bind(('', self.local_port))
-            client.settimeout(self.timeout)
-            
-            ##デバイス種類指定
-            if device[0:1] == 'M':
-                msg = '02FF000A4D20' # Mデバイスへのビット書き込み指令コード
-                
-            elif device[0:1] == 'D':
-                msg = '03FF000A4420' # Dデバイスへのワード書き込み指令コード
-            
-            ##先頭デバイス指定
-            msg = msg + format(int(device[1:4]), '08x')
-            
-            ##デバイス点数指定
-            msg = msg + format(int(device_point), '02x') + '00'
-            
-            #書き込み内容
-            # 整数値を4桁の16進数文字列に変換（ワードは16ビット）
-            msg = msg + format(int(write_content), '04x') 
+        ##デバイス種類指定
+        if device[0:1] == 'M':
+            msg = '02FF000A4D20' # Mデバイスへのビット書き込み指令コード
             
-            #バイト型に変換
-            msg = msg.encode('latin-1')
-
-            #PLCに送信
-            # 変更点: send()からsendto()に変更し、宛先を指定
-            client.sendto(msg, (self.ip, self.port))
+        elif device[0:1] == 'D':
+            msg = '03FF000A4420' # Dデバイスへのワード書き込み指令コード
+        
+        ##先頭デバイス指定
+        msg = msg + format(int(device[1:4]), '08x')
+        
+        ##デバイス点数指定
+        msg = msg + format(int(device_point), '02x') + '00'
+        
+        #書き込み内容
+        # 整数値を4桁の16進数文字列に変換（ワードは16ビット）
+        msg = msg + format(int(write_content), '04x') 
+        
+        #バイト型に変換
+        msg = msg.encode('latin-1')
 
-            #PLCからの返信情報 (recvfromを使用)
-            try:
-                response, addr = client.recvfrom(self.bufsize)
-                response = response.decode()
-            except socket.timeout:
-                print("PLC応答がタイムアウトしました")
-                response = ""
-            finally:
-                client.close()
-            ##PLCからの返信を戻り値に
-            return response
-            
-        #except ConnectionRefusedError:
-        #    print("PLCに接続できませんでした")
+        ##PLCに送信し、返信を戻り値に
+        return self._send_recv(msg)
 
     ##書込み(ワード単位)
     ##PLCからの返信を戻り値
-    ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
+    ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
     ##デバイス点数が2点の時に使用する
     ##本来であれば1点の時と2点の時でモジュールを分けるのは良くないが、面倒くさかったので別モジュールにした
     def write_worddevice2(self, device, device_point, write_content1, write_content2):
-        ##PLCとソケット通信
-        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        if self.local_port is not None:
-            client.bind(('', self.local_port))
-        client.settimeout(self.timeout)
-        
         ##デバイス種類指定
         if device[0:1] == 'M':
             msg = '02FF000A4D20'
@@ -237,32 +291,15 @@ class Fx3u:
         #バイト型に変換
         msg = msg.encode('latin-1')
 
-        #PLCに送信
-        client.sendto(msg, (self.ip, self.port))
-
-        #PLCからの返信情報 (recvfromを使用)
-        try:
-            response, addr = client.recvfrom(self.bufsize)
-            response = response.decode()
-        except socket.timeout:
-            print("PLC応答がタイムアウトしました")
-            response = ""
-        finally:
-            client.close()
-        return response
+        ##PLCに送信し、返信を戻り値に
+        return self._send_recv(msg)
             
             
     ##書込み(ビット単位)
     ##ビット単位（ON/OFF）のデバイスにデータを書き込む
     ##PLCからの返信を戻り値
-    ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
+    ##read(デバイス番号(str), デバイス点数(int), 書込み内容(int))  
     def write_bitdevice(self, device, write_content):
-        ##PLCとソケット通信
-        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        if self.local_port is not None:
-            client.bind(('', self.local_port))
-        client.settimeout(self.timeout)
-        
         ##デバイス種類指定
         if device[0:1] == 'M':
             msg = '02FF000A4D20' # Mデバイスへのビット書き込み指令コード
@@ -279,16 +316,37 @@ class Fx3u:
         #バイト型に変換
         msg = msg.encode('latin-1')
 
-        #PLCに送信
-        client.sendto(msg, (self.ip, self.port))
+        ##PLCに送信し、返信を戻り値に
+        return self._send_recv(msg)
 
-        #PLCからの返信情報 (recvfromを使用)
-        try:
-            response, addr = client.recvfrom(self.bufsize)
-            response = response.decode()
-        except socket.timeout:
-            print("PLC応答がタイムアウトしました")
-            response = ""
-        finally:
-            client.close()
-        return response
\ No newline at end of file
+    ##複数デバイスの読出し
+    ##同じ種類で番号が近いデバイスは1つの電文にまとめて読み出す
+    ##read_devices([デバイス番号(str) または (デバイス番号(str), デバイス点数(int)), ...])
+    ##戻り値: {'M20': True, ..., 'D91': 0, ...}（Mはbool、Dはint）
+    ##例: read_devices([('M20', 4), ('M154', 4), ('D91', 10)]) → M・Dの2電文
+    def read_devices(self, devices):
+        return fx3u_frame.read_devices(self._send_recv, devices, self.codec)
+    
+    ##複数デバイスの書込み
+    ##連続した番号は一括書込み、飛び飛びの番号はランダム書込みの電文にまとめる
+    ##write_devices({デバイス番号(str): 書込み内容(int または intのリスト), ...})
+    ##戻り値: 送信した電文の数
+    ##例: write_devices({'D50': 2026, 'D51': 10, 'D52': 18}) → 1電文
+    def write_devices(self, values):
+        return fx3u_frame.write_devices(self._send_recv, values, self.codec)
+    
+    ##読出し(ビット単位、値で返す)
+    ##read_bits(デバイス番号(str), デバイス点数(int))
+    ##戻り値: boolのnumpy配列（ASCIIコード・バイナリコードどちらでも使用可）
+    def read_bits(self, device, device_point):
+        kind, start = fx3u_frame.parse_device(device)
+        response = self._send_recv(self.codec.build_batch_read(kind, start, device_point))
+        return self.codec.parse_bits(response, device_point)
+    
+    ##読出し(ワード単位、値で返す)
+    ##read_words(デバイス番号(str), デバイス点数(int))
+    ##戻り値: uint16のnumpy配列（ASCIIコード・バイナリコードどちらでも使用可）
+    def read_words(self, device, device_point):
+        kind, start = fx3u_frame.parse_device(device)
+        response = self._send_recv(self.codec.build_batch_read(kind, start, device_point))
+        return self.codec.parse_words(response, device_point)
@@ -0,0 +1,98 @@
+#########################################################################
+#file:fx3u_write_queue.py
+#date:2026/10/18
+#file_content:PLCへの書込みをまとめて送信するキュー
+#########################################################################
+
+##PLCへの書込みをすぐに送らずにためておき、まとめて送信する
+##・前回書き込んだ値と同じ値の書込みは省略する（refresh秒ごとには同じ値でも書き込む）
+##・同じサイクルでたまった書込みは Fx3u.write_devices でまとめて送る
+##  （D20～D23のような隣り合ったデバイスは1電文になる）
+##・最初の書込みをためてから deadline 秒経ったら送信する（poll()を周期的に呼ぶ）
+##
+##使い方:
+##    queue = Fx3uWriteQueue(fx3u, deadline=0.05)
+##    queue.put({'D23': [1, 1]})          # 同じ値なら送らない
+##    queue.put({'D20': 1}, force=True)   # 必ず送る
+##    queue.poll()                        # 期限が来ていれば送信（スケジューラのタスクとして登録する）
+
+import threading
+import time
+import fx3u_frame
+
+
+class Fx3uWriteQueue:
+    ##初期設定
+    ##(self, Fx3uクラスのインスタンス, deadline(float)=ためてから送信するまでの最大時間(秒),
+    ## refresh(float)=同じ値でも書き込み直す間隔(秒)、Noneなら書き込み直さない,
+    ## image(DeviceImage)=書き込んだ値を反映するPLCメモリのコピー)
+    def __init__(self, fx3u, deadline=0.05, refresh=1.0, image=None):
+        self.fx3u = fx3u
+        self.deadline = deadline
+        self.refresh = refresh
+        self.image = image
+
+        self.pending = {}        # 送信待ちの書込み {'D23': 1, ...}（1点ずつ）
+        self.pending_since = None # 送信待ちの最初の書込みをためた時刻
+        self.written = {}        # 最後に書き込んだ値と時刻 {'D23': (1, 時刻), ...}
+        self.lock = threading.Lock()
+
+        ##統計
+        self.put_count = 0      # put()で受け付けた点数
+        self.skip_count = 0     # 同じ値なので省略した点数
+        self.frame_count = 0    # 送信した電文の数
+
+    ##書込みの追加
+    ##put({デバイス番号(str): 書込み内容(int または intのリスト), ...}, force=Trueなら同じ値でも必ず書き込む)
+    def put(self, values, force=False):
+        now = time.time()
+        with self.lock:
+            for kind, number, value in fx3u_frame.to_points(values):
+                device = fx3u_frame.device_name(kind, number)
+                self.put_count = self.put_count + 1
+
+                # 前回書き込んだ値と同じで、書き込み直す時間になっていなければ省略
+                if not force and device not in self.pending and device in self.written:
+                    last_value, last_time = self.written[device]
+                    if last_value == value and (self.refresh is None or now - last_time < self.refresh):
+                        self.skip_count = self.skip_count + 1
+                        continue
+
+                self.pending[device] = value # 同じデバイスへの書込みは最後の値だけを送る
+                if self.pending_since is None:
+                    self.pending_since = now
+
+    ##期限が来ていれば送信
+    ##戻り値: 送信した電文の数
+    def poll(self):
+        with self.lock:
+            if self.pending_since is None or time.time() - self.pending_since < self.deadline:
+                return 0
+        return self.flush()
+
+    ##送信待ちの書込みをすぐに送信
+    ##送信に失敗した場合は送信待ちのまま残し、例外を投げる（次のpoll()で再送）
+    ##戻り値: 送信した電文の数
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return 0
+            values = self.pending
+            frames = self.fx3u.write_devices(values)
+
+            now = time.time()
+            for device, value in values.items():
+                self.written[device] = (value, now)
+            self.pending = {}
+            self.pending_since = None
+            self.frame_count = self.frame_count + frames
+
+        # 書き込んだ値をPLCメモリのコピーに反映
+        if self.image is not None:
+            self.image.update(values, now)
+        return frames
+
+    ##統計の表示
+    def print_stats(self):
+        print("書込み要求 : " + str(self.put_count) + " 点（同じ値のため省略 " + str(self.skip_count) + " 点）")
+        print("送信した電文 : " + str(self.frame_count))
@@ -0,0 +1,98 @@
+#########################################################################
+#file:image_cache.py
+#date:2026/10/18
+#file_content:マスク画像などの読込み結果のキャッシュ（ファイル更新時に読み直し）
+#########################################################################
+
+##検査のたびに cv2.imread → cv2.resize していたマスク画像を、リサイズ済みの状態で保持しておく
+##・キーは (ファイルパス, リサイズ後のサイズ, 読込みフラグ)
+##・ファイルの更新時刻(mtime)が変わった時だけ読み直す（マスク画像を差し替えても再起動は不要）
+##  更新時刻の確認は check_interval 秒に1回だけ行う
+##・返す画像は書込み禁止（キャッシュの中身を書き換えないように）。書き換える場合は .copy() してから使う
+##
+##使い方:
+##    cache = ImageCache()
+##    cache.preload([mask_path1, mask_path2], (640, 480))   # 起動時に読み込んでおく
+##    mask = cache.get(mask_path1, (640, 480))              # 検査ごとに呼ぶ（ファイルアクセスなし）
+
+import os
+import threading
+import time
+import cv2
+
+
+class _Entry:
+    def __init__(self, image, mtime):
+        self.image = image           # リサイズ済みの画像
+        self.mtime = mtime           # 読み込んだ時のファイルの更新時刻
+        self.checked = time.time()   # 最後に更新時刻を確認した時刻
+
+
+class ImageCache:
+    ##初期設定
+    ##(self, check_interval(float)=ファイルの更新時刻を確認する間隔(秒)、0なら毎回確認)
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        ##統計
+        self.load_count = 0  # ファイルから読み込んだ回数
+        self.hit_count = 0   # キャッシュから返した回数
+
+    ##画像の取得
+    ##get(ファイルパス(str), size(tuple)=(幅, 高さ)、Noneならリサイズしない, flags(int)=cv2.imreadのフラグ(0:グレー, 1:カラー))
+    ##戻り値: 書込み禁止のnumpy配列
+    def get(self, path, size=None, flags=0):
+        key = (path, size, flags)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry.checked < self.check_interval:
+                self.hit_count = self.hit_count + 1
+                return entry.image
+
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                if entry is not None:
+                    # 読み込み済みのファイルが一時的に見つからない場合（差し替え中など）は前の画像を使う
+                    entry.checked = now
+                    self.hit_count = self.hit_count + 1
+                    return entry.image
+                raise FileNotFoundError("画像ファイルが見つかりません: " + path)
+
+            if entry is not None and entry.mtime == mtime:
+                entry.checked = now
+                self.hit_count = self.hit_count + 1
+                return entry.image
+
+            image = self._load(path, size, flags)
+            self.entries[key] = _Entry(image, mtime)
+            return image
+
+    ##ファイルから読み込んでリサイズ
+    def _load(self, path, size, flags):
+        image = cv2.imread(path, flags)
+        if image is None:
+            raise FileNotFoundError("画像ファイルを読み込めません: " + path)
+        if size is not None:
+            image = cv2.resize(image, size)
+        image.setflags(write=False)
+        self.load_count = self.load_count + 1
+        return image
+
+    ##起動時の読込み
+    ##preload([ファイルパス, ...], size, flags)
+    ##見つからないファイルは表示だけして飛ばす（検査時のget()で例外になる）
+    def preload(self, paths, size=None, flags=0):
+        for path in paths:
+            try:
+                self.get(path, size, flags)
+            except FileNotFoundError as e:
+                print(e)
+
+    ##キャッシュを空にする
+    def clear(self):
+        with self.lock:
+            self.entries = {}
@@ -3,18 +3,27 @@
 #UPDATE:2025/12/3
 #name:hashimoto
 #file_content:検査スレッド追加
+#UPDATE:2026/10/18 PLC通信をセッションモード（ソケット使い回し）に変更
+#UPDATE:2026/10/18 PLCの読出し・時刻同期を一括読出し・一括書込みに変更
+#UPDATE:2026/10/18 communicate_plcのwhileループをスケジューラ（固定周期・エッジ検出）に変更
+#UPDATE:2026/10/18 PLCメモリのコピー(DeviceImage)を使い、値が変わった時だけ処理する
+#UPDATE:2026/10/18 検査結果・危険信号の書込みを書込みキューでまとめて送信する
+#UPDATE:2026/10/18 camera_c5（マスク画像のキャッシュ付き）に変更
+#UPDATE:2026/10/18 起動を速くした（身体検出の推論モデルを起動直後から別スレッドで準備、未使用のimportを削除）
 #########################################################################
 
 import os          # OS関連の操作（画面クリア、シャットダウンなど）
 import fx3u_udp as fx3u        # PLC通信クラス（電文作成と送受信）
-import camera_c4 as camera     # カメラ制御・画像処理クラス
+import plc_scheduler           # PLCスキャンのスケジューラ（一定周期の読出しとエッジ検出）
+import plc_image               # PLCのデバイスメモリのコピー（変化検出付き）
+import fx3u_write_queue        # PLCへの書込みをまとめて送信するキュー
+import camera_c5 as camera     # カメラ制御・画像処理クラス
 import socket
 import threading   # マルチスレッド処理（複数の処理を並行実行）
 import signal      # OSからの信号処理（Ctrl+Cなど）
 import time        # 時間を扱う
-import psycopg2    # PostgreSQLデータベース接続用（現在はコメントアウト）
-
-import requests    # HTTPリクエスト用（ログサーバーへの通信などに使用）
+#import psycopg2    # PostgreSQLデータベース接続用（データベースの処理と一緒にコメントアウト。起動が遅くなるので使う時だけ読み込む）
+#import requests    # HTTPリクエスト用（ログサーバーへの通信。現在は未使用）
 import datetime    # 日付と時刻を扱う
 
 class MainActivity:
@@ -78,7 +87,7 @@ class MainActivity:
         #各処理の終了信号がFalseの間連続動作（メインスレッドは待機状態）
         while   not self.is_main_finish and  \
                 not camera.is_manage_camera_finish:
-            pass # 終了フラグが立つまで何もしない
+            time.sleep(0.1) # 終了フラグが立つまで待つ（passで回し続けるとCPUを1つ使い切ってしまう）
         
         # 終了フラグが立った後の処理
         if camera.is_camera_shutdown:
@@ -96,192 +105,246 @@ class MainActivity:
     #PLC通信（メインプログラム）
     # このスレッドが、PLCとのやり取りを行う心臓部
     def communicate_plc(self):
+        # PLCとの通信ソケットを開く（MainActivityが動いている間は同じソケットを使い回す）
+        fx3u.open()
+        
         # 起動時に各種カメラ許可信号を初期化（OFFにする）
-        print(fx3u.write_bitdevice('M20', 0))
-        print(fx3u.write_bitdevice('M21', 0))
-        print(fx3u.write_bitdevice('M22', 0))
-        print(fx3u.write_bitdevice('M155', 0))
+        # 従来のwrite_bitdevice('M20'/'M21'/'M22', 0)（4点ずつ）と同じくM20～M25、M155～M158をOFFにする（ランダム書込み1電文）
+        # M24（エラー解決信号）・M25も含めてOFFにする
+        print(fx3u.write_devices({'M20': [0] * 6, 'M155': [0] * 4}))
 
         #現在日時をPLCに送信（時刻同期）
+        #D50～D55は連続しているので一括書込み1電文で送信する
         dt_now = datetime.datetime.now()
-        print(fx3u.write_worddevice('D50', 1, dt_now.year))#年 (Dデバイスに書き込み)
-        print(fx3u.write_worddevice('D51', 1, dt_now.month))#月
-        print(fx3u.write_worddevice('D52', 1, dt_now.day))#日
-        print(fx3u.write_worddevice('D53', 1, dt_now.hour))#時
-        print(fx3u.write_worddevice('D54', 1, dt_now.minute))#分
-        print(fx3u.write_worddevice('D55', 1, dt_now.second))#秒
+        print(fx3u.write_devices({
+            'D50': dt_now.year,   #年 (Dデバイスに書き込み)
+            'D51': dt_now.month,  #月
+            'D52': dt_now.day,    #日
+            'D53': dt_now.hour,   #時
+            'D54': dt_now.minute, #分
+            'D55': dt_now.second, #秒
+        }))
         time.sleep(3)
         print(fx3u.write_bitdevice('M55', 1)) # 時刻同期完了信号をON
         
         print("communicate_plcモジュール（PLC通信モジュール）が動作しました")
         
-        state = 1 # 状態変数 (1: 正常状態, 2: エラー状態)
-        path = 'C:/startfile/g22025/finish.txt' #ここ一致させないとエラーが起きる
+        self.plc_state = 1 # 状態変数 (1: 正常状態, 2: エラー状態)
+        self.finish_path = 'C:/startfile/g22025/finish.txt' #ここ一致させないとエラーが起きる
         
-        # PLCとの通信と処理監視を行う無限ループ
-        while(1):
-            try:
-                start = time.time()#whileの1ループタイム測定スタート
-                
-                # 外部ファイルからシャットダウン/終了信号を読み込み
-                with open(path) as f:
-                    s = f.read()
-                if s == '2': # 外部ファイルが '2' ならシャットダウン
-                    print("シャットダウン信号が入りました")
-                    break
-                if s == '3': # 外部ファイルが '3' ならプログラム終了
-                    print("プログラムを終了")
-                    self.is_main_finish = True
-
-                # PLCから現在の状態（デバイス値）を読み出し
-                message_m = fx3u.read_bitdevice('M20')#M20～M23までの値を取得を取得(カメラ許可信号など)
-                message_finish = fx3u.read_bitdevice('M154')#M154の値を取得(装置終了信号など)
-                message_d = fx3u.read_worddevice('D91', 10)#D91～D100までの値を取得(エラー信号レジスタ)
-                
-                
-                #PLC側にエラーが出たとき動作 (電文が初期値でない、かつ状態が正常(state=1)の場合)
-                if message_d != '81000000000000000000000000000000000000000000' and state == 1:
-                    print(message_d)
-                    print("エラー発生")
-                    error_id = 0
-                    
-                    # D91～D100の各ワードの値を見て、どの種類のエラーかを判定
-                    if message_d[4:8] != '0000':
-                        print("非常停止")
-                        error_id = 1#非常停止
-                    if message_d[8:12] != '0000':
-                        error_id = 2#DC24Vモニタ
-                        print("モニタ")
-                    if message_d[12:16] != '0000':
-                        error_id = 3#人体検知
-                        print("人体検知")
-                    if message_d[16:20] != '0000':
-                        error_id = 4#一次空気圧力不足
-                        print("圧力不足")
-                    if message_d[20:24] != '0000':
-                        error_id = 5#袋がない
-                        print("袋なし")
-                    if message_d[24:28] != '0000':
-                        error_id = 6#パソコンの異常
-                        print("パソコンの異常")
-                    if message_d[28:32] != '0000':
-                        error_id = 7#機器が異常
-                        print("異常な入力の組み合わせ")
-                    if message_d[32:36] != '0000':
-                        error_id = 8
-                        print("バッテリ残量低下")
-                    if message_d[36:40] != '0000':
-                        error_id = 9
-                        print("稼働時間")
-                    
-                    #データベースに書き込み（現在はコメントアウト）
-                    time_stamp = time.strftime('%Y-%m-%d %H:%M:%S')#現在日時を取得
-                    #self.cur.execute(
-                    #    "INSERT INTO t_errorlog (error_id, errored_time, error_status) VALUES (" + str(error_id) + ", '" + time_stamp + "', FALSE)")
-                    #self.conn.commit()
-                    print("エラー情報をデータベースに書き込みました")
-                    
-                    state = 2#ステータスをエラー中（state=2）に変更
-                
-                #PLC側のエラーが解決したときに動作
-                if state == 2:
-                    # エラー信号レジスタ(D91-D100)が全て0に戻ったことを確認
-                    if message_d == '81000000000000000000000000000000000000000000':
-                        print("エラーが解除されました")
-                        fx3u.write_bitdevice('M24', 0)#エラー解決信号（M24）をリセット
-
-                        #エラー解決有無をTrueに上書き（現在はコメントアウト）
-                        #self.cur.execute("UPDATE t_errorlog SET error_status = TRUE WHERE error_number = (SELECT MAX(error_number) FROM t_errorlog)")
-                        #self.conn.commit()
-                        print("エラー情報を上書きました")
-                        
-                        state = 1#ステータスをエラーなし（state=1）に変更
-
-                
-                # **カメラ検査の開始トリガー処理**
-                # Mデバイスの値の特定のビットが'1'（ON）になったら、対応するカメラ検査を開始
-                
-                #押出部カメラ許可信号を受け取ったら動作 (M20)
-                if message_m[4] == '1': # 読み出し電文のM20の位置（4文字目）が'1'なら
-                    print("押し出し部のカメラ許可が出ました")
-                    fx3u.write_bitdevice('M20', 0)#PLC側の許可信号をリセット（処理の重複を防ぐ）
-                    camera.is_start_oshidashi = True#画像処理スレッドへ開始信号をON
-                    
-                #袋セット部カメラ許可信号を受け取ったら動作 (M21)
-                if message_m[5] == '1':
-                    print("袋セット部のカメラ許可が出ました")
-                    fx3u.write_bitdevice('M21', 0)#カメラ許可信号をリセット
-                    camera.is_start_fukuro = True#画像処理スレッドへ開始信号をON
-                    
-                #検査部カメラ許可信号を受け取ったら動作 (M22)
-                if message_m[6] == '1':
-                    print("検査部のカメラ許可が出ました")
-                    fx3u.write_bitdevice('M22', 0)#カメラ許可信号をリセット
-                    camera.is_start_kensa = True#画像処理スレッドへ開始信号をON
-                    
-                # **カメラ検査の結果フィードバック処理**
-                
-                #押出部の検査が完了したら動作
-                if camera.is_send_oshidashi_result:
-                    #fx3u.write_worddevice('D20', 1, camera.oshidashi_result)#押出部の検査結果を書込み（本来の結果値）
-                    fx3u.write_worddevice('D20', 1, 1)#押出部の検査結果をD20に書込み（ここでは常に1を書き込んでいる）
-                    camera.is_send_oshidashi_result = False#検査完了信号をリセット
-                    
-                    
-                #袋セット部の検査が完了したら動作
-                if camera.is_send_fukuro_result:
-                    #fx3u.write_worddevice('D21', 1, camera.fukuro_result)#袋セット部の検査結果を書込み
-                    fx3u.write_worddevice('D21', 1, 1)#袋セット部の検査結果をD21に書込み
-                    camera.is_send_fukuro_result = False#検査完了信号をリセット
-                    
-                    
-                #検査部の検査が完了したら動作
-                if camera.is_send_kensa_result:
-                    #fx3u.write_worddevice('D22', 1, camera.kensa_result)#検査部の検査結果を書込み
-                    fx3u.write_worddevice('D22', 1, 1)#検査部の検査結果をD22に書込み
-                    camera.is_send_kensa_result = False#検査完了信号をリセット
-                    camera.is_ser_finish = False
-                    
-                    
-                       
-                #押出部のワークセット完了後、装置内に手や身体を検出したら動作
-                if camera.is_detect_hand:
-                    fx3u.write_worddevice2('D23', 2, 1, 1) # D23に危険信号を書き込み
-                    print("手が検出されました")
-                else:
-                    fx3u.write_worddevice2('D23', 2, 1, 1) # 手が検出されていない場合も同じ値を書き込んでいる（※修正が必要な可能性あり）
-                
-                #M155が1ならメインプログラム終了信号をTrueに
-                if message_finish[5] == '1': # M155（装置終了信号）がONなら
-                    camera.finish_cap_oshidashi = True # カメラの終了処理を起動
-                    self.is_main_finish = True # メインループを終了
-                    print("終了します")
-                    #fx3u.finish_signal()
-                    time.sleep(3)
-                    print("正しく終了しました")
-                    
-                stop = time.time()#whileの1ループタイム測定終了
-                #print(stop - start)#whileの1ループタイムを表示（処理速度のデバッグ用）
-            
-            #PLC通信モジュール例外処理（通信が途切れた、電文解析エラーなど）
-            except:
-                self.datetime_now = datetime.datetime.now()#現在日時を取得
-                self.datetime_now = self.datetime_now.isoformat()#日付データを文字列に変換
-
-                fx3u.write_worddevice('D24', 1, 2) # PLCのD24にエラーコード '2' を書き込み
-                
-                error_message = ":[Error] main_activity, communication error with PLC"#エラーメッセージを設定
-
-                import traceback
-                traceback.print_exc()#エラー詳細を表示
-                self.is_main_finish = True#メインプログラム終了信号をTrueに（強制終了へ）
-                print("メインプログラムでエラーが発生しました")
+        # PLCのデバイスメモリのコピー（スケジューラの読出し結果と、書き込んだ値で更新する）
+        # PLCの値はFx3u.read_*で直接読まずにここから読む
+        self.image = plc_image.DeviceImage()
+        self.image.subscribe(self.on_plc_change) # 値が変わった時だけ通知を受ける
+        
+        # PLCスキャンのスケジューラ
+        # 従来の while(1) はネットワークが許す限りの速さで回っていたので、50ms周期の固定サイクルにする
+        self.scheduler = plc_scheduler.PlcScheduler(fx3u, cycle_time=0.05, image=self.image)
+        
+        # PLCへの書込みキュー
+        # 同じ値の書込みは省略し（1秒ごとには書き込み直す）、1サイクル分の書込みをまとめて送信する
+        # 危険信号(D23)を遅らせないよう、deadline=0で毎サイクルの最後に送信する
+        self.write_queue = fx3u_write_queue.Fx3uWriteQueue(fx3u, deadline=0.0, refresh=1.0, image=self.image)
+        
+        # 読み出すデバイスと周期・優先度
+        self.scheduler.add_poll([('M20', 4), ('M154', 4)], period=0.05, priority=2) # M20～M23(カメラ許可信号など)、M154～M157(装置終了信号など)
+        self.scheduler.add_poll([('D91', 10)], period=0.2, priority=1)               # D91～D100(エラー信号レジスタ)
+        
+        # 周期的に実行する処理（優先度の高い順に実行）
+        self.scheduler.add_task(self.send_results, period=0.05, priority=3)      # 検査結果・危険信号の書込み
+        self.scheduler.add_task(self.write_queue.poll, period=0.05, priority=2)  # たまった書込みを送信
+        self.scheduler.add_task(self.check_finish_file, period=1.0, priority=0)  # 外部ファイルの終了信号
+        # PLCのエラー監視は、D91～D100の値が変わった時だけ on_plc_change から実行する
+        
+        # カメラ許可信号がONの間は読み出すたびに動作（従来と同じ。PC側でOFFに戻すので、立上りだと取りこぼすことがある）
+        self.scheduler.on_level('M20', self.start_oshidashi) # 押出部カメラ許可信号
+        self.scheduler.on_level('M21', self.start_fukuro)    # 袋セット部カメラ許可信号
+        self.scheduler.on_level('M22', self.start_kensa)     # 検査部カメラ許可信号
+        # 装置終了信号の立上りで動作
+        self.scheduler.on_rising('M155', self.finish_main)
+        
+        # PLC通信モジュール例外処理（通信が途切れた、電文解析エラーなど）
+        self.scheduler.on_error = self.handle_plc_error
+        
+        # PLCとの通信と処理監視を行う（シャットダウン信号が入るまで戻らない）
+        self.scheduler.run()
 
         print("終了処理に入ります")
+        self.scheduler.print_stats() # スキャン周期・ジッタの統計を表示
+        self.write_queue.print_stats() # 書込みの統計を表示
+        self.write_queue.flush() # 送信待ちの書込みを送信
+        fx3u.close() # PLCとの通信ソケットを閉じる
         camera.is_camera_shutdown = True # カメラ管理スレッドに終了を通知
         print("全てのモジュールが終了しました")
         print("安全にシャットダウン処理に入ります")
         self.is_main_finish = True
+    
+    # 外部ファイルからシャットダウン/終了信号を読み込み
+    def check_finish_file(self):
+        with open(self.finish_path) as f:
+            s = f.read()
+        if s == '2': # 外部ファイルが '2' ならシャットダウン
+            print("シャットダウン信号が入りました")
+            self.scheduler.stop()
+        if s == '3': # 外部ファイルが '3' ならプログラム終了
+            print("プログラムを終了")
+            self.is_main_finish = True
+    
+    # PLCメモリのコピーの値が変わった時に動作
+    # diff: 変化したデバイスの {デバイス名: (前の値, 新しい値)}
+    def on_plc_change(self, diff):
+        # エラー信号レジスタ(D91～D100)のどれかが変わったらエラー監視
+        for i in range(10):
+            if 'D' + str(91 + i) in diff:
+                self.check_error()
+                break
+    
+    # PLC側のエラー監視
+    def check_error(self):
+        message_d = self.image.get_many(['D' + str(91 + i) for i in range(10)], 0) # D91～D100の値のリスト
+        
+        #PLC側にエラーが出たとき動作 (エラー信号レジスタが全て0でない、かつ状態が正常(state=1)の場合)
+        if any(message_d) and self.plc_state == 1:
+            print(message_d)
+            print("エラー発生")
+            error_id = 0
+            
+            # D91～D100の各ワードの値を見て、どの種類のエラーかを判定
+            if message_d[0] != 0:
+                print("非常停止")
+                error_id = 1#非常停止
+            if message_d[1] != 0:
+                error_id = 2#DC24Vモニタ
+                print("モニタ")
+            if message_d[2] != 0:
+                error_id = 3#人体検知
+                print("人体検知")
+            if message_d[3] != 0:
+                error_id = 4#一次空気圧力不足
+                print("圧力不足")
+            if message_d[4] != 0:
+                error_id = 5#袋がない
+                print("袋なし")
+            if message_d[5] != 0:
+                error_id = 6#パソコンの異常
+                print("パソコンの異常")
+            if message_d[6] != 0:
+                error_id = 7#機器が異常
+                print("異常な入力の組み合わせ")
+            if message_d[7] != 0:
+                error_id = 8
+                print("バッテリ残量低下")
+            if message_d[8] != 0:
+                error_id = 9
+                print("稼働時間")
+            
+            #データベースに書き込み（現在はコメントアウト）
+            time_stamp = time.strftime('%Y-%m-%d %H:%M:%S')#現在日時を取得
+            #self.cur.execute(
+            #    "INSERT INTO t_errorlog (error_id, errored_time, error_status) VALUES (" + str(error_id) + ", '" + time_stamp + "', FALSE)")
+            #self.conn.commit()
+            print("エラー情報をデータベースに書き込みました")
+            
+            self.plc_state = 2#ステータスをエラー中（state=2）に変更
+        
+        #PLC側のエラーが解決したときに動作
+        if self.plc_state == 2:
+            # エラー信号レジスタ(D91-D100)が全て0に戻ったことを確認
+            if not any(message_d):
+                print("エラーが解除されました")
+                fx3u.write_bitdevice('M24', 0)#エラー解決信号（M24）をリセット
+
+                #エラー解決有無をTrueに上書き（現在はコメントアウト）
+                #self.cur.execute("UPDATE t_errorlog SET error_status = TRUE WHERE error_number = (SELECT MAX(error_number) FROM t_errorlog)")
+                #self.conn.commit()
+                print("エラー情報を上書きました")
+                
+                self.plc_state = 1#ステータスをエラーなし（state=1）に変更
+    
+    # **カメラ検査の開始トリガー処理**
+    # Mデバイスが立ち上がったら（OFF→ON）、対応するカメラ検査を開始
+    
+    #押出部カメラ許可信号を受け取ったら動作 (M20)
+    def start_oshidashi(self):
+        print("押し出し部のカメラ許可が出ました")
+        self.write_queue.put({'M20': [0, 0, 0, 0]}, force=True)#PLC側の許可信号をリセット（処理の重複を防ぐ）（従来のwrite_bitdeviceと同じく4点）
+        camera.is_start_oshidashi = True#画像処理スレッドへ開始信号をON
+    
+    #袋セット部カメラ許可信号を受け取ったら動作 (M21)
+    def start_fukuro(self):
+        print("袋セット部のカメラ許可が出ました")
+        self.write_queue.put({'M21': [0, 0, 0, 0]}, force=True)#カメラ許可信号をリセット
+        camera.is_start_fukuro = True#画像処理スレッドへ開始信号をON
+    
+    #検査部カメラ許可信号を受け取ったら動作 (M22)
+    def start_kensa(self):
+        print("検査部のカメラ許可が出ました")
+        self.write_queue.put({'M22': [0, 0, 0, 0]}, force=True)#カメラ許可信号をリセット
+        camera.is_start_kensa = True#画像処理スレッドへ開始信号をON
+    
+    # **カメラ検査の結果フィードバック処理**
+    # 書込みは書込みキューに入れ、write_queue.poll()でD20～D24をまとめて送信する
+    def send_results(self):
+        #押出部の検査が完了したら動作
+        if camera.is_send_oshidashi_result:
+            #fx3u.write_worddevice('D20', 1, camera.oshidashi_result)#押出部の検査結果を書込み（本来の結果値）
+            self.write_queue.put({'D20': 1}, force=True)#押出部の検査結果をD20に書込み（ここでは常に1を書き込んでいる）
+            camera.is_send_oshidashi_result = False#検査完了信号をリセット
+            
+            
+        #袋セット部の検査が完了したら動作
+        if camera.is_send_fukuro_result:
+            #fx3u.write_worddevice('D21', 1, camera.fukuro_result)#袋セット部の検査結果を書込み
+            self.write_queue.put({'D21': 1}, force=True)#袋セット部の検査結果をD21に書込み
+            camera.is_send_fukuro_result = False#検査完了信号をリセット
+            
+            
+        #検査部の検査が完了したら動作
+        if camera.is_send_kensa_result:
+            #fx3u.write_worddevice('D22', 1, camera.kensa_result)#検査部の検査結果を書込み
+            self.write_queue.put({'D22': 1}, force=True)#検査部の検査結果をD22に書込み
+            camera.is_send_kensa_result = False#検査完了信号をリセット
+            camera.is_ser_finish = False
+            
+            
+               
+        #押出部のワークセット完了後、装置内に手や身体を検出したら動作
+        #前回と同じ値なら書込みキューで省略される（1秒ごとには書き込み直す）
+        if camera.is_detect_hand:
+            self.write_queue.put({'D23': [1, 1]}) # D23に危険信号を書き込み
+            print("手が検出されました")
+        else:
+            self.write_queue.put({'D23': [1, 1]}) # 手が検出されていない場合も同じ値を書き込んでいる（※修正が必要な可能性あり）
+    
+    #M155が立ち上がったらメインプログラム終了信号をTrueに
+    def finish_main(self):
+        camera.finish_cap_oshidashi = True # カメラの終了処理を起動
+        print("終了します")
+        #fx3u.finish_signal()
+        # スケジューラのスレッドで待つとPLCのスキャン・書込みが止まるので、別スレッドで待つ
+        thread = threading.Thread(target=self.wait_finish)
+        thread.daemon = True
+        thread.start()
+    
+    #カメラの終了処理を待ってからメインループを終了
+    def wait_finish(self):
+        time.sleep(3)
+        print("正しく終了しました")
+        self.is_main_finish = True # メインループを終了
+    
+    #PLC通信モジュール例外処理（通信が途切れた、電文解析エラーなど）
+    def handle_plc_error(self, e):
+        self.datetime_now = datetime.datetime.now()#現在日時を取得
+        self.datetime_now = self.datetime_now.isoformat()#日付データを文字列に変換
+
+        fx3u.write_worddevice('D24', 1, 2) # PLCのD24にエラーコード '2' を書き込み
+        
+        error_message = ":[Error] main_activity, communication error with PLC"#エラーメッセージを設定
+
+        import traceback
+        traceback.print_exc()#エラー詳細を表示
+        self.is_main_finish = True#メインプログラム終了信号をTrueに（強制終了へ）
+        print("メインプログラムでエラーが発生しました")
                
 # メインプログラムのエントリーポイント
 if __name__ == '__main__':
@@ -289,7 +352,8 @@ if __name__ == '__main__':
     #time.sleep(1)
 
     #fx3u = fx3u.Fx3u(socket.gethostbyname(socket.gethostname()), 50000, 4096) #仮想 #fx3u通信クラスをインスタンス化（ローカルホスト）
-    fx3u = fx3u.Fx3u("192.168.1.254", 5000, 4096, local_port=4001, timeout=5.0) #実機 #fx3u通信クラスをインスタンス化（実機/仮想PLCのIPアドレス）
+    fx3u = fx3u.Fx3u("192.168.1.254", 5000, 4096, local_port=4001, timeout=5.0, session=True) #実機 #fx3u通信クラスをインスタンス化（実機/仮想PLCのIPアドレス）
     camera = camera.Camera()#カメラ制御クラスをインスタンス化
+    camera.start_warmup() # 身体検出の推論モデルを別スレッドで準備（PLCの時刻同期などと並行して行う）
     main_activity = MainActivity()#メインクラスをインスタンス化
     main_activity.Run() # プログラム実行開始
\ No newline at end of file
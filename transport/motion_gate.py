@@ -0,0 +1,117 @@
+#########################################################################
+#file:motion_gate.py
+#date:2026/10/18
+#file_content:動きの有無による推論の間引き（背景差分・フレーム差分、マスク範囲内のみ）
+#########################################################################
+
+##身体検出（YOLO）の前に、画像に動きがあるかを軽い処理で調べる
+##動きが無い（誰もいない・何も動いていない）間は推論しない → 検査の画像処理にCPUを回す
+##・method='mog2' : 背景差分（cv2.createBackgroundSubtractorMOG2、movement/move_tracking.py と同じ方法）
+##  method='diff' : 前回の画像とのフレーム差分
+##・マスク画像の白い範囲の中だけで、変化した画素の割合が threshold 以上なら動きありとする
+##・動きが無くても heartbeat 秒ごとに1回は推論させる（止まっている人を見逃さないため）
+##・処理を軽くするため、画像を size に縮小してから調べる
+##
+##使い方:
+##    gate = MotionGate(mask=cv2.imread("mask_oshidashi.jpg", 0), threshold=0.005, heartbeat=1.0)
+##    if gate.check(image):
+##        results = model.predict(image)
+
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    ##初期設定
+    ##(self, mask(numpy配列)=調べる範囲のマスク画像（グレー、白が範囲。Noneなら画像全体）, method(str)='mog2'または'diff',
+    ## threshold(float)=動きありとする変化した画素の割合(0.0～1.0), heartbeat(float)=動きが無くても推論させる間隔(秒),
+    ## size(tuple)=調べる時の画像サイズ(幅, 高さ), diff_threshold(int)=フレーム差分で変化とする明るさの差,
+    ## history(int)/var_threshold(float)=背景差分の設定)
+    def __init__(self, mask=None, method='mog2', threshold=0.005, heartbeat=1.0, size=(320, 240),
+                 diff_threshold=25, history=500, var_threshold=25):
+        if method not in ('mog2', 'diff'):
+            raise ValueError("methodは'mog2'または'diff'です: " + str(method))
+        self.method = method
+        self.threshold = threshold
+        self.heartbeat = heartbeat
+        self.size = size
+        self.diff_threshold = diff_threshold
+
+        width, height = size
+        if mask is None:
+            self.mask = None
+            self.area = width * height
+        else:
+            mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+            self.mask = np.where(mask > 127, 255, 0).astype(np.uint8)
+            self.area = max(cv2.countNonZero(self.mask), 1)
+
+        self.subtractor = None
+        if method == 'mog2':
+            # 影は検出しない（影を動きとして数えないように）
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold, detectShadows=False)
+
+        ##作業用画像（毎回確保しないように使い回す）
+        self.small = np.empty((height, width, 3), np.uint8)
+        self.gray = np.empty((height, width), np.uint8)
+        self.blurred = np.empty((height, width), np.uint8)  # フレーム差分の今回の画像（ぼかした画像）
+        self.previous = np.empty((height, width), np.uint8) # フレーム差分の前回の画像（今回の画像と入れ替えて使う）
+        self.has_previous = False  # 前回の画像があるか
+        self.foreground = np.empty((height, width), np.uint8)
+
+        self.last_pass = None      # 最後に推論させた時刻
+        self.ratio = 0.0           # 最後に調べた変化した画素の割合
+
+        ##統計
+        self.motion_count = 0      # 動きありで推論させた回数
+        self.heartbeat_count = 0   # 動きは無いが一定間隔で推論させた回数
+        self.static_count = 0      # 動きが無いので推論させなかった回数
+
+    ##推論するかどうか
+    ##戻り値: 動きがある、または前回推論させてからheartbeat秒以上たっていればTrue
+    def check(self, image):
+        now = time.time()
+        motion = self._motion(image)
+        if motion:
+            self.motion_count = self.motion_count + 1
+        elif self.last_pass is None or now - self.last_pass >= self.heartbeat:
+            self.heartbeat_count = self.heartbeat_count + 1
+        else:
+            self.static_count = self.static_count + 1
+            return False
+        self.last_pass = now
+        return True
+
+    ##動きがあるか（マスク範囲内の変化した画素の割合がthreshold以上）
+    def _motion(self, image):
+        cv2.resize(image, self.size, dst=self.small, interpolation=cv2.INTER_LINEAR) # INTER_AREAは1920×1080で8ms程度かかるので使わない
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+        if self.method == 'mog2':
+            self.subtractor.apply(self.gray, self.foreground)
+        else:
+            cv2.GaussianBlur(self.gray, (5, 5), 0, dst=self.blurred)
+            self.blurred, self.previous = self.previous, self.blurred # 今回の画像を次回の前回の画像にする
+            if not self.has_previous:
+                self.has_previous = True
+                self.ratio = 1.0
+                return True # 比べる画像が無いので動きありとする
+            cv2.absdiff(self.previous, self.blurred, dst=self.foreground)
+            cv2.threshold(self.foreground, self.diff_threshold, 255, cv2.THRESH_BINARY, dst=self.foreground)
+
+        # 細かいノイズを除去してからマスク範囲内の画素を数える
+        cv2.erode(self.foreground, None, dst=self.foreground, iterations=1)
+        if self.mask is not None:
+            cv2.bitwise_and(self.foreground, self.mask, dst=self.foreground)
+        self.ratio = cv2.countNonZero(self.foreground) / self.area
+        return self.ratio >= self.threshold
+
+    ##統計の取得
+    def stats(self):
+        return {
+            'motion': self.motion_count,
+            'heartbeat': self.heartbeat_count,
+            'static': self.static_count,
+            'ratio': self.ratio,
+        }
@@ -0,0 +1,282 @@
+#########################################################################
+#file:person_tracker.py
+#date:2026/10/18
+#file_content:人（身体）検出結果の追跡（フレーム間で同じ人に同じIDを付ける、滞在時間の記録）
+#########################################################################
+
+##YOLOの検出結果（矩形）をフレーム間で対応付けて、同じ人に同じIDを付ける
+##・人ごとにカルマンフィルタ（矩形の中心・幅・高さとその速度）で次の位置を予測する
+##・予測した矩形と検出した矩形を IoU（重なりの割合）の大きい順に対応付ける
+##  IoUで対応しなかったものは、中心の距離が近い順に対応付ける（推論の間隔が長く、矩形が重ならない場合）
+##・対応しなかった検出は新しい人として追跡を始め、min_hits 回検出したら確定する
+##・max_age 秒検出されなかった人は追跡を終了し、滞在時間（最初に検出してから最後に検出するまで）を記録する
+##・推論しない間は predict() で予測した位置を使える（推論より十分軽い）
+##  detector_service.DetectorService は、推論しなかった画像（動きが無い・detect_every枚に1枚だけ推論する間）で predict() を呼ぶ
+##
+##検出結果の矩形は [x1, y1, x2, y2, 信頼度, クラス]（detector_service.py の検出結果と同じ）
+##
+##使い方:
+##    tracker = PersonTracker(iou_threshold=0.3, max_age=2.0)
+##    tracks = tracker.update(boxes, timestamp)   # 推論するたびに呼ぶ（戻り値は今回検出された確定済みの人）
+##    for track in tracks:
+##        print(track.id, track.box(), track.dwell())
+##    for track in tracker.pop_finished():        # 追跡を終了した人
+##        print(track.id, track.dwell())
+
+import collections
+import threading
+import time
+import numpy as np
+
+
+##カルマンフィルタのノイズ（矩形の大きさに対する割合）
+_STD_POSITION = 0.05  # 1秒あたりの位置・大きさの変化
+_STD_VELOCITY = 0.1   # 1秒あたりの速度の変化
+_STD_MEASURE = 0.05   # 検出した矩形のずれ
+
+
+##矩形の変換 [x1, y1, x2, y2] → [中心x, 中心y, 幅, 高さ]
+def _to_xywh(box):
+    return np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2, box[2] - box[0], box[3] - box[1]], np.float64)
+
+
+##矩形の変換 [中心x, 中心y, 幅, 高さ] → [x1, y1, x2, y2]
+def _to_xyxy(xywh):
+    cx, cy, w, h = xywh[:4]
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], np.float64)
+
+
+##IoU（2つの矩形の重なりの割合）の行列
+##(a(N×4の配列), b(M×4の配列)) 戻り値: N×Mの配列
+def iou_matrix(a, b):
+    a = np.asarray(a, np.float64).reshape(-1, 4)
+    b = np.asarray(b, np.float64).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+##スコアの大きい順に対応付ける
+##(score(N×Mの配列), threshold=これ以上のものだけ対応付ける, rows・cols=対応付けに使う行・列の番号)
+##戻り値: [(行, 列), ...]
+def _greedy_match(score, threshold, rows, cols):
+    pairs = []
+    if not rows or not cols:
+        return pairs
+    sub = score[np.ix_(rows, cols)]
+    used_rows, used_cols = set(), set()
+    for index in np.argsort(-sub, axis=None):
+        i, j = np.unravel_index(index, sub.shape)
+        if sub[i, j] < threshold:
+            break
+        if i in used_rows or j in used_cols:
+            continue
+        used_rows.add(i)
+        used_cols.add(j)
+        pairs.append((rows[i], cols[j]))
+    return pairs
+
+
+##追跡中の人1人分
+class Track:
+    def __init__(self, track_id, box, timestamp):
+        self.id = track_id
+        self.first_seen = timestamp  # 最初に検出した時刻
+        self.last_seen = timestamp   # 最後に検出した時刻
+        self.hits = 1                # 検出された回数
+        self.confidence = float(box[4]) if len(box) > 4 else 1.0
+        self.class_id = float(box[5]) if len(box) > 5 else 0.0
+        self.is_confirmed = False
+
+        ##カルマンフィルタの状態 [中心x, 中心y, 幅, 高さ, 各速度]
+        xywh = _to_xywh(box)
+        size = max(xywh[2], xywh[3], 1.0)
+        self.x = np.concatenate([xywh, np.zeros(4)])
+        self.P = np.diag(np.square([size * 0.1] * 4 + [size] * 4)) # 速度は最初わからないので大きくする
+        self.time = timestamp
+
+    ##timestamp時点の状態の予測（状態は変えない）
+    def _predict(self, timestamp):
+        dt = max(timestamp - self.time, 0.0)
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        size = max(self.x[2], self.x[3], 1.0)
+        Q = np.diag(np.square([_STD_POSITION * size] * 4 + [_STD_VELOCITY * size] * 4) * dt)
+        return F @ self.x, F @ self.P @ F.T + Q
+
+    ##検出した矩形で状態を更新
+    def correct(self, box, timestamp):
+        x, P = self._predict(timestamp)
+        z = _to_xywh(box)
+        size = max(z[2], z[3], 1.0)
+        S = P[:4, :4] + np.diag(np.square([_STD_MEASURE * size] * 4))
+        K = P[:, :4] @ np.linalg.inv(S)
+        self.x = x + K @ (z - x[:4])
+        self.P = P - K @ P[:4, :]
+        self.time = timestamp
+        self.last_seen = timestamp
+        self.hits = self.hits + 1
+        self.confidence = float(box[4]) if len(box) > 4 else 1.0
+        self.class_id = float(box[5]) if len(box) > 5 else self.class_id
+
+    ##矩形 [x1, y1, x2, y2]（timestampを指定するとその時点の予測、省略時は最後に更新した時点）
+    def box(self, timestamp=None):
+        if timestamp is None:
+            return _to_xyxy(self.x)
+        return _to_xyxy(self._predict(timestamp)[0])
+
+    ##滞在時間（秒）
+    def dwell(self):
+        return self.last_seen - self.first_seen
+
+
+class PersonTracker:
+    ##初期設定
+    ##(self, iou_threshold(float)=対応付けるIoUの下限, center_distance(float)=IoUで対応しなかった時に対応付ける中心の距離の上限（矩形の大きさに対する割合）,
+    ## max_age(float)=この時間（秒）検出されなければ追跡を終了, min_hits(int)=この回数検出したら確定, history(int)=記録する追跡終了の数)
+    def __init__(self, iou_threshold=0.3, center_distance=1.0, max_age=2.0, min_hits=2, history=100):
+        self.iou_threshold = iou_threshold
+        self.center_distance = center_distance
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []                                   # 追跡中の人
+        self.finished = collections.deque(maxlen=history)  # 追跡を終了した人（まだpop_finished()で取り出していないもの）
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+        ##統計
+        self.update_count = 0     # update()の回数
+        self.predict_count = 0    # predict()の回数
+        self.confirmed_count = 0  # 確定した人の数
+        self.dwell_max = 0.0      # 最大の滞在時間（秒）
+        self.update_time = 0.0    # update()にかかった時間の合計（秒）
+
+    ##検出結果で追跡を更新
+    ##update(boxes(N×6の配列)=検出結果, timestamp(float)=画像の取得時刻（省略時は現在時刻）)
+    ##戻り値: 今回検出された確定済みの人(Track)のリスト
+    def update(self, boxes, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        start = time.perf_counter()
+        boxes = np.asarray(boxes, np.float64)
+        if boxes.size == 0:
+            boxes = np.zeros((0, 6))
+        with self.lock:
+            matches = self._associate(boxes, timestamp)
+            matched_tracks = set()
+            matched_boxes = set()
+            for i, j in matches:
+                self.tracks[i].correct(boxes[j], timestamp)
+                matched_tracks.add(i)
+                matched_boxes.add(j)
+
+            # 検出されなかった人: 確定前ならすぐに、確定後はmax_age秒経ったら追跡を終了
+            tracks = []
+            for i, track in enumerate(self.tracks):
+                if i not in matched_tracks:
+                    if not track.is_confirmed or timestamp - track.last_seen > self.max_age:
+                        if track.is_confirmed:
+                            self.finished.append(track)
+                            self.dwell_max = max(self.dwell_max, track.dwell())
+                        continue
+                tracks.append(track)
+
+            # 対応しなかった検出は新しい人
+            for j in range(len(boxes)):
+                if j not in matched_boxes:
+                    tracks.append(Track(self.next_id, boxes[j], timestamp))
+                    self.next_id = self.next_id + 1
+
+            seen = []
+            for track in tracks:
+                if track.last_seen == timestamp and track.hits >= self.min_hits:
+                    if not track.is_confirmed:
+                        track.is_confirmed = True
+                        self.confirmed_count = self.confirmed_count + 1
+                    seen.append(track)
+            self.tracks = tracks
+            self.update_count = self.update_count + 1
+            self.update_time = self.update_time + time.perf_counter() - start
+            return seen
+
+    ##追跡中の人と検出結果の対応付け
+    ##戻り値: [(self.tracksの番号, boxesの番号), ...]
+    def _associate(self, boxes, timestamp):
+        if not self.tracks or len(boxes) == 0:
+            return []
+        predicted = np.array([track.box(timestamp) for track in self.tracks])
+        rows = list(range(len(self.tracks)))
+        cols = list(range(len(boxes)))
+
+        # 1. IoUの大きい順
+        matches = _greedy_match(iou_matrix(predicted, boxes[:, :4]), self.iou_threshold, rows, cols)
+
+        # 2. 残りは中心の距離の近い順（距離を矩形の大きさで割った値が小さいほどスコアが大きい）
+        rows = [i for i in rows if i not in {m[0] for m in matches}]
+        cols = [j for j in cols if j not in {m[1] for m in matches}]
+        if rows and cols and self.center_distance > 0:
+            centers_t = (predicted[:, :2] + predicted[:, 2:]) / 2
+            centers_d = (boxes[:, :2] + boxes[:, 2:4]) / 2
+            sizes = np.maximum(np.maximum(predicted[:, 2] - predicted[:, 0], predicted[:, 3] - predicted[:, 1]), 1.0)
+            distance = np.linalg.norm(centers_t[:, None, :] - centers_d[None, :, :], axis=2) / sizes[:, None]
+            matches = matches + _greedy_match(-distance, -self.center_distance, rows, cols)
+        return matches
+
+    ##timestamp時点の確定済みの人の予測位置（推論しない間に使う、追跡の状態は変えない）
+    ##戻り値: (予測した矩形(N×6の配列: x1, y1, x2, y2, 最後に検出した時の信頼度, クラス), 人(Track)のリスト)
+    def predict(self, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            tracks = [track for track in self.tracks
+                      if track.is_confirmed and timestamp - track.last_seen <= self.max_age]
+            boxes = np.zeros((len(tracks), 6), np.float32)
+            for i, track in enumerate(tracks):
+                boxes[i, :4] = track.box(timestamp)
+                boxes[i, 4] = track.confidence
+                boxes[i, 5] = track.class_id
+            self.predict_count = self.predict_count + 1
+            return boxes, tracks
+
+    ##確定済みの人を追跡中か
+    def is_tracking(self):
+        with self.lock:
+            return any(track.is_confirmed for track in self.tracks)
+
+    ##追跡中の確定済みの人の滞在時間
+    ##戻り値: {ID: 滞在時間(秒)}
+    def dwell_times(self):
+        with self.lock:
+            return {track.id: track.dwell() for track in self.tracks if track.is_confirmed}
+
+    ##追跡を終了した人を取り出す
+    ##戻り値: 前回取り出してから追跡を終了した人(Track)のリスト
+    def pop_finished(self):
+        with self.lock:
+            finished = list(self.finished)
+            self.finished.clear()
+            return finished
+
+    ##統計の取得
+    def stats(self):
+        with self.lock:
+            return {
+                'updates': self.update_count,
+                'predicts': self.predict_count,
+                'tracking': sum(1 for track in self.tracks if track.is_confirmed),
+                'confirmed': self.confirmed_count,
+                'dwell_max': max([self.dwell_max] + [track.dwell() for track in self.tracks if track.is_confirmed]),
+                'update_mean': self.update_time / self.update_count if self.update_count else 0.0,
+            }
+
+    ##統計の表示
+    def print_stats(self, name=''):
+        stats = self.stats()
+        print(name + " 追跡 : " + str(stats['confirmed']) + " 人（追跡中 " + str(stats['tracking']) + " 人）/ 予測 " + str(stats['predicts']) + " 回 / 最大滞在時間 "
+              + format(stats['dwell_max'], '.1f') + " 秒 / 更新時間 平均 " + format(stats['update_mean'] * 1000, '.2f') + " ms")
@@ -0,0 +1,91 @@
+#########################################################################
+#file:plc_image.py
+#date:2026/10/18
+#file_content:PLCのデバイスメモリのコピー（変化検出付き）
+#########################################################################
+
+##PLCのM・Dデバイスの値をPC側に保持しておくためのクラス
+##スケジューラの読出し結果（と書き込んだ値）で更新し、他の処理はFx3u.read_*の代わりにここを読む
+##・デバイスごとに最後に値が変わった時刻と、最後に更新した時刻を記録する
+##・更新のたびに変化したデバイスだけの差分 {デバイス名: (前の値, 新しい値)} を返し、登録した関数に通知する
+##  → 値が変わった時だけ処理をすればよくなる
+
+import threading
+import time
+
+
+class DeviceImage:
+    ##初期設定
+    def __init__(self):
+        self.values = {}      # デバイスの値 {'M20': True, 'D91': 0, ...}
+        self.changed_at = {}  # 値が最後に変わった時刻 {'M20': 時刻, ...}
+        self.updated_at = {}  # 最後に更新（読出し・書込み）した時刻
+        self.listeners = []   # 差分を通知する関数
+        self.lock = threading.Lock()
+
+    ##値の更新
+    ##update({デバイス名: 値, ...}, 時刻(省略時は現在時刻))
+    ##戻り値: 変化したデバイスの差分 {デバイス名: (前の値, 新しい値)}（初めての値は前の値がNone）
+    def update(self, values, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        diff = {}
+        with self.lock:
+            for device, value in values.items():
+                old = self.values.get(device)
+                if old != value or device not in self.values:
+                    diff[device] = (old, value)
+                    self.values[device] = value
+                    self.changed_at[device] = timestamp
+                self.updated_at[device] = timestamp
+            listeners = list(self.listeners)
+
+        # ロックの外で通知する（通知先からget()などを呼べるように）
+        if diff:
+            for listener in listeners:
+                listener(diff)
+        return diff
+
+    ##差分の通知先を登録
+    ##subscribe(関数(差分))
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    ##差分の通知先を解除
+    def unsubscribe(self, listener):
+        with self.lock:
+            self.listeners.remove(listener)
+
+    ##値の取得（まだ読んでいないデバイスはdefault）
+    def get(self, device, default=None):
+        with self.lock:
+            return self.values.get(device, default)
+
+    ##複数デバイスの値を一度に取得（同じ時点の値がそろう）
+    ##get_many(['D91', 'D92', ...]) → [値, 値, ...]
+    def get_many(self, devices, default=None):
+        with self.lock:
+            return [self.values.get(device, default) for device in devices]
+
+    ##全デバイスの値のコピー
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    ##値が最後に変わった時刻（まだ読んでいないデバイスはNone）
+    def last_changed(self, device):
+        with self.lock:
+            return self.changed_at.get(device)
+
+    ##最後に更新した時刻（まだ読んでいないデバイスはNone）
+    def last_updated(self, device):
+        with self.lock:
+            return self.updated_at.get(device)
+
+    ##値が最後に変わってからの経過時間（秒）
+    def unchanged_for(self, device):
+        changed = self.last_changed(device)
+        if changed is None:
+            return None
+        return time.time() - changed
@@ -0,0 +1,236 @@
+#########################################################################
+#file:plc_scheduler.py
+#date:2026/10/18
+#file_content:PLCスキャンのスケジューラ（一定周期でのデバイス読出しとエッジ検出）
+#UPDATE: 2026/10/18 読出し結果をDeviceImage（PLCメモリのコピー）に保存し、差分でエッジを検出
+#########################################################################
+
+##main_activityのcommunicate_plcの while(1) を置き換えるためのスケジューラ
+##・どのデバイスを、何秒周期で、どの優先度で読み出すかを登録する（add_poll）
+##・周期的に実行する処理を登録する（add_task）
+##・デバイスの立上り・立下り・変化でコールバックを呼ぶ（on_rising / on_falling / on_change）
+##  ONの間は読み出すたびにコールバックを呼ぶこともできる（on_level）
+##・1サイクルの周期(cycle_time)を固定し、処理時間とジッタ（予定時刻からのズレ）を計測する
+##
+##1サイクルの流れ
+##  1. 周期が来たポーリングのデバイスを、優先度の高い順に同じ優先度ごとにまとめて read_devices で読み出す
+##     （同じ優先度ならM・Dの2電文以内）。サイクル時間を使い切ったら、優先度の低いポーリングは次のサイクルに回す
+##  2. 読み出した値をDeviceImageに保存し、値が変化したデバイスのエッジコールバックを呼ぶ（on_levelはONの間は毎回）
+##  3. 周期が来たタスクを優先度の高い順に実行する
+##     サイクル時間を使い切ったら、残りのタスクは次のサイクルに回す
+##  4. 次のサイクルの予定時刻まで待つ
+
+import itertools
+import math
+import threading
+import time
+import plc_image
+
+
+##周期的に実行するもの（ポーリング・タスク共通）
+class _Job:
+    def __init__(self, period, priority, devices=None, func=None):
+        self.period = period     # 実行周期（秒）
+        self.priority = priority # 優先度（大きいほど先に実行）
+        self.devices = devices   # ポーリングするデバイス（read_devicesの引数と同じ形式）
+        self.func = func         # タスクとして実行する関数
+        self.next_time = 0.0     # 次に実行する時刻
+
+
+class PlcScheduler:
+    ##初期設定
+    ##(self, Fx3uクラスのインスタンス, cycle_time(float)=1サイクルの周期(秒),
+    ## image(DeviceImage)=読出し結果の保存先（省略時は新しく作る）)
+    def __init__(self, fx3u, cycle_time=0.05, image=None):
+        self.fx3u = fx3u
+        self.cycle_time = cycle_time
+
+        self.polls = []  # 登録したポーリング
+        self.tasks = []  # 登録したタスク
+        self.edges = []  # 登録したエッジコールバック (デバイス名, 種類, 関数)
+        self.on_error = None # 例外が起きた時に呼ぶ関数 on_error(例外)
+
+        # 読み出したデバイスの値（PLCメモリのコピー）
+        if image is None:
+            image = plc_image.DeviceImage()
+        self.image = image
+
+        self.is_running = False
+        self.stop_event = threading.Event()
+        self.reset_stats()
+
+    ##ポーリングの登録
+    ##add_poll([デバイス番号 または (デバイス番号, デバイス点数), ...], 周期(秒), 優先度)
+    ##周期はサイクル時間の整数倍に切り上げる
+    ##優先度が最も高いポーリングは時間切れでも先送りしない
+    def add_poll(self, devices, period, priority=0):
+        self.polls.append(_Job(self._round_period(period), priority, devices=devices))
+        self.polls.sort(key=lambda job: -job.priority)
+
+    ##タスクの登録
+    ##add_task(関数, 周期(秒), 優先度)
+    ##関数は引数なしで呼ぶ
+    def add_task(self, func, period, priority=0):
+        self.tasks.append(_Job(self._round_period(period), priority, func=func))
+        self.tasks.sort(key=lambda job: -job.priority)
+
+    ##立上り（OFF→ON、0→0以外）でコールバック
+    ##起動直後の1回目の読出しでONの場合も立上りとみなす
+    def on_rising(self, device, callback):
+        self.edges.append((device, 'rising', callback))
+
+    ##立下り（ON→OFF、0以外→0）でコールバック
+    def on_falling(self, device, callback):
+        self.edges.append((device, 'falling', callback))
+
+    ##ONの間（0以外）は読み出すたびにコールバック
+    ##PC側でOFFに戻す信号（カメラ許可信号など）に使う
+    ##（立上りだと、OFFに戻した後に次の読出しまでにPLCが再びONにした場合に取りこぼす）
+    def on_level(self, device, callback):
+        self.edges.append((device, 'level', callback))
+
+    ##値が変化したらコールバック callback(デバイス名, 前の値, 新しい値)
+    ##起動直後の1回目の読出しでは前の値をNoneとして呼ぶ
+    def on_change(self, device, callback):
+        self.edges.append((device, 'change', callback))
+
+    ##周期をサイクル時間の整数倍に切り上げる
+    def _round_period(self, period):
+        return max(1, math.ceil(period / self.cycle_time - 1e-9)) * self.cycle_time
+
+    ##統計のリセット
+    def reset_stats(self):
+        self.cycle_count = 0       # 実行したサイクル数
+        self.overrun_count = 0     # 処理がサイクル時間を超えた回数
+        self.deferred_count = 0    # 時間切れで次のサイクルに回したタスクの数
+        self.deferred_poll_count = 0 # 時間切れで次のサイクルに回したポーリングの数
+        self.busy_sum = 0.0        # 処理時間の合計
+        self.busy_max = 0.0        # 処理時間の最大
+        self.jitter_sum = 0.0      # ジッタの合計
+        self.jitter_sq_sum = 0.0   # ジッタの2乗の合計（標準偏差の計算用）
+        self.jitter_max = 0.0      # ジッタの最大
+
+    ##統計の取得
+    ##処理時間・ジッタの単位は秒
+    def stats(self):
+        count = max(self.cycle_count, 1)
+        jitter_mean = self.jitter_sum / count
+        jitter_var = max(self.jitter_sq_sum / count - jitter_mean * jitter_mean, 0.0)
+        return {
+            'cycle_time': self.cycle_time,
+            'cycles': self.cycle_count,
+            'overruns': self.overrun_count,
+            'deferred_tasks': self.deferred_count,
+            'deferred_polls': self.deferred_poll_count,
+            'busy_mean': self.busy_sum / count,
+            'busy_max': self.busy_max,
+            'jitter_mean': jitter_mean,
+            'jitter_max': self.jitter_max,
+            'jitter_std': math.sqrt(jitter_var),
+        }
+
+    ##統計の表示
+    def print_stats(self):
+        stats = self.stats()
+        print("サイクル周期 : " + format(stats['cycle_time'] * 1000, '.1f') + " ms")
+        print("サイクル数 : " + str(stats['cycles']) + "（超過 " + str(stats['overruns']) + " 回、先送りしたタスク " + str(stats['deferred_tasks']) + " 個、先送りしたポーリング " + str(stats['deferred_polls']) + " 個）")
+        print("処理時間 : 平均 " + format(stats['busy_mean'] * 1000, '.2f') + " ms / 最大 " + format(stats['busy_max'] * 1000, '.2f') + " ms")
+        print("ジッタ : 平均 " + format(stats['jitter_mean'] * 1000, '.2f') + " ms / 最大 " + format(stats['jitter_max'] * 1000, '.2f') + " ms / 標準偏差 " + format(stats['jitter_std'] * 1000, '.2f') + " ms")
+
+    ##スケジューラの停止（別スレッドやコールバックから呼ぶ）
+    def stop(self):
+        self.is_running = False
+        self.stop_event.set()
+
+    ##スケジューラの実行（stop()が呼ばれるまで戻らない）
+    def run(self):
+        self.is_running = True
+        self.stop_event.clear()
+        next_time = time.perf_counter()
+        for job in self.polls + self.tasks:
+            job.next_time = next_time
+
+        while self.is_running:
+            start = time.perf_counter()
+            jitter = start - next_time # 予定時刻からの遅れ
+            deadline = next_time + self.cycle_time
+
+            try:
+                self._run_cycle(start, deadline)
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error(e)
+
+            stop = time.perf_counter()
+            busy = stop - start
+
+            ##統計
+            self.cycle_count = self.cycle_count + 1
+            self.busy_sum = self.busy_sum + busy
+            self.busy_max = max(self.busy_max, busy)
+            self.jitter_sum = self.jitter_sum + jitter
+            self.jitter_sq_sum = self.jitter_sq_sum + jitter * jitter
+            self.jitter_max = max(self.jitter_max, jitter)
+
+            ##次のサイクルの予定時刻まで待つ
+            next_time = deadline
+            if stop > next_time:
+                # 処理が間に合わなかった場合は、遅れを取り戻そうと連続実行せずに次の周期に合わせ直す
+                self.overrun_count = self.overrun_count + 1
+                next_time = next_time + math.ceil((stop - next_time) / self.cycle_time) * self.cycle_time
+            if self.stop_event.wait(max(next_time - time.perf_counter(), 0.0)):
+                break
+
+    ##1サイクル分の処理
+    def _run_cycle(self, now, deadline):
+        ##周期が来たポーリングのデバイスを優先度の高い順に、同じ優先度ごとにまとめて読み出す（時間切れなら次のサイクルへ先送り）
+        due = [job for job in self.polls if job.next_time <= now]
+        is_first = True
+        for priority, group in itertools.groupby(due, key=lambda job: job.priority):
+            group = list(group)
+            if not is_first and time.perf_counter() >= deadline:
+                self.deferred_poll_count = self.deferred_poll_count + len(group)
+                continue
+            is_first = False
+            devices = []
+            for job in group:
+                devices.extend(job.devices)
+                self._advance(job, now)
+            values = self.fx3u.read_devices(devices)
+            self._update(values)
+
+        ##周期が来たタスクを優先度の高い順に実行（時間切れなら次のサイクルへ先送り）
+        for job in self.tasks:
+            if job.next_time > now:
+                continue
+            if time.perf_counter() >= deadline:
+                self.deferred_count = self.deferred_count + 1
+                continue
+            job.func()
+            self._advance(job, now)
+
+    ##次に実行する時刻を1周期進める
+    ##遅れた場合は飛ばした周期を数えずに、今より後の周期に合わせる（遅れを取り戻そうと連続で実行しない）
+    def _advance(self, job, now):
+        job.next_time = job.next_time + job.period
+        if job.next_time <= now:
+            job.next_time = job.next_time + math.ceil((now - job.next_time) / job.period + 1e-9) * job.period
+
+    ##読み出した値を保存し、値が変化したデバイスのエッジコールバックを呼ぶ
+    def _update(self, values):
+        diff = self.image.update(values)
+        for device, kind, callback in self.edges:
+            if kind == 'level':
+                if values.get(device):
+                    callback()
+                continue
+            if device not in diff:
+                continue
+            old, new = diff[device]
+            if kind == 'rising' and new and not old:
+                callback()
+            elif kind == 'falling' and not new and old:
+                callback()
+            elif kind == 'change' and new != old:
+                callback(device, old, new)
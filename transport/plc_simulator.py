@@ -0,0 +1,296 @@
+#########################################################################
+#file:plc_simulator.py
+#date:2026/10/18
+#file_content:PLCの模擬環境（電文処理部分）
+#########################################################################
+
+##server.py(TCP) / server_udp.py(UDP) から使うPLCの模擬環境
+##受信した電文を1回だけ解析して応答電文を作る（画面表示などの入出力は一切しない）
+##・Mデバイス: bytearray（1点1バイト、0または1）
+##・Dデバイス: numpyのuint16配列
+##・1Eフレームの一括読出し(00/01)・一括書込み(02/03)・ランダム書込み(04/05)に対応
+##・ASCIIコードとバイナリコードの両方に対応（先頭1バイトで判別）
+##・デバイスの表示は PlcMonitor が別スレッドで一定間隔ごとに行う
+
+import os
+import struct
+import threading
+import numpy as np
+
+DEVICE_POINTS = 8000 # M・Dデバイスの点数
+
+CODE_M = 0x4D20 # Mデバイスのデバイスコード
+CODE_D = 0x4420 # Dデバイスのデバイスコード
+
+FINISH_SIGNAL = b'00000000' # 終了信号（模擬環境専用）
+
+## ASCIIの'0'/'1'とビット値(0/1)の変換表
+BIT_TO_ASCII = bytes.maketrans(b'\x00\x01', b'01')
+ASCII_TO_BIT = bytes.maketrans(b'01', b'\x00\x01')
+
+## バイナリコードの電文ヘッダ
+BINARY_HEADER = struct.Struct('<BBHIHBB') # サブヘッダ, PC番号, 監視タイマ, 先頭デバイス番号, デバイスコード, 点数, 固定値0
+BINARY_RANDOM_BIT = struct.Struct('<IHB')  # デバイス番号, デバイスコード, 値
+BINARY_RANDOM_WORD = struct.Struct('<IHH') # デバイス番号, デバイスコード, 値
+
+END_ERROR = 0x5B # 異常終了の終了コード
+ERROR_COMMAND = 0x50 # 異常コード（指令・デバイスの指定が正しくない）
+ERROR_LENGTH = 0x57  # 異常コード（点数と書込みデータの長さが合わない）
+ERROR_RANGE = 0x58   # 異常コード（先頭デバイス番号+点数がデバイスの範囲を超えている）
+
+
+##電文の異常（異常コード付き）
+class FrameError(ValueError):
+    def __init__(self, code):
+        super().__init__(format(code, '02X'))
+        self.code = code
+
+
+class PlcSimulator:
+    ##初期設定
+    def __init__(self, points=DEVICE_POINTS):
+        self.device_M = bytearray(points)                  # Mデバイス（ビット）
+        self.device_D = np.zeros(points, dtype=np.uint16)  # Dデバイス（ワード）
+        self.lock = threading.Lock()
+
+        self.request_count = 0 # 処理した電文の数
+        self.write_count = 0   # 書込み電文の数（モニタ表示の更新判定に使う）
+        self.error_count = 0   # 異常終了で応答した電文の数
+
+    ##電文の処理
+    ##handle(受信した電文(bytes)) → (応答電文(bytes), 終了信号ならTrue)
+    def handle(self, data):
+        if data == FINISH_SIGNAL:
+            return b'8100', True
+        with self.lock:
+            self.request_count = self.request_count + 1
+            try:
+                # バイナリコードの電文はサブヘッダ(0x00～0x05)から始まり、ASCIIコードは'0'(0x30)から始まる
+                if data[0] < 0x30:
+                    return self._handle_binary(data), False
+                return self._handle_ascii(data), False
+            except FrameError as err:
+                self.error_count = self.error_count + 1
+                return self._error_response(data, err.code), False
+            except (ValueError, IndexError, struct.error):
+                self.error_count = self.error_count + 1
+                return self._error_response(data), False
+
+    ##先頭の電文の長さ（TCPで受信したデータを電文ごとに区切るために使う）
+    ##frame_length(受信したデータ(bytes)) → 電文のバイト数（長さがまだ分からない時はNone）
+    def frame_length(self, data):
+        if data[:8] == FINISH_SIGNAL:
+            return 8
+        if not data:
+            return None
+        subheader = data[0]
+        try:
+            if subheader < 0x30:
+                ## バイナリコード
+                if subheader == 0x04 or subheader == 0x05:
+                    if len(data) < 6:
+                        return None
+                    size = BINARY_RANDOM_BIT.size if subheader == 0x04 else BINARY_RANDOM_WORD.size
+                    return 6 + data[4] * size
+                if len(data) < BINARY_HEADER.size:
+                    return None
+                points = data[10] or 256
+                if subheader == 0x02:
+                    return BINARY_HEADER.size + (points + 1) // 2
+                if subheader == 0x03:
+                    return BINARY_HEADER.size + points * 2
+                return BINARY_HEADER.size
+
+            ## ASCIIコード
+            if len(data) < 2:
+                return None
+            subheader = int(data[0:2], 16)
+            if subheader == 0x04 or subheader == 0x05:
+                if len(data) < 12:
+                    return None
+                return 12 + int(data[8:10], 16) * (14 if subheader == 0x04 else 16)
+            if len(data) < 24:
+                return None
+            points = int(data[20:22], 16) or 256
+            if subheader == 0x02:
+                return 24 + points + (points & 1) # 点数が奇数の時はダミーが付く
+            if subheader == 0x03:
+                return 24 + points * 4
+            return 24
+        except ValueError:
+            return len(data) # 解析できない電文は受信したデータ全体を1電文とする（異常終了で応答）
+
+    ##異常終了の応答
+    ##(受信した電文, 異常コード)
+    def _error_response(self, data, code=ERROR_COMMAND):
+        if data and data[0] < 0x30:
+            return bytes([(data[0] | 0x80) & 0xFF, END_ERROR, code])
+        try:
+            subheader = int(data[0:2], 16) | 0x80
+        except ValueError:
+            subheader = 0xFF
+        return (format(subheader, '02X') + format(END_ERROR, '02X') + format(code, '02X')).encode('latin-1')
+
+    ##一括読出し・書込みの範囲と書込みデータの長さの確認
+    ##(デバイス, 先頭デバイス番号, 点数, 書込みデータ, 書込みデータの長さ（読出しは0）)
+    ##範囲外や長さが合わない電文でデバイスのメモリの大きさが変わらないように、実機と同じく異常終了で応答する
+    def _check_batch(self, device, start, points, body, length):
+        if start + points > len(device):
+            raise FrameError(ERROR_RANGE)
+        if len(body) != length:
+            raise FrameError(ERROR_LENGTH)
+
+    ##ASCIIコードの電文
+    ##サブヘッダ(2) PC番号(2) 監視タイマ(4) デバイスコード(4) 先頭デバイス番号(8) 点数(2) 固定値00(2) [書込みデータ]
+    def _handle_ascii(self, data):
+        subheader = int(data[0:2], 16)
+        response = format(subheader | 0x80, '02X').encode('latin-1') + b'00'
+
+        ## ランダム書込み: サブヘッダ(2) PC番号(2) 監視タイマ(4) 点数(2) 固定値00(2) [デバイスコード(4) デバイス番号(8) 値]×点数
+        if subheader == 0x04 or subheader == 0x05:
+            count = int(data[8:10], 16)
+            pos = 12
+            for i in range(count):
+                code = int(data[pos:pos + 4], 16)
+                number = int(data[pos + 4:pos + 12], 16)
+                if subheader == 0x04 and code == CODE_M:
+                    self.device_M[number] = int(data[pos + 12:pos + 14], 16) & 1
+                    pos = pos + 14
+                elif subheader == 0x05 and code == CODE_D:
+                    self.device_D[number] = int(data[pos + 12:pos + 16], 16)
+                    pos = pos + 16
+                else:
+                    raise ValueError
+            self.write_count = self.write_count + 1
+            return response
+
+        if len(data) < 24:
+            raise FrameError(ERROR_LENGTH)
+        code = int(data[8:12], 16)
+        start = int(data[12:20], 16)
+        points = int(data[20:22], 16) or 256
+        end = start + points
+        body = data[24:]
+
+        ## ビット一括読出し（1点1文字）
+        if subheader == 0x00 and code == CODE_M:
+            self._check_batch(self.device_M, start, points, body, 0)
+            return response + bytes(self.device_M[start:end]).translate(BIT_TO_ASCII)
+        ## ワード一括読出し（1点4文字の16進数）
+        if subheader == 0x01 and code == CODE_D:
+            self._check_batch(self.device_D, start, points, body, 0)
+            return response + self.device_D[start:end].astype('>u2').tobytes().hex().upper().encode('latin-1')
+        ## ビット一括書込み（点数が奇数の時はダミーが付く）
+        if subheader == 0x02 and code == CODE_M:
+            self._check_batch(self.device_M, start, points, body, points + (points & 1))
+            self.device_M[start:end] = body[:points].translate(ASCII_TO_BIT)
+            self.write_count = self.write_count + 1
+            return response
+        ## ワード一括書込み
+        if subheader == 0x03 and code == CODE_D:
+            self._check_batch(self.device_D, start, points, body, points * 4)
+            self.device_D[start:end] = np.frombuffer(bytes.fromhex(body.decode('latin-1')), dtype='>u2')
+            self.write_count = self.write_count + 1
+            return response
+        raise ValueError
+
+    ##バイナリコードの電文
+    ##サブヘッダ(1) PC番号(1) 監視タイマ(2) 先頭デバイス番号(4) デバイスコード(2) 点数(1) 固定値0(1) [書込みデータ]
+    ##数値はリトルエンディアン。ビットデータは1バイトに2点（上位4ビットが先のデバイス）
+    def _handle_binary(self, data):
+        subheader = data[0]
+        response = bytes([subheader | 0x80, 0x00])
+
+        ## ランダム書込み: サブヘッダ(1) PC番号(1) 監視タイマ(2) 点数(1) 固定値0(1) [デバイス番号(4) デバイスコード(2) 値]×点数
+        if subheader == 0x04 or subheader == 0x05:
+            count = data[4]
+            pos = 6
+            for i in range(count):
+                if subheader == 0x04:
+                    number, code, value = BINARY_RANDOM_BIT.unpack_from(data, pos)
+                    if code != CODE_M:
+                        raise ValueError
+                    self.device_M[number] = value & 1
+                    pos = pos + BINARY_RANDOM_BIT.size
+                else:
+                    number, code, value = BINARY_RANDOM_WORD.unpack_from(data, pos)
+                    if code != CODE_D:
+                        raise ValueError
+                    self.device_D[number] = value
+                    pos = pos + BINARY_RANDOM_WORD.size
+            self.write_count = self.write_count + 1
+            return response
+
+        sub, pc, timer, start, code, points, zero = BINARY_HEADER.unpack_from(data)
+        points = points or 256
+        end = start + points
+        body = data[BINARY_HEADER.size:]
+
+        ## ビット一括読出し（1バイトに2点）
+        if subheader == 0x00 and code == CODE_M:
+            self._check_batch(self.device_M, start, points, body, 0)
+            bits = np.zeros(points + (points & 1), dtype=np.uint8)
+            bits[:points] = np.frombuffer(bytes(self.device_M[start:end]), dtype=np.uint8)
+            return response + ((bits[0::2] << 4) | bits[1::2]).tobytes()
+        ## ワード一括読出し（1点2バイト）
+        if subheader == 0x01 and code == CODE_D:
+            self._check_batch(self.device_D, start, points, body, 0)
+            return response + self.device_D[start:end].astype('<u2').tobytes()
+        ## ビット一括書込み
+        if subheader == 0x02 and code == CODE_M:
+            self._check_batch(self.device_M, start, points, body, (points + 1) // 2)
+            packed = np.frombuffer(body, dtype=np.uint8, count=(points + 1) // 2)
+            bits = np.empty(packed.size * 2, dtype=np.uint8)
+            bits[0::2] = packed >> 4
+            bits[1::2] = packed & 0x0F
+            self.device_M[start:end] = (bits[:points] & 1).tobytes()
+            self.write_count = self.write_count + 1
+            return response
+        ## ワード一括書込み
+        if subheader == 0x03 and code == CODE_D:
+            self._check_batch(self.device_D, start, points, body, points * 2)
+            self.device_D[start:end] = np.frombuffer(body, dtype='<u2', count=points)
+            self.write_count = self.write_count + 1
+            return response
+        raise ValueError
+
+
+##デバイスの表示（モニタ）
+##電文処理とは別のスレッドで、interval秒ごとに書込みがあった時だけ表示を更新する
+class PlcMonitor:
+    ##(self, PlcSimulator, interval(float)=表示の更新間隔(秒))
+    def __init__(self, simulator, interval=1.0):
+        self.simulator = simulator
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        last_write_count = -1
+        while not self.stop_event.wait(self.interval):
+            sim = self.simulator
+            if sim.write_count == last_write_count:
+                continue
+            last_write_count = sim.write_count
+
+            os.system('cls' if os.name == 'nt' else 'clear') # コマンドプロンプト画面をクリア
+            # モニタリング対象のMデバイスの値を連結して表示（M20～M28）
+            print("デバイスM20 : " + bytes(sim.device_M[20:29]).translate(BIT_TO_ASCII).decode())
+            print()
+            # モニタリング対象のDデバイスの値を表示
+            print("デバイスD20 : " + format(sim.device_D[20], '04X'))
+            print("デバイスD21 : " + format(sim.device_D[21], '04X'))
+            print("デバイスD22 : " + format(sim.device_D[22], '04X'))
+            print("デバイスD23 : " + format(sim.device_D[23], '04X'))
+            print()
+            print("デバイスD93 : " + format(sim.device_D[93], '04X'))
+            print()
+            print("処理した電文 : " + str(sim.request_count) + "（異常終了 " + str(sim.error_count) + "）")
@@ -0,0 +1,110 @@
+#########################################################################
+#file:presence_filter.py
+#date:2026/10/18
+#file_content:身体検出結果のチャタリング除去（N-of-M判定、ON・OFFの確定時間）
+#########################################################################
+
+##1回の推論結果で危険信号(is_detect_hand)を切り替えると、検出漏れ1回で信号がOFFになってしまう
+##このクラスでは直近の推論結果を使って検出あり・なしを確定させる
+##・直近 window 回の推論のうち votes 回以上が検出ありなら「検出あり」側の条件
+##  直近 window 回の推論が全て検出なしなら「検出なし」側の条件
+##・条件が assert_time 秒続いたら検出ありに、release_time 秒続いたら検出なしに切り替える
+##  （検出ありはすぐに、検出なしはゆっくり切り替えると、推論の回数を減らしても安全側に倒れる）
+##・エラー（推論の例外・カメラ画像が来ない）の時は fail() ですぐに検出ありにする
+##・最後に切り替わった時刻(changed_at)を記録する
+##
+##使い方:
+##    presence = PresenceFilter(votes=1, window=3, assert_time=0.0, release_time=1.0)
+##    state = presence.update(detected)   # 推論するたびに呼ぶ
+##    state = presence.update(None)       # 推論しなかった時も呼ぶ（時間の経過で切り替える）
+
+import collections
+import threading
+import time
+
+
+class PresenceFilter:
+    ##初期設定
+    ##(self, votes(int)=検出ありとする回数, window(int)=判定に使う直近の推論回数,
+    ## assert_time(float)=検出ありに切り替えるまでの時間(秒), release_time(float)=検出なしに切り替えるまでの時間(秒))
+    def __init__(self, votes=1, window=3, assert_time=0.0, release_time=1.0):
+        if not 1 <= votes <= window:
+            raise ValueError("votesは1以上window以下にしてください: votes=" + str(votes) + ", window=" + str(window))
+        self.votes = votes
+        self.window = window
+        self.assert_time = assert_time
+        self.release_time = release_time
+        self.history = collections.deque(maxlen=window) # 直近の推論結果
+        self.state = False          # 確定した結果（True: 検出あり）
+        self.changed_at = None      # 最後に切り替わった時刻
+        self.pending_since = None   # 反対側の条件になった時刻（切り替え待ち）
+        self.last_detected_at = None # 最後に検出ありだった推論の時刻
+        self.lock = threading.Lock()
+
+        ##統計
+        self.assert_count = 0   # 検出ありに切り替わった回数
+        self.release_count = 0  # 検出なしに切り替わった回数
+        self.fail_count = 0     # エラーで検出ありにした回数
+
+    ##推論結果の追加と判定
+    ##update(detected(bool)=推論結果（Noneなら推論なし、時間の経過だけで判定）, now(float)=時刻（省略時は現在時刻）)
+    ##戻り値: 確定した結果（True: 検出あり）
+    def update(self, detected, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            if detected is not None:
+                self.history.append(bool(detected))
+                if detected:
+                    self.last_detected_at = now
+
+            positives = sum(self.history)
+            if self.state:
+                is_opposite = len(self.history) == self.window and positives == 0
+                hold = self.release_time
+            else:
+                is_opposite = positives >= self.votes
+                hold = self.assert_time
+
+            if not is_opposite:
+                self.pending_since = None
+            else:
+                if self.pending_since is None:
+                    self.pending_since = now
+                if now - self.pending_since >= hold:
+                    self._change(not self.state, now)
+            return self.state
+
+    ##エラー時（推論の例外・カメラ画像が来ないなど）: すぐに検出ありにする
+    ##検出なしに戻るのは、その後の推論で検出なしが続いた時
+    def fail(self, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            self.fail_count = self.fail_count + 1
+            self.history.append(True)
+            self.pending_since = None
+            if not self.state:
+                self._change(True, now)
+            return self.state
+
+    def _change(self, state, now):
+        self.state = state
+        self.changed_at = now
+        self.pending_since = None
+        if state:
+            self.assert_count = self.assert_count + 1
+        else:
+            self.release_count = self.release_count + 1
+
+    ##統計の取得
+    def stats(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'changed_at': self.changed_at,
+                'last_detected_at': self.last_detected_at,
+                'asserts': self.assert_count,
+                'releases': self.release_count,
+                'fails': self.fail_count,
+            }
@@ -0,0 +1,272 @@
+#########################################################################
+#file:server_async.py
+#date:2026/10/18
+#file_content:PLCの模擬環境（asyncio版、TCP・UDP同時、通信遅延・パケット損失の模擬付き）
+#########################################################################
+
+##server.py / server_udp.py と同じPLCの模擬環境を asyncio で動かすもの
+##・TCPとUDPを同じポート番号で同時に待ち受け、複数のクライアントを同時に処理する
+##  （PLCのデバイスメモリ(PlcSimulator)は全クライアントで共有）
+##・NetworkConditionsで応答の遅延・ゆらぎ（ジッタ）・パケット損失・順番の入れ替わりを模擬する
+##  → 実機(192.168.1.254)が無くても、通信が遅い・不安定な時のMainActivityやFx3uの動きを確認できる
+##
+##損失は要求・応答それぞれに適用する（要求が失われた場合はデバイスメモリも変わらない）
+##TCPは届く順番が保証されるので、順番の入れ替わりはUDPだけに適用する
+##
+##使い方（このファイルを直接実行する場合は下のLATENCYなどの値を変更する）:
+##    server = AsyncPlcServer(port=50000, conditions=NetworkConditions(latency=0.01, jitter=0.005, loss=0.01))
+##    asyncio.run(server.serve())   # 終了信号('00000000')を受信するまで戻らない
+
+import asyncio
+import random
+import socket
+import plc_simulator
+
+
+PORT = 50000
+BUFSIZE = 4096
+SERVER = socket.gethostbyname(socket.gethostname())
+
+##通信状態の模擬（このファイルを直接実行した時の設定）
+LATENCY = 0.0   # 応答の遅延（秒）
+JITTER = 0.0    # 遅延のゆらぎ（秒、±JITTERの一様分布）
+LOSS = 0.0      # パケット損失率（0.0～1.0、要求・応答それぞれ）
+REORDER = 0.0   # UDPの応答の順番が入れ替わる確率（0.0～1.0）
+
+FRAME_TIMEOUT = 0.05 # TCPで電文の続きを待つ時間（秒）。過ぎたら受信済みのデータを1電文として処理する
+
+
+##通信状態（遅延・ジッタ・損失・順番の入れ替わり）
+class NetworkConditions:
+    ##(self, latency(float)=応答の遅延(秒), jitter(float)=遅延のゆらぎ(秒), loss(float)=パケット損失率,
+    ## reorder(float)=順番が入れ替わる確率, reorder_delay(float)=入れ替わる応答に追加する遅延(秒), seed=乱数の種)
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, reorder=0.0, reorder_delay=0.02, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+        self.random = random.Random(seed)
+
+    ##パケットが失われるか
+    def is_lost(self):
+        return self.loss > 0 and self.random.random() < self.loss
+
+    ##応答の順番を入れ替えるか
+    def is_reordered(self):
+        return self.reorder > 0 and self.random.random() < self.reorder
+
+    ##応答までの遅延（秒）
+    def delay(self):
+        delay = self.latency
+        if self.jitter > 0:
+            delay = delay + self.random.uniform(-self.jitter, self.jitter)
+        return max(delay, 0.0)
+
+
+##UDPの受信処理
+##受信した電文をAsyncPlcServerに渡すだけ
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.server._on_datagram(self.transport, data, addr)
+
+
+class AsyncPlcServer:
+    ##初期設定
+    ##(self, host(str)=待ち受けるIPアドレス, port(int)=ポート番号, simulator(PlcSimulator)=共有するデバイスメモリ,
+    ## conditions(NetworkConditions)=通信状態（省略時は遅延・損失なし）, tcp/udp(bool)=待ち受ける通信方式)
+    def __init__(self, host=SERVER, port=PORT, simulator=None, conditions=None, tcp=True, udp=True):
+        self.host = host
+        self.port = port
+        if simulator is None:
+            simulator = plc_simulator.PlcSimulator()
+        self.simulator = simulator
+        if conditions is None:
+            conditions = NetworkConditions()
+        self.conditions = conditions
+        self.use_tcp = tcp
+        self.use_udp = udp
+
+        self.tcp_server = None
+        self.udp_transport = None
+        self.finished = None # 終了信号を受信したらセットするEvent（start()で作成）
+
+        ##統計
+        self.client_count = 0        # TCPで接続したクライアントの数
+        self.lost_request_count = 0  # 失わせた要求の数
+        self.lost_response_count = 0 # 失わせた応答の数
+        self.reorder_count = 0       # 順番を入れ替えた応答の数
+
+    ##待ち受け開始
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.finished = asyncio.Event()
+        if self.use_tcp:
+            self.tcp_server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        if self.use_udp:
+            self.udp_transport, protocol = await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.port))
+        return self
+
+    ##待ち受け終了
+    async def close(self):
+        if self.tcp_server is not None:
+            self.tcp_server.close()
+            await self.tcp_server.wait_closed()
+            self.tcp_server = None
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+            self.udp_transport = None
+
+    ##終了信号を受信するまで実行
+    async def serve(self):
+        await self.start()
+        try:
+            await self.finished.wait()
+            await asyncio.sleep(1) # 終了応答がクライアントに届くまで待つ
+        finally:
+            await self.close()
+
+    ##統計の表示
+    def print_stats(self):
+        print("処理した電文 : " + str(self.simulator.request_count) + "（異常終了 " + str(self.simulator.error_count) + "）")
+        print("TCP接続 : " + str(self.client_count))
+        print("失わせた要求 : " + str(self.lost_request_count) + " / 応答 : " + str(self.lost_response_count))
+        print("順番を入れ替えた応答 : " + str(self.reorder_count))
+
+    ##電文の処理（要求の損失を含む）
+    ##戻り値: 応答電文（要求を失わせた場合はNone）, 終了信号ならTrue
+    def _process(self, data):
+        if self.conditions.is_lost():
+            self.lost_request_count = self.lost_request_count + 1
+            return None, False
+        response, is_finish = self.simulator.handle(data)
+        if is_finish:
+            self.finished.set()
+        return response, is_finish
+
+    ##UDPの電文の受信
+    ##応答は遅延を付けて送信する（遅延が応答ごとに違うので、後の電文の応答が先に届くこともある）
+    def _on_datagram(self, transport, data, addr):
+        response, is_finish = self._process(data)
+        if response is None:
+            return
+        if is_finish:
+            transport.sendto(response, addr) # 終了応答は遅延・損失なしで返す
+            return
+        if self.conditions.is_lost():
+            self.lost_response_count = self.lost_response_count + 1
+            return
+
+        delay = self.conditions.delay()
+        if self.conditions.is_reordered():
+            delay = delay + self.conditions.reorder_delay
+            self.reorder_count = self.reorder_count + 1
+        if delay <= 0:
+            transport.sendto(response, addr)
+        else:
+            asyncio.get_running_loop().call_later(delay, self._send_datagram, transport, response, addr)
+
+    ##遅延させたUDPの応答の送信
+    def _send_datagram(self, transport, response, addr):
+        if not transport.is_closing():
+            transport.sendto(response, addr)
+
+    ##TCPのクライアント1つ分の処理
+    ##1つの接続で複数の電文を処理する（応答を待たずに続けて送られた電文も電文ごとに区切って処理する）
+    async def _handle_client(self, reader, writer):
+        self.client_count = self.client_count + 1
+        loop = asyncio.get_running_loop()
+        responses = asyncio.Queue() # 送信待ちの応答 (送信時刻, 応答電文)
+        sender = asyncio.ensure_future(self._send_responses(writer, responses))
+
+        buffer = b''
+        try:
+            while True:
+                # 電文の途中まで受信している場合は、続きをFRAME_TIMEOUT秒だけ待つ
+                try:
+                    if buffer:
+                        data = await asyncio.wait_for(reader.read(BUFSIZE), FRAME_TIMEOUT)
+                    else:
+                        data = await reader.read(BUFSIZE)
+                except asyncio.TimeoutError:
+                    data = None
+                except ConnectionResetError:
+                    break
+
+                if data == b'':
+                    break # クライアントが切断
+                if data is None:
+                    # 続きが来ないので受信済みのデータを1電文として処理する（点数と長さが合わない電文など）
+                    frames = [buffer]
+                    buffer = b''
+                else:
+                    buffer = buffer + data
+                    frames = []
+                    while buffer:
+                        length = self.simulator.frame_length(buffer)
+                        if length is None or length > len(buffer):
+                            break
+                        frames.append(buffer[:length])
+                        buffer = buffer[length:]
+
+                for frame in frames:
+                    response, is_finish = self._process(frame)
+                    if response is None:
+                        continue
+                    if is_finish:
+                        responses.put_nowait((loop.time(), response))
+                        break
+                    if self.conditions.is_lost():
+                        self.lost_response_count = self.lost_response_count + 1
+                        continue
+                    responses.put_nowait((loop.time() + self.conditions.delay(), response))
+                if self.finished.is_set():
+                    break
+        finally:
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+
+    ##TCPの応答の送信
+    ##送信時刻になるまで待ってから、受信した順番に送信する
+    async def _send_responses(self, writer, responses):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await responses.get()
+            if item is None:
+                break
+            send_time, response = item
+            wait = send_time - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                writer.write(response)
+                await writer.drain()
+            except ConnectionError:
+                break
+
+
+async def main():
+    conditions = NetworkConditions(latency=LATENCY, jitter=JITTER, loss=LOSS, reorder=REORDER)
+    server = AsyncPlcServer(SERVER, PORT, conditions=conditions)
+    monitor = plc_simulator.PlcMonitor(server.simulator, interval=1.0).start()
+    try:
+        await server.serve()
+    finally:
+        monitor.stop()
+        server.print_stats()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print('Finished!')
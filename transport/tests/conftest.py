@@ -0,0 +1,10 @@
+#########################################################################
+#file:conftest.py
+#date:2026/10/18
+#file_content:pytestの設定（transportフォルダのモジュールをimportできるようにする）
+#########################################################################
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,204 @@
+#########################################################################
+#file:test_fx3u_async.py
+#date:2026/10/18
+#file_content:AsyncFx3u（パイプライン化した読出し・書込み）のテスト
+#########################################################################
+
+##server_async.py のPLC模擬環境（UDP）に対して、応答の順番の入れ替わり・パケット損失がある状態で
+##続けて送信した読出しの応答を取り違えないことを確認する
+##応答が失われた・遅れて届いた・壊れていた場合に、同じ指令の電文が止まらず、応答を取り違えないことも確認する
+
+import asyncio
+import time
+import numpy as np
+import pytest
+import fx3u_async
+import fx3u_frame
+import plc_simulator
+import server_async
+
+
+##模擬環境を起動してテストを実行する
+##run(テスト(async関数(client, server)), conditions=NetworkConditions, code='ascii'/'binary', timeout=応答待ち時間)
+def run(test, conditions, code='ascii', timeout=0.2):
+    async def main():
+        server = server_async.AsyncPlcServer(host='127.0.0.1', port=0, conditions=conditions, tcp=False)
+        await server.start()
+        # Dn = n、Mは3の倍数だけON
+        server.simulator.device_D[:] = np.arange(server.simulator.device_D.size, dtype=np.uint16)
+        server.simulator.device_M[:] = bytes(1 if n % 3 == 0 else 0 for n in range(len(server.simulator.device_M)))
+        port = server.udp_transport.get_extra_info('sockname')[1]
+        try:
+            async with fx3u_async.AsyncFx3u('127.0.0.1', port, timeout=timeout, code=code) as client:
+                return await test(client, server)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+##読出し結果が模擬環境のデバイスの値と同じか
+def check_values(values):
+    for name, value in values.items():
+        number = int(name[1:])
+        if name[0] == 'D':
+            assert value == number, name
+        else:
+            assert value == (number % 3 == 0), name
+
+
+@pytest.mark.parametrize('code', ['ascii', 'binary'])
+def test_reordered_responses(code):
+    # 順番が入れ替わっても、同じ指令の電文が同時に応答待ちにならないので全て正しく読める
+    conditions = server_async.NetworkConditions(latency=0.002, jitter=0.002, reorder=0.5, seed=1)
+
+    async def test(client, server):
+        for i in range(20):
+            results = await asyncio.gather(
+                client.read_devices([('D0', 150)]),
+                client.read_devices([('D200', 128), ('M0', 300)]),
+                client.write_devices({'D5000': i, 'M5000': i & 1}),
+            )
+            check_values(results[0])
+            check_values(results[1])
+            assert len(results[0]) == 150
+        return server.reorder_count
+
+    assert run(test, conditions, code) > 0
+
+
+@pytest.mark.parametrize('code', ['ascii', 'binary'])
+def test_lost_responses(code):
+    # 損失した電文はConnectionErrorになり、それ以外は正しい値が読める（遅れた応答を次の電文の応答にしない）
+    conditions = server_async.NetworkConditions(latency=0.002, jitter=0.002, loss=0.1, reorder=0.5, seed=2)
+
+    async def test(client, server):
+        ok = 0
+        errors = 0
+        for i in range(20):
+            results = await asyncio.gather(
+                client.read_devices([('D0', 150), ('M100', 50)]),
+                client.read_devices([('D300', 70)]),
+                return_exceptions=True)
+            for result in results:
+                if isinstance(result, ConnectionError):
+                    errors = errors + 1
+                else:
+                    assert not isinstance(result, Exception), result
+                    check_values(result)
+                    ok = ok + 1
+        return ok, errors
+
+    ok, errors = run(test, conditions, code, timeout=0.1)
+    assert ok > 0
+    assert errors > 0
+
+
+##応答を返す模擬のソケット（応答の内容をテストで指定する）
+class _FakeTransport:
+    def __init__(self, client, reply):
+        self.client = client
+        self.reply = reply
+
+    def sendto(self, msg):
+        asyncio.get_running_loop().call_soon(self.client._on_response, self.reply(msg))
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('codec', [fx3u_frame.ASCII, fx3u_frame.BINARY], ids=['ascii', 'binary'])
+def test_response_length_mismatch(codec):
+    # 読出し点数と長さが合わない応答はConnectionError
+    code = 'ascii' if codec is fx3u_frame.ASCII else 'binary'
+    short_reply = {'ascii': b'8100' + b'0001' * 36, 'binary': bytes([0x81, 0x00]) + bytes(72)}[code]
+
+    async def main():
+        client = fx3u_async.AsyncFx3u('127.0.0.1', 5000, code=code)
+        client.inflight = asyncio.Semaphore(client.max_inflight)
+        client.transport = _FakeTransport(client, lambda msg: short_reply)
+        with pytest.raises(ConnectionError):
+            await client.read_words('D0', 64)
+        values = await asyncio.wait_for(client.read_words('D0', 36), 1.0)
+        assert len(values) == 36
+
+    asyncio.run(main())
+
+
+##電文ごとに応答を返す時刻と内容をテストで指定する模擬のソケット
+##script(送信した回数(0から), 電文) → [(遅延(秒), 応答電文(bytes)), ...]
+class _ScriptedTransport:
+    def __init__(self, client, script):
+        self.client = client
+        self.script = script
+        self.sent = [] # [(送信した時刻, 電文), ...]
+
+    def sendto(self, msg):
+        loop = asyncio.get_running_loop()
+        for delay, reply in self.script(len(self.sent), msg):
+            loop.call_later(delay, self.client._on_response, reply)
+        self.sent.append((time.perf_counter(), msg))
+
+    def close(self):
+        pass
+
+
+##PLC模擬環境の応答を返すクライアントを作る（Dn = n）
+def scripted_client(code, script, timeout):
+    simulator = plc_simulator.PlcSimulator()
+    simulator.device_D[:] = np.arange(simulator.device_D.size, dtype=np.uint16)
+    client = fx3u_async.AsyncFx3u('127.0.0.1', 5000, timeout=timeout, code=code)
+    client.inflight = asyncio.Semaphore(client.max_inflight)
+    client.transport = _ScriptedTransport(client, lambda n, msg: script(n, msg, simulator.handle(msg)[0]))
+    return client
+
+
+@pytest.mark.parametrize('code', ['ascii', 'binary'])
+def test_lost_response_does_not_stall(code):
+    # 応答が1つ失われても、同じ指令の次の電文は timeout 秒待たずに送る
+    def script(n, msg, reply):
+        return [] if n == 0 else [(0.001, reply)]
+
+    async def main():
+        client = scripted_client(code, script, timeout=0.2)
+        with pytest.raises(ConnectionError):
+            await client.read_words('D0', 10)
+        start = time.perf_counter()
+        values = await client.read_words('D0', 10)
+        assert list(values) == list(range(10))
+        assert time.perf_counter() - start < client.quarantine + 0.1
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('code', ['ascii', 'binary'])
+def test_late_response_is_discarded(code):
+    # タイムアウトした電文の応答が、次の同じ指令の電文の応答待ち中に届いても取り違えない（長さで区別）
+    def script(n, msg, reply):
+        if n == 0:
+            return [(0.3, reply)]   # タイムアウト(0.2秒)の後、次の電文の応答待ち中に届く
+        return [(0.2, reply)]
+
+    async def main():
+        client = scripted_client(code, script, timeout=0.2)
+        with pytest.raises(ConnectionError):
+            await client.read_words('D100', 20)
+        values = await client.read_words('D0', 10)
+        assert list(values) == list(range(10))
+        assert client.discard_count == 1
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('code', ['ascii', 'binary'])
+def test_garbage_datagram_is_discarded(code):
+    # 解析できない応答は受信処理で例外にせずに捨てる
+    def script(n, msg, reply):
+        return [(0.001, b'\xff\xfe\x00'), (0.002, b'zz'), (0.003, reply)]
+
+    async def main():
+        client = scripted_client(code, script, timeout=0.2)
+        values = await client.read_words('D0', 10)
+        assert list(values) == list(range(10))
+        assert client.discard_count == 2
+
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+#########################################################################
+#file:test_fx3u_frame.py
+#date:2026/10/18
+#file_content:1Eフレームの電文（fx3u_frame.py）のテスト
+#########################################################################
+
+##読出し・書込み電文の計画（plan_read / plan_write）と、
+##ASCIIコード・バイナリコードの電文の組み立て・応答の解析を plc_simulator.py のPLC模擬環境で確認する
+
+import numpy as np
+import pytest
+import fx3u_frame
+import plc_simulator
+
+
+CODES = [fx3u_frame.ASCII, fx3u_frame.BINARY]
+
+
+##模擬環境に電文を送って応答を返す関数（Fx3u._send_recv の代わり）
+##送った電文は sent に残す
+def simulator_send_recv(simulator, codec, sent):
+    def send_recv(msg):
+        sent.append(msg)
+        response, finish = simulator.handle(msg)
+        return codec.decode(response)
+    return send_recv
+
+
+##Dn = n、Mは3の倍数だけONの模擬環境
+def create_simulator():
+    simulator = plc_simulator.PlcSimulator()
+    simulator.device_D[:] = np.arange(simulator.device_D.size, dtype=np.uint16)
+    simulator.device_M[:] = bytes(1 if n % 3 == 0 else 0 for n in range(len(simulator.device_M)))
+    return simulator
+
+
+def test_plan_read_merges_near_ranges():
+    frames = fx3u_frame.plan_read(['M20', ('M21', 5), 'M155', ('D91', 10), 'D100', ('D50', 3)])
+    assert frames == [('M', 20, 136), ('D', 50, 51)]
+
+
+def test_plan_read_merges_overlapping_ranges_before_splitting():
+    # D0～D149 を 64点ずつ分ける（重なりを分けてから分割すると4電文になる）
+    assert fx3u_frame.plan_read([('D0', 100), ('D50', 100)]) == [('D', 0, 64), ('D', 64, 64), ('D', 128, 22)]
+    assert fx3u_frame.plan_read([('D0', 64), ('D64', 64)]) == [('D', 0, 64), ('D', 64, 64)]
+
+
+@pytest.mark.parametrize('kind, max_points', [('M', fx3u_frame.MAX_BIT_POINTS), ('D', fx3u_frame.MAX_WORD_POINTS)])
+def test_plan_read_splits_at_max_points(kind, max_points):
+    # 前の電文の残りの点数で読めるところまで読んでから分割する
+    frames = fx3u_frame.plan_read([(kind + '10', max_points * 2 + 1), kind + '5'])
+    assert frames == [(kind, 5, max_points), (kind, 5 + max_points, max_points), (kind, 5 + max_points * 2, 6)]
+
+
+def test_plan_write_small_is_one_random_frame():
+    frames = fx3u_frame.plan_write({'D50': 2026, 'D23': [1, 1], 'M20': 0, 'M155': [0, 1]})
+    assert frames == [('random', 'M', [(20, 0), (155, 0), (156, 1)]),
+                      ('random', 'D', [(23, 1), (24, 1), (50, 2026)])]
+
+
+def test_plan_write_splits_random_over_max_words():
+    # 飛び飛びのワード11点はランダム書込み10点 + 1点
+    values = {'D' + str(n * 2): n for n in range(fx3u_frame.MAX_RANDOM_WORD_POINTS + 1)}
+    frames = fx3u_frame.plan_write(values)
+    assert [frame[0] for frame in frames] == ['random', 'random']
+    assert [len(frame[2]) for frame in frames] == [fx3u_frame.MAX_RANDOM_WORD_POINTS, 1]
+
+    # 連続した番号は一括書込み、残りをランダム書込みにまとめる
+    values = {'D100': list(range(10)), 'D0': 1, 'D2': 2}
+    assert fx3u_frame.plan_write(values) == [('batch', 'D', 100, list(range(10))), ('random', 'D', [(0, 1), (2, 2)])]
+
+
+@pytest.mark.parametrize('kind, max_points', [('M', fx3u_frame.MAX_BIT_POINTS), ('D', fx3u_frame.MAX_WORD_POINTS)])
+def test_plan_write_batch_is_limited_to_max_points(kind, max_points):
+    frames = fx3u_frame.plan_write({kind + '0': [1] * (max_points + 10)})
+    assert [(frame[0], frame[2], len(frame[3])) for frame in frames] == [('batch', 0, max_points), ('batch', max_points, 10)]
+
+
+def test_ascii_point_field_fits_max_bit_points():
+    # ASCIIコードの点数は16進2桁なので、最大点数で組み立てても電文の長さが変わらない
+    msg = fx3u_frame.ASCII.build_batch_read('M', 0, fx3u_frame.MAX_BIT_POINTS)
+    assert len(msg) == 24
+    assert int(msg[20:22], 16) == fx3u_frame.MAX_BIT_POINTS
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+@pytest.mark.parametrize('kind, start, points', [('M', 0, 1), ('M', 7, 7), ('M', 100, fx3u_frame.MAX_BIT_POINTS),
+                                                 ('D', 0, 1), ('D', 91, 10), ('D', 7000, fx3u_frame.MAX_WORD_POINTS)])
+def test_batch_read(codec, kind, start, points):
+    simulator = create_simulator()
+    msg = codec.build_batch_read(kind, start, points)
+    response = codec.decode(simulator.handle(msg)[0])
+    codec.check_length(response, fx3u_frame.BATCH_READ[kind], points)
+    values = fx3u_frame.parse_batch_read(codec, response, kind, start, points)
+    if kind == 'M':
+        assert values == {'M' + str(n): n % 3 == 0 for n in range(start, start + points)}
+    else:
+        assert values == {'D' + str(n): n for n in range(start, start + points)}
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+@pytest.mark.parametrize('kind, points', [('M', 1), ('M', 9), ('M', fx3u_frame.MAX_BIT_POINTS), ('D', 1), ('D', fx3u_frame.MAX_WORD_POINTS)])
+def test_batch_write(codec, kind, points):
+    simulator = create_simulator()
+    values = [(n * 7919 + 1) & 0xFFFF for n in range(points)]
+    if kind == 'M':
+        values = [value & 1 for value in values]
+    response = codec.decode(simulator.handle(codec.build_batch_write(kind, 4000, values))[0])
+    codec.check_response(response, fx3u_frame.BATCH_WRITE[kind])
+    codec.check_length(response, fx3u_frame.BATCH_WRITE[kind], points)
+    device = simulator.device_M if kind == 'M' else simulator.device_D
+    assert list(device[4000:4000 + points]) == values
+    assert device[4000 + points] == (4000 + points if kind == 'D' else (4000 + points) % 3 == 0)
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+@pytest.mark.parametrize('kind, max_random', [('M', fx3u_frame.MAX_RANDOM_BIT_POINTS), ('D', fx3u_frame.MAX_RANDOM_WORD_POINTS)])
+def test_random_write(codec, kind, max_random):
+    simulator = create_simulator()
+    items = [(n * 10 + 1, 1 if kind == 'M' else 60000 + n) for n in range(max_random)]
+    response = codec.decode(simulator.handle(codec.build_random_write(kind, items))[0])
+    codec.check_response(response, fx3u_frame.RANDOM_WRITE[kind])
+    device = simulator.device_M if kind == 'M' else simulator.device_D
+    assert [device[number] for number, value in items] == [value for number, value in items]
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+def test_read_write_devices(codec):
+    simulator = create_simulator()
+    sent = []
+    send_recv = simulator_send_recv(simulator, codec, sent)
+
+    # D200～D259 の連続60点は一括書込み、飛び飛びの12点はランダム書込み10点 + 2点
+    values = {'D200': [n + 1 for n in range(60)], 'M300': [1, 1, 1]}
+    values.update({'D' + str(1000 + n * 2): 50000 + n for n in range(12)})
+    assert fx3u_frame.write_devices(send_recv, values, codec=codec) == 4
+    assert len(sent) == 4
+
+    devices = [('D200', 60), ('D1000', 24), ('M299', 5), 'M0']
+    result = fx3u_frame.read_devices(send_recv, devices, codec=codec)
+    assert list(result) == (['D' + str(n) for n in range(200, 260)] + ['D' + str(n) for n in range(1000, 1024)]
+                            + ['M' + str(n) for n in range(299, 304)] + ['M0']) # 指定したデバイスだけを指定した順に返す
+    assert [result['D' + str(200 + n)] for n in range(60)] == [n + 1 for n in range(60)]
+    assert [result['D' + str(1000 + n)] for n in range(24)] == [50000 + n // 2 if n % 2 == 0 else 1000 + n for n in range(24)]
+    assert [result['M' + str(n)] for n in range(299, 304)] == [False, True, True, True, True]
+    assert result['M0'] is True
+
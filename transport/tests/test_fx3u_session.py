@@ -0,0 +1,143 @@
+#########################################################################
+#file:test_fx3u_session.py
+#date:2026/10/18
+#file_content:Fx3u（UDP・TCPのセッションモード）の応答の受信のテスト
+#########################################################################
+
+##PLCの模擬環境(PlcSimulator)を使った小さなサーバーで、次の場合に正しい応答を受け取ることを確認する
+##・UDP: タイムアウトした電文の応答が遅れて届く / PLC以外から届く
+##・TCP: 応答が分割して届く
+
+import socket
+import threading
+import time
+import pytest
+import fx3u
+import fx3u_udp
+import plc_simulator
+
+
+##空いているUDPのポート番号（PCの受信ポートを固定する場合のテスト用）
+def _free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+##UDPの模擬PLC（delays[n]: n番目の電文の応答を遅らせる秒数, spoof=Trueで応答の前にPLC以外から偽の応答を送る）
+class _UdpPlc:
+    def __init__(self, delays=None, spoof=False):
+        self.simulator = plc_simulator.PlcSimulator()
+        self.simulator.device_D[:100] = range(100)
+        self.delays = delays or {}
+        self.other = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if spoof else None
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.count = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            response, is_finish = self.simulator.handle(data)
+            if self.other is not None:
+                self.other.sendto(response[:4] + b'FFFF' * 8, addr) # サブヘッダは同じで値が違う
+            delay = self.delays.get(self.count, 0.0)
+            self.count = self.count + 1
+            threading.Timer(delay, self._send, (response, addr)).start()
+
+    def _send(self, response, addr):
+        try:
+            self.sock.sendto(response, addr)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
+        if self.other is not None:
+            self.other.close()
+
+
+def test_udp_late_response_is_not_taken_for_next_request():
+    # 1つ目の電文の応答がタイムアウト後（2つ目の電文の応答待ちの間）に届いても、2つ目の電文の応答と取り違えない
+    # （受信ポート固定。同じ指令でも長さが違えば区別できる）
+    plc = _UdpPlc(delays={0: 0.3, 1: 0.15})
+    client = fx3u_udp.Fx3u('127.0.0.1', plc.port, 4096, local_port=_free_port(), timeout=0.2, retry=0).open()
+    try:
+        with pytest.raises(ConnectionError):
+            client.read_devices([('D10', 2)]) # タイムアウト
+        assert client.read_devices([('D50', 3)]) == {'D50': 50, 'D51': 51, 'D52': 52}
+        time.sleep(0.1)
+        assert client.read_devices([('D60', 2)]) == {'D60': 60, 'D61': 61} # 受信済みの応答は読み捨てる
+    finally:
+        client.close()
+        plc.close()
+
+
+def test_udp_late_response_with_other_command_is_dropped():
+    # 遅れた応答のサブヘッダが次の電文と違う場合は、受信待ちの間に届いても捨てる
+    plc = _UdpPlc(delays={0: 0.3, 1: 0.15})
+    client = fx3u_udp.Fx3u('127.0.0.1', plc.port, 4096, local_port=_free_port(), timeout=0.2, retry=0).open()
+    try:
+        assert client.read_bitdevice('M0') == '' # タイムアウト
+        assert client.read_words('D20', 2).tolist() == [20, 21]
+    finally:
+        client.close()
+        plc.close()
+
+
+def test_udp_ignores_other_sender():
+    # PLC以外から届いたデータは応答として扱わない
+    plc = _UdpPlc(delays={0: 0.05}, spoof=True)
+    client = fx3u_udp.Fx3u('127.0.0.1', plc.port, 4096, timeout=1.0).open()
+    try:
+        assert client.read_words('D5', 2).tolist() == [5, 6]
+    finally:
+        client.close()
+        plc.close()
+
+
+##TCPの模擬PLC（応答を1バイトずつ分割して送る）
+def _tcp_plc(server, simulator):
+    conn, addr = server.accept()
+    with conn:
+        buffer = b''
+        while True:
+            data = conn.recv(4096)
+            if not data:
+                return
+            buffer = buffer + data
+            length = simulator.frame_length(buffer)
+            if length is None or length > len(buffer):
+                continue
+            response, is_finish = simulator.handle(buffer[:length])
+            buffer = buffer[length:]
+            for i in range(len(response)):
+                conn.sendall(response[i:i + 1])
+                time.sleep(0.001)
+
+
+def test_tcp_reads_until_frame_is_complete():
+    simulator = plc_simulator.PlcSimulator()
+    simulator.device_D[:100] = range(100)
+    simulator.device_M[10:13] = b'\x01\x00\x01'
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    threading.Thread(target=_tcp_plc, args=(server, simulator), daemon=True).start()
+    client = fx3u.Fx3u('127.0.0.1', server.getsockname()[1], 4096, timeout=2.0).open()
+    try:
+        assert client.read_words('D30', 20).tolist() == list(range(30, 50))
+        assert client.read_bits('M10', 3).tolist() == [True, False, True]
+        assert client.write_devices({'D200': 7}) == 1
+        assert client.read_words('D200', 1).tolist() == [7]
+    finally:
+        client.close()
+        server.close()
@@ -0,0 +1,122 @@
+#########################################################################
+#file:test_person_tracker.py
+#date:2026/10/18
+#file_content:人（身体）検出結果の追跡（person_tracker.py）のテスト
+#########################################################################
+
+##IoUの計算・対応付け、人の確定・追跡の終了（滞在時間）、推論しない間の予測と、
+##DetectorService が推論しなかった画像を追跡で補うことを確認する
+
+import numpy as np
+import pytest
+import detector_service
+import frame_ring
+import person_tracker
+
+
+def test_iou_matrix():
+    a = [[0, 0, 10, 10], [100, 100, 110, 110]]
+    b = [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]]
+    iou = person_tracker.iou_matrix(a, b)
+    assert iou.shape == (2, 3)
+    np.testing.assert_allclose(iou, [[1.0, 50 / 150, 0.0], [0.0, 0.0, 0.0]])
+    assert person_tracker.iou_matrix(np.zeros((0, 4)), b).shape == (0, 3)
+
+
+def test_greedy_match():
+    score = np.array([[0.9, 0.8, 0.0],
+                      [0.85, 0.1, 0.0],
+                      [0.0, 0.0, 0.2]])
+    # スコアの大きい順（0-0 が先に決まるので 1 は 1-1 ではなく対応しない、2-2 は閾値未満）
+    assert person_tracker._greedy_match(score, 0.3, [0, 1, 2], [0, 1, 2]) == [(0, 0)]
+    assert person_tracker._greedy_match(score, 0.05, [0, 1, 2], [0, 1, 2]) == [(0, 0), (2, 2), (1, 1)]
+    # 行・列を絞り込んだ場合も元の番号を返す
+    assert person_tracker._greedy_match(score, 0.3, [1, 2], [0, 1]) == [(1, 0)]
+    assert person_tracker._greedy_match(score, 0.3, [], [0]) == []
+
+
+##x方向に1秒あたり speed 画素動く人の検出結果
+def moving_box(t, speed=50.0, conf=0.9):
+    x = 100 + speed * t
+    return np.array([[x, 100, x + 50, 200, conf, 0]])
+
+
+def test_confirm_and_expire():
+    tracker = person_tracker.PersonTracker(iou_threshold=0.3, max_age=1.0, min_hits=2)
+    # 1回目は確定前なので返さない、2回目で確定
+    assert tracker.update(moving_box(0.0), 0.0) == []
+    tracks = tracker.update(moving_box(0.2), 0.2)
+    assert [track.id for track in tracks] == [1]
+    for t in (0.4, 0.6, 0.8):
+        assert [track.id for track in tracker.update(moving_box(t), t)] == [1]
+
+    # 1回だけの検出（確定前）は次に検出されなければすぐに消える
+    tracker.update(np.vstack([moving_box(1.0), [[600, 100, 650, 200, 0.9, 0]]]), 1.0)
+    tracker.update(moving_box(1.2), 1.2)
+    assert [track.id for track in tracker.tracks] == [1]
+
+    # max_age秒検出されなければ追跡を終了し、滞在時間を記録する
+    tracker.update(np.zeros((0, 6)), 2.0)
+    assert tracker.pop_finished() == []
+    tracker.update(np.zeros((0, 6)), 2.3)
+    finished = tracker.pop_finished()
+    assert [track.id for track in finished] == [1]
+    assert finished[0].dwell() == pytest.approx(1.2)
+    assert tracker.tracks == []
+    assert tracker.stats()['confirmed'] == 1
+
+
+def test_predict_between_detections():
+    tracker = person_tracker.PersonTracker(iou_threshold=0.3, max_age=1.0, min_hits=2)
+    assert tracker.predict(0.0)[0].shape == (0, 6)
+    for i in range(6):
+        tracker.update(moving_box(i * 0.2), i * 0.2)
+    # 推論していない時刻の位置を速度から予測する（状態は変えない）
+    boxes, tracks = tracker.predict(1.3)
+    assert [track.id for track in tracks] == [1]
+    np.testing.assert_allclose(boxes[0, :4], moving_box(1.3)[0, :4], atol=3.0)
+    assert boxes[0, 4] == pytest.approx(0.9)
+    assert boxes[0, 5] == 0
+    assert tracker.tracks[0].last_seen == pytest.approx(1.0)
+    # max_ageを過ぎたら予測しない
+    assert len(tracker.predict(2.5)[1]) == 0
+
+
+##決めた矩形を返す推論クラス（推論した回数を数える）
+class _FakeDetector:
+    def __init__(self):
+        self.count = 0
+        self.t = 0.0
+
+    def detect(self, images):
+        self.count = self.count + len(images)
+        return [moving_box(self.t).astype(np.float32) for image in images]
+
+
+def test_detector_service_tracks_between_detections():
+    ring = frame_ring.FrameRing()
+    detector = _FakeDetector()
+    tracker = person_tracker.PersonTracker(iou_threshold=0.3, max_age=1.0, min_hits=2)
+    service = detector_service.DetectorService(detector, {'cam': ring}, rate=None, trackers={'cam': tracker}, detect_every=3)
+
+    results = []
+    for i in range(12):
+        t = i * 0.1
+        detector.t = t
+        ring.put(np.full((10, 10, 3), i, np.uint8), t)
+        results.extend(service.step())
+
+    # 追跡が確定するまで（2枚）は毎回推論し、その後は3枚に1枚だけ推論して間は予測位置を使う
+    assert [r.predicted for r in results] == [False, False] + [True, True, False] * 3 + [True]
+    assert detector.count == 5
+    last_x = None
+    for r in results:
+        if r.predicted:
+            # 最後に推論した位置から動いた方向に予測する（速度は推論を重ねるほど正確になる）
+            assert [track.id for track in r.tracks] == [1]
+            assert r.boxes[0, 0] > last_x
+        else:
+            last_x = r.boxes[0, 0]
+    np.testing.assert_allclose(results[-1].boxes[0, :4], moving_box(results[-1].timestamp)[0, :4], atol=3.0)
+    assert service.latest()['cam'].predicted is False
+    assert service.stats()['predicted'] == 7
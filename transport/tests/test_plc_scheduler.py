@@ -0,0 +1,115 @@
+#########################################################################
+#file:test_plc_scheduler.py
+#date:2026/10/18
+#file_content:PLCスキャンのスケジューラ（plc_scheduler.py）のテスト
+#########################################################################
+
+##エッジ・レベルのコールバック、ポーリングの優先度と時間切れの先送り、
+##処理がサイクル時間を超えた後に連続実行しないことを確認する
+
+import threading
+import time
+import plc_scheduler
+
+
+##Fx3uの代わり（デバイスの値を返し、読み出したデバイスと時刻を記録する）
+class FakeFx3u:
+    def __init__(self):
+        self.values = {}
+        self.reads = []   # [(時刻, [デバイス, ...]), ...]
+        self.delays = []  # 読出しごとの待ち時間（先頭から順に使う）
+
+    def read_devices(self, devices):
+        self.reads.append((time.perf_counter(), list(devices)))
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+        return {device: self.values.get(device, 0) for device in devices}
+
+
+##1サイクル分を実行（時間切れにしない）
+def run_cycle(scheduler):
+    now = time.perf_counter()
+    for job in scheduler.polls + scheduler.tasks:
+        job.next_time = now # 毎回全てのポーリングを読み出す
+    scheduler._run_cycle(now, now + 60.0)
+
+
+def test_edges_and_level():
+    fx3u = FakeFx3u()
+    scheduler = plc_scheduler.PlcScheduler(fx3u, cycle_time=0.01)
+    scheduler.add_poll(['M20'], 0.01)
+    calls = []
+    scheduler.on_rising('M20', lambda: calls.append('rising'))
+    scheduler.on_falling('M20', lambda: calls.append('falling'))
+    scheduler.on_level('M20', lambda: calls.append('level'))
+    scheduler.on_change('M20', lambda device, old, new: calls.append(('change', old, new)))
+
+    fx3u.values['M20'] = 1
+    run_cycle(scheduler) # 1回目の読出しでONなら立上り
+    assert calls == ['rising', 'level', ('change', None, 1)]
+
+    del calls[:]
+    run_cycle(scheduler) # ONのままならレベルだけ
+    run_cycle(scheduler)
+    assert calls == ['level', 'level']
+
+    del calls[:]
+    fx3u.values['M20'] = 0
+    run_cycle(scheduler)
+    run_cycle(scheduler)
+    assert calls == ['falling', ('change', 1, 0)]
+
+    # OFFに戻した後に次の読出しまでにONになっても、レベルなら取りこぼさない
+    del calls[:]
+    fx3u.values['M20'] = 1
+    run_cycle(scheduler)
+    assert calls == ['rising', 'level', ('change', 0, 1)]
+
+
+def test_poll_priority_and_deferral():
+    fx3u = FakeFx3u()
+    scheduler = plc_scheduler.PlcScheduler(fx3u, cycle_time=0.01)
+    scheduler.add_poll(['D100'], 0.01, priority=0)
+    scheduler.add_poll(['M20'], 0.01, priority=10)
+    scheduler.add_poll(['M21'], 0.01, priority=10)
+
+    # 優先度の高いポーリングから、同じ優先度はまとめて読み出す
+    run_cycle(scheduler)
+    assert [devices for t, devices in fx3u.reads] == [['M20', 'M21'], ['D100']]
+
+    # 時間切れなら優先度の高いポーリングだけ読み出し、残りは次のサイクルへ先送り
+    del fx3u.reads[:]
+    now = time.perf_counter()
+    for job in scheduler.polls:
+        job.next_time = now
+    scheduler._run_cycle(now, now)
+    assert [devices for t, devices in fx3u.reads] == [['M20', 'M21']]
+    assert scheduler.deferred_poll_count == 1
+
+    del fx3u.reads[:]
+    now = time.perf_counter()
+    scheduler._run_cycle(now, now + 60.0)
+    assert [devices for t, devices in fx3u.reads] == [['D100']]
+
+
+def test_overrun_does_not_burst():
+    fx3u = FakeFx3u()
+    cycle_time = 0.01
+    period = 0.04
+    scheduler = plc_scheduler.PlcScheduler(fx3u, cycle_time=cycle_time)
+    scheduler.add_poll(['M20'], period)
+    fx3u.delays = [0.0, 0.0, 0.2] # 3回目の読出しで5周期分止まる
+
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.5)
+    scheduler.stop()
+    thread.join(5.0)
+    assert not thread.is_alive()
+
+    times = [t for t, devices in fx3u.reads]
+    assert scheduler.overrun_count >= 1
+    # 止まった後も遅れを取り戻そうと続けて読み出さない（ポーリングの周期に合わせ直す）
+    gaps = [b - a for a, b in zip(times[2:], times[3:])]
+    assert min(gaps) > cycle_time * 1.5
+    assert len(times) <= 0.5 / period
@@ -0,0 +1,67 @@
+#########################################################################
+#file:test_plc_simulator.py
+#date:2026/10/18
+#file_content:PLCの模擬環境（plc_simulator.py）のテスト
+#########################################################################
+
+##長さが足りない電文や範囲外のデバイスを指定した電文に、実機と同じく異常終了で応答し、
+##デバイスのメモリの大きさ・値が変わらないことを確認する
+
+import pytest
+import fx3u_frame
+import plc_simulator
+
+
+CODES = [fx3u_frame.ASCII, fx3u_frame.BINARY]
+
+
+##異常終了の応答（サブヘッダ = 指令+0x80、終了コード = 5B、異常コード）か
+def check_error(codec, response, subheader, code):
+    if codec is fx3u_frame.ASCII:
+        assert response == (format(subheader | 0x80, '02X') + '5B' + format(code, '02X')).encode('latin-1')
+    else:
+        assert response == bytes([subheader | 0x80, plc_simulator.END_ERROR, code])
+    with pytest.raises(ConnectionError):
+        codec.check_response(codec.decode(response), subheader)
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+@pytest.mark.parametrize('kind', ['M', 'D'])
+def test_truncated_write(codec, kind):
+    simulator = plc_simulator.PlcSimulator()
+    msg = codec.build_batch_write(kind, 100, [1] * 7)
+    response, finish = simulator.handle(msg[:-1])
+    check_error(codec, response, fx3u_frame.BATCH_WRITE[kind], plc_simulator.ERROR_LENGTH)
+    assert len(simulator.device_M) == plc_simulator.DEVICE_POINTS
+    assert len(simulator.device_D) == plc_simulator.DEVICE_POINTS
+    assert not any(simulator.device_M) and not simulator.device_D.any()
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+@pytest.mark.parametrize('kind', ['M', 'D'])
+def test_out_of_range_write(codec, kind):
+    simulator = plc_simulator.PlcSimulator()
+    msg = codec.build_batch_write(kind, plc_simulator.DEVICE_POINTS - 2, [1, 1, 1, 1])
+    response, finish = simulator.handle(msg)
+    check_error(codec, response, fx3u_frame.BATCH_WRITE[kind], plc_simulator.ERROR_RANGE)
+    assert len(simulator.device_M) == plc_simulator.DEVICE_POINTS
+    assert len(simulator.device_D) == plc_simulator.DEVICE_POINTS
+    assert not any(simulator.device_M) and not simulator.device_D.any()
+
+    # 最後のデバイスまでなら書き込める
+    msg = codec.build_batch_write(kind, plc_simulator.DEVICE_POINTS - 4, [1, 1, 1, 1])
+    response, finish = simulator.handle(msg)
+    codec.check_response(codec.decode(response), fx3u_frame.BATCH_WRITE[kind])
+    device = simulator.device_M if kind == 'M' else simulator.device_D
+    assert len(device) == plc_simulator.DEVICE_POINTS
+    assert list(device[-4:]) == [1, 1, 1, 1]
+
+
+@pytest.mark.parametrize('codec', CODES, ids=['ascii', 'binary'])
+@pytest.mark.parametrize('kind', ['M', 'D'])
+def test_out_of_range_read(codec, kind):
+    simulator = plc_simulator.PlcSimulator()
+    response, finish = simulator.handle(codec.build_batch_read(kind, plc_simulator.DEVICE_POINTS - 1, 3))
+    check_error(codec, response, fx3u_frame.BATCH_READ[kind], plc_simulator.ERROR_RANGE)
+    with pytest.raises(ConnectionError):
+        fx3u_frame.parse_batch_read(codec, codec.decode(response), kind, plc_simulator.DEVICE_POINTS - 1, 3)
@@ -0,0 +1,92 @@
+#########################################################################
+#file:test_yolo_onnx.py
+#date:2026/10/18
+#file_content:YOLOv8のONNX推論（yolo_onnx.py）の前処理・後処理のテスト
+#########################################################################
+
+##ONNX Runtime・OpenCV DNNのモデルの代わりに、決めた出力（1×(4+クラス数)×候補数）を返す推論クラスで
+##レターボックス・後処理の結果が ultralytics と同じ N×6（x1, y1, x2, y2, 信頼度, クラス）になることを確認する
+
+import numpy as np
+import pytest
+import yolo_onnx
+
+
+NUM_CLASSES = 80
+
+
+##決めた出力を返す推論クラス
+class _FixedYolo(yolo_onnx._OnnxYolo):
+    def __init__(self, output, shape, classes=None):
+        yolo_onnx._OnnxYolo.__init__(self, shape, classes, conf=0.5, iou=0.7)
+        self.output = output
+        self.blobs = []
+
+    def _run(self, blob):
+        self.blobs.append(blob)
+        return self.output
+
+
+##候補（入力画像の座標で 中心x, 中心y, 幅, 高さ, クラス, 信頼度）から出力を作る
+def make_output(candidates):
+    output = np.zeros((1, 4 + NUM_CLASSES, len(candidates)), np.float32)
+    for i, (cx, cy, w, h, class_id, conf) in enumerate(candidates):
+        output[0, :4, i] = (cx, cy, w, h)
+        output[0, 4 + class_id, i] = conf
+    return output
+
+
+##1280×720の画像を640×384で推論（縮小率0.5、上下に12画素の余白）
+IMAGE_SHAPE = (720, 1280, 3)
+INPUT_SHAPE = (384, 640)
+CANDIDATES = [
+    (320, 112, 100, 50, 0, 0.9),   # 人 → 元の画像で (540, 150, 740, 250)
+    (322, 113, 100, 50, 0, 0.8),   # 上と重なる人（NMSで消える）
+    (320, 112, 100, 50, 2, 0.7),   # 同じ位置の車（クラスが違うので残る）
+    (100, 100, 40, 40, 0, 0.3),    # 信頼度が閾値未満
+    (630, 370, 40, 40, 0, 0.6),    # 画像の外にはみ出す（画像の範囲に切り詰める）
+]
+
+
+def test_postprocess_matches_ultralytics_format():
+    image = np.zeros(IMAGE_SHAPE, np.uint8)
+    detector = _FixedYolo(make_output(CANDIDATES), INPUT_SHAPE)
+    boxes = detector.detect([image])[0]
+    assert boxes.dtype == np.float32
+    assert boxes.shape == (3, 6)
+    # 信頼度の高い順、元の画像の座標
+    np.testing.assert_allclose(boxes, [
+        [540, 150, 740, 250, 0.9, 0],
+        [540, 150, 740, 250, 0.7, 2],
+        [1220, 676, 1280, 720, 0.6, 0],
+    ], atol=1e-3)
+
+    # クラスの絞り込み
+    detector = _FixedYolo(make_output(CANDIDATES), INPUT_SHAPE, classes=[0])
+    boxes = detector.detect([image])[0]
+    assert boxes[:, 5].tolist() == [0, 0]
+
+
+def test_no_detection():
+    detector = _FixedYolo(make_output([(100, 100, 40, 40, 0, 0.3)]), INPUT_SHAPE)
+    boxes = detector.detect([np.zeros(IMAGE_SHAPE, np.uint8)])[0]
+    assert boxes.shape == (0, 6)
+
+
+def test_letterbox():
+    # 上下の余白は114、画像はBGR→RGBにして0～1に正規化、1×3×高さ×幅
+    image = np.empty(IMAGE_SHAPE, np.uint8)
+    image[:] = (10, 20, 30) # BGR
+    detector = _FixedYolo(make_output([]), INPUT_SHAPE)
+    detector.detect([image])
+    blob = detector.blobs[0]
+    assert blob.shape == (1, 3) + INPUT_SHAPE
+    assert blob.dtype == np.float32
+    np.testing.assert_allclose(blob[0, :, :12, :], 114 / 255, atol=1e-6)
+    np.testing.assert_allclose(blob[0, :, 372:, :], 114 / 255, atol=1e-6)
+    np.testing.assert_allclose(blob[0, :, 12:372, :].reshape(3, -1).mean(axis=1), [30 / 255, 20 / 255, 10 / 255], atol=1e-6)
+
+
+def test_run_is_abstract():
+    with pytest.raises(TypeError):
+        yolo_onnx._OnnxYolo(INPUT_SHAPE)
@@ -0,0 +1,176 @@
+#########################################################################
+#file:yolo_onnx.py
+#date:2026/10/18
+#file_content:YOLOv8のONNX推論（ONNX Runtime / OpenCV DNN、CPU用）
+#########################################################################
+
+##ultralytics（PyTorch）を使わずにYOLOv8で推論する
+##・export_onnx() で yolov8n.pt をONNX形式に1回だけ変換しておく（入力サイズ固定、変換済みなら何もしない）
+##  変換だけはultralyticsが必要。推論にはultralytics・PyTorchは不要なので、起動が速い
+##・OnnxDetector : ONNX Runtime で推論（推論スレッド数を指定できる）
+##  DnnDetector  : OpenCV DNN で推論（OpenCVだけで動く。スレッド数は指定できない）
+##・検出結果は detector_service.YoloDetector と同じ N×6のnumpy配列（x1, y1, x2, y2, 信頼度, クラス）
+##  前処理（レターボックス）・後処理（信頼度の閾値・NMS）もultralyticsと同じ
+##
+##使い方:
+##    path = export_onnx('yolov8n.pt', (352, 544))
+##    detector = OnnxDetector(path, classes=[0], conf=0.5, threads=2)
+##    boxes = detector.detect([image])[0]
+
+import abc
+import math
+import os
+import cv2
+import numpy as np
+
+PAD_COLOR = (114, 114, 114) # レターボックスの余白の色（ultralyticsと同じ）
+MAX_WH = 7680               # クラスごとにNMSを行うための座標のずらし幅（ultralyticsと同じ）
+
+
+##画像サイズに合わせた推論時の入力サイズ（縦横比を保つ長方形）
+##(size(tuple)=推論する画像の(幅, 高さ), imgsz(int)=長辺のサイズ, stride(int)=モデルのストライド)
+##戻り値: (高さ, 幅) strideの倍数
+def input_shape(size, imgsz=640, stride=32):
+    width, height = size
+    scale = imgsz / max(width, height)
+    return (int(math.ceil(height * scale / stride)) * stride, int(math.ceil(width * scale / stride)) * stride)
+
+
+##ONNX形式への変換（変換済みのファイルが.ptより新しければ変換しない）
+##(weights(str)=.ptファイル, imgsz(int/tuple)=入力サイズ（int: 正方形, (高さ, 幅): 長方形）, path(str)=保存先（Noneなら自動）)
+##戻り値: ONNXファイルのパス
+def export_onnx(weights='yolov8n.pt', imgsz=640, path=None):
+    height, width = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+    if path is None:
+        path = os.path.splitext(weights)[0] + '_' + str(height) + 'x' + str(width) + '.onnx'
+    if os.path.exists(path) and (not os.path.exists(weights) or os.path.getmtime(path) >= os.path.getmtime(weights)):
+        return path
+
+    from ultralytics import YOLO # 変換の時だけ読み込む（読込みに数秒かかる）
+    print("ONNX形式に変換します: " + weights + " → " + path)
+    # 入力サイズ固定(dynamic=False)、OpenCV DNNでも読めるopsetで変換
+    exported = YOLO(weights).export(format='onnx', imgsz=[height, width], dynamic=False, opset=12)
+    if os.path.abspath(exported) != os.path.abspath(path):
+        os.replace(exported, path)
+    return path
+
+
+##ONNX推論の共通部分（前処理・後処理）
+##推論の実行(_run)は OnnxDetector・DnnDetector で実装する
+class _OnnxYolo(abc.ABC):
+    def __init__(self, shape, classes=None, conf=0.5, iou=0.7, max_det=300):
+        self.shape = shape # 入力サイズ (高さ, 幅)
+        self.classes = None if classes is None else np.asarray(classes)
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.padded = np.empty((shape[0], shape[1], 3), np.uint8) # レターボックス画像（使い回す）
+
+    ##まとめて推論
+    ##戻り値: 画像ごとの検出結果（N×6のnumpy配列）のリスト
+    def detect(self, images):
+        results = []
+        for image in images:
+            blob, scale, pad = self._preprocess(image)
+            output = self._run(blob)
+            results.append(self._postprocess(output, scale, pad, image.shape))
+        return results
+
+    ##推論の実行（ONNX Runtime / OpenCV DNN）
+    ##_run(入力(1×3×高さ×幅 float32)) → 出力(1×(4+クラス数)×候補数)
+    @abc.abstractmethod
+    def _run(self, blob):
+        pass
+
+    ##レターボックス（縦横比を保って縮小し、余白を埋める）
+    ##戻り値: (入力, 縮小率, (左の余白, 上の余白))
+    def _preprocess(self, image):
+        height, width = image.shape[:2]
+        in_h, in_w = self.shape
+        scale = min(in_h / height, in_w / width)
+        new_w, new_h = int(round(width * scale)), int(round(height * scale))
+        left, top = int(round((in_w - new_w) / 2 - 0.1)), int(round((in_h - new_h) / 2 - 0.1))
+        self.padded[:] = PAD_COLOR
+        self.padded[top:top + new_h, left:left + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        # BGR→RGB、0～1に正規化、HWC→CHW
+        blob = cv2.dnn.blobFromImage(self.padded, 1.0 / 255, swapRB=True)
+        return blob, scale, (left, top)
+
+    ##信頼度の閾値・クラスの絞り込み・NMS・元の画像の座標に戻す
+    def _postprocess(self, output, scale, pad, image_shape):
+        prediction = output[0].T # (候補数, 4+クラス数)
+        scores = prediction[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences > self.conf
+        if self.classes is not None:
+            keep = keep & np.isin(class_ids, self.classes)
+        if not keep.any():
+            return np.zeros((0, 6), np.float32)
+        boxes = prediction[keep, :4]
+        confidences = confidences[keep]
+        class_ids = class_ids[keep]
+
+        # (中心x, 中心y, 幅, 高さ) → (x1, y1, x2, y2)
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+
+        # クラスごとのNMS（クラスごとに座標をずらして1回で行う）
+        offset = class_ids[:, None].astype(np.float32) * MAX_WH
+        shifted = xyxy + offset
+        rects = np.column_stack([shifted[:, 0], shifted[:, 1], shifted[:, 2] - shifted[:, 0], shifted[:, 3] - shifted[:, 1]])
+        indices = cv2.dnn.NMSBoxes(rects.tolist(), confidences.tolist(), self.conf, self.iou)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        indices = indices[np.argsort(-confidences[indices])][:self.max_det]
+
+        # レターボックスを外して元の画像の座標に戻す
+        left, top = pad
+        xyxy = xyxy[indices]
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - left) / scale).clip(0, image_shape[1])
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - top) / scale).clip(0, image_shape[0])
+        return np.column_stack([xyxy, confidences[indices], class_ids[indices]]).astype(np.float32)
+
+
+##ONNX Runtimeでの推論
+class OnnxDetector(_OnnxYolo):
+    ##(self, path(str)=ONNXファイル, classes(list)=検出するクラスID, conf(float)=検出信頼度の閾値, iou(float)=NMSの閾値,
+    ## threads(int)=推論スレッド数（Noneなら自動。検査の画像処理にCPUを残すために少なめにする）)
+    def __init__(self, path, classes=None, conf=0.5, iou=0.7, threads=None):
+        import onnxruntime # 使う時だけ読み込む
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        if threads is not None:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, channels, height, width = model_input.shape
+        if not isinstance(height, int) or not isinstance(width, int):
+            raise ValueError("入力サイズが固定されていないモデルです（dynamic=Falseで変換してください）: " + path)
+        _OnnxYolo.__init__(self, (height, width), classes, conf, iou)
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+##OpenCV DNNでの推論
+##OpenCV DNNはネットごとにスレッド数を指定できない（cv2.setNumThreadsはプロセス全体の設定で、
+##検査の並列処理(kensa_pool)のOpenCVの処理も遅くなる）ので、スレッド数は変更しない
+##推論にCPUを使いすぎる場合は onnxruntime（OnnxDetector）で threads を指定する
+class DnnDetector(_OnnxYolo):
+    ##(self, path(str)=ONNXファイル, shape(tuple)=変換した時の入力サイズ(高さ, 幅), classes(list)=検出するクラスID,
+    ## conf(float)=検出信頼度の閾値, iou(float)=NMSの閾値)
+    def __init__(self, path, shape=(640, 640), classes=None, conf=0.5, iou=0.7):
+        self.net = cv2.dnn.readNetFromONNX(path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        _OnnxYolo.__init__(self, shape, classes, conf, iou)
+
+    def _run(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward()